@@ -1,3 +1,13 @@
 from django.contrib import admin
+from Accounts.models import OutgoingEmail
 
-# Register your models here.
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    """
+    A class that extends Django's ModelAdmin.
+    It is used to inspect the delivery status of the queued emails.
+    """
+    list_display = ("subject", "to", "status", "attempts", "create_date", "sent_date")
+    list_filter = ("status",)
+    search_fields = ("to", "subject")
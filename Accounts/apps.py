@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class AccountsConfig(AppConfig):
     name = 'Accounts'
+
+    def ready(self):
+        """
+        Connects the app's signal receivers once the app registry is ready.
+        """
+        import Accounts.signals
@@ -0,0 +1,57 @@
+from asgiref.sync import sync_to_async
+from django.shortcuts import render
+from Accounts import views
+from Accounts.forms import ForgotUserNameForm, SignUpForm
+from DiaryApp.decorators import load_user
+
+#The async views are used instead of the views of the same name in Accounts.views when the ASYNC_VIEWS setting is True.
+#The forms are rendered in the event loop. A submitted form is handled by the sync view in a worker thread,
+#which only queues the email in the outbox, so the request never waits for the mailserver.
+
+
+async def signup(request):
+    """
+    An async view that renders the signup page.
+    A submitted SignUpForm is handled by the sync view, which creates the user and queues the email confirmation email.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+
+    Returns
+    -------
+    HttpResponseRedirect
+        A request to the signup_done page when the user submits valid POST data and a new User object is created.
+    HttpResponse
+        A new SignUpForm instance when the user accesses the signup page.
+        A SignUpForm instance with errors when the user enters invalid data.
+    """
+    if request.method == "POST":
+        return await sync_to_async(views.signup)(request)
+    await load_user(request)
+    return render(request, 'Accounts/signup.html', {'form':SignUpForm()})
+
+
+async def send_username(request):
+    """
+    An async view that renders the forgot username page.
+    A submitted ForgotUserNameForm is handled by the sync view, which queues the username email.
+
+    Parameters
+    ----------
+    request : HttpRequest
+        An HttpRequest object that contains metadata about a request.
+
+    Returns
+    -------
+    HttpResponseRedirect
+        A request to the SendUsernameDoneView when the user submits valid POST data.
+    HttpResponse
+        A user accesses the forgot username page.
+        A ForgotUserNameForm instance with errors when the user enters invalid data.
+    """
+    if request.method == "POST":
+        return await sync_to_async(views.send_username)(request)
+    await load_user(request)
+    return render(request, 'Accounts/username_send_form.html', {'form':ForgotUserNameForm()})
@@ -0,0 +1,34 @@
+from django.contrib.auth.backends import ModelBackend
+from Accounts.cache import cache_user, get_cached_user
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    A class that extends Django's ModelBackend to resolve the signed in user of a request from the cache.
+    The AuthenticationMiddleware loads the user of every authenticated request through get_user(),
+    which otherwise costs a query on the User table.
+    The cached user is removed by the Accounts signal receivers whenever the user is saved, deleted or signs out,
+    so a password change still signs out the user's other sessions. This requires a cache shared by every process:
+    with a per process cache, other processes would keep their copy for up to AUTH_USER_CACHE_TIMEOUT seconds,
+    so the settings only use this backend with a shared cache.
+    """
+    def get_user(self, user_id):
+        """
+        Returns the active user with the given id from the cache, loading and caching it on a miss.
+
+        Parameters
+        ----------
+        user_id : int
+            The user's id stored in the session.
+
+        Returns
+        -------
+        User object
+            The user or None if there is no such active user.
+        """
+        user = get_cached_user(user_id)
+        if user is None:
+            user = super(CachedModelBackend, self).get_user(user_id)
+            if user is not None:
+                cache_user(user)
+        return user
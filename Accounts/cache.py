@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.cache import cache
+
+#The cache key of a signed in user. It is formatted with the user's id.
+USER_KEY = 'auth_user:{}'
+
+
+def get_cached_user(user_id):
+    """
+    A function that returns a user from the cache.
+
+    Parameters
+    ----------
+    user_id : int
+        The user's id.
+
+    Returns
+    -------
+    User object
+        The cached user or None if the user is not cached.
+    """
+    return cache.get(USER_KEY.format(user_id))
+
+
+def cache_user(user):
+    """
+    A function that caches a user for AUTH_USER_CACHE_TIMEOUT seconds.
+
+    Parameters
+    ----------
+    user : User object
+        The user.
+    """
+    cache.set(USER_KEY.format(user.pk), user, settings.AUTH_USER_CACHE_TIMEOUT)
+
+
+def invalidate_user(user_id):
+    """
+    A function that removes a user from the cache, so that the next request loads it from the database.
+
+    Parameters
+    ----------
+    user_id : int
+        The user's id.
+    """
+    cache.delete(USER_KEY.format(user_id))
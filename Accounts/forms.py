@@ -1,6 +1,8 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm, PasswordResetForm, SetPasswordForm, PasswordChangeForm
 from django.contrib.auth.models import User
+from django.template.loader import render_to_string
+from Accounts.outbox import queue_email
 
 class ChangePasswordForm(PasswordChangeForm):
     """
@@ -30,6 +32,11 @@ class ForgotPasswordForm(PasswordResetForm):
     """
     A class that inherits Django's inbuilt PasswordResetForm.
     It is used to create a user form for resetting passwords.
+
+    Methods
+    -------
+    send_mail(subject_template_name, email_template_name, context, from_email, to_email, html_email_template_name=None)
+        Overrides Django's default PasswordResetForm class send_mail() method.
     """
     def __init__(self, *args, **kwargs):
         """
@@ -47,6 +54,30 @@ class ForgotPasswordForm(PasswordResetForm):
         #Changes the default form widgets appearance of every field in the form class using update()
         self.fields['email'].widget.attrs.update({'class':'form-control', 'placeholder':'Email'})
 
+    def send_mail(self, subject_template_name, email_template_name, context, from_email, to_email, html_email_template_name=None):
+        """
+        Overrides the default PasswordResetForm send_mail().
+        Queues the password reset email in the outbox instead of sending it during the request.
+
+        Parameters
+        ----------
+        subject_template_name : str
+            The template used for the email subject.
+        email_template_name : str
+            The template used for the email body.
+        context : dict
+            The context used for rendering the templates.
+        from_email : str
+            The sender's email address.
+        to_email : str
+            The recipient's email address.
+        html_email_template_name : str, optional
+            The template used for an HTML email body. It is not used.
+        """
+        subject = ''.join(render_to_string(subject_template_name, context).splitlines())
+        body = render_to_string(email_template_name, context)
+        queue_email(subject, body, [to_email], from_email)
+
 
 class ForgotUserNameForm(forms.Form):
     """
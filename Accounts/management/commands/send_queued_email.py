@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand
+from Accounts.outbox import deliver_queued_emails
+
+
+class Command(BaseCommand):
+    """
+    A management command that delivers the emails queued in the outbox.
+    It runs as a background worker process when the --loop option is given.
+    """
+    help = "Delivers the emails queued in the outbox."
+
+    def add_arguments(self, parser):
+        """
+        Adds the command's arguments.
+
+        Parameters
+        ----------
+        parser : ArgumentParser object
+            The command's argument parser.
+        """
+        parser.add_argument('--batch-size', type=int, default=None, help="The number of emails sent over one connection.")
+        parser.add_argument('--loop', action='store_true', help="Keep polling the outbox instead of exiting when it is empty.")
+        parser.add_argument('--interval', type=float, default=5.0, help="The number of seconds to wait between polls.")
+
+    def handle(self, *args, **options):
+        """
+        Delivers batches of due emails until the outbox is empty, or forever with the --loop option.
+
+        Parameters
+        ----------
+        *args
+            Non key-worded variable number arguments.
+        **options : dict
+            The command options.
+        """
+        while True:
+            sent, failed = deliver_queued_emails(options['batch_size'])
+            if sent or failed:
+                self.stdout.write("Sent {} emails, {} failed.".format(sent, failed))
+            elif not options['loop']:
+                break
+            if not sent and options['loop']:
+                time.sleep(options['interval'])
@@ -1,3 +1,83 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class OutgoingEmail(models.Model):
+    """
+    A class that extends Django's Model class.
+    It is used to model an email waiting in the outbox to be delivered by the background email worker.
+
+    Attributes
+    ----------
+    subject : str
+        The email subject.
+    body : str
+        The email body.
+    from_email : str
+        The sender's email address. The DEFAULT_FROM_EMAIL setting is used if it is empty.
+    to : str
+        A comma separated list of the recipients' email addresses.
+    status : str
+        The delivery status of the email.
+    attempts : int
+        The number of failed delivery attempts.
+    next_attempt : datetime.datetime
+        The date and time from which the email may be delivered.
+    last_error : str
+        The error of the last failed delivery attempt.
+    create_date : datetime.datetime
+        The date and time at which the email was queued.
+    sent_date : datetime.datetime
+        The date and time at which the email was delivered.
+
+    Methods
+    -------
+    __str__
+        Returns a string representation of the OutgoingEmail object.
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    to = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    create_date = models.DateTimeField(default=timezone.now)
+    sent_date = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        """
+        An inner class that specifies the meta data of the Model class.
+        In this case the model's default field configurations have been Overrided.
+
+        Attributes
+        ----------
+        indexes : list
+            Contains indexes to be created on the model.
+            In this case an index on 'status' and 'next_attempt' is defined for finding the emails that are due.
+        """
+        indexes = [
+            models.Index(fields=["status", "next_attempt"], name='outbox_due_idx')
+        ]
+
+    def __str__(self):
+        """
+        A method that returns a string representation of an OutgoingEmail object.
+        In this case, the 'subject' and the recipients of the email are used as the string representation.
+
+        Returns
+        -------
+        str
+            The subject and the recipients of the email.
+        """
+        return "{} ({})".format(self.subject, self.to)
@@ -0,0 +1,127 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+from Accounts.models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(subject, body, to, from_email=''):
+    """
+    A function that queues an email in the outbox instead of sending it.
+    The email is delivered later by the send_queued_email management command.
+
+    Parameters
+    ----------
+    subject : str
+        The email subject.
+    body : str
+        The email body.
+    to : list
+        The recipients' email addresses.
+    from_email : str, optional
+        The sender's email address. The DEFAULT_FROM_EMAIL setting is used if it is empty.
+
+    Returns
+    -------
+    OutgoingEmail object
+        The queued email.
+    """
+    return OutgoingEmail.objects.create(subject=subject, body=body, to=",".join(to), from_email=from_email or '')
+
+
+def deliver_queued_emails(batch_size=None):
+    """
+    A function that delivers a batch of due emails from the outbox over a single email backend connection.
+    A failed email is retried with an exponential backoff until it reaches EMAIL_OUTBOX_MAX_ATTEMPTS attempts
+    and is then marked as failed. The emails are claimed first, so workers running at the same time do not send them twice.
+
+    Parameters
+    ----------
+    batch_size : int, optional
+        The maximum number of emails delivered. Defaults to the EMAIL_OUTBOX_BATCH_SIZE setting.
+
+    Returns
+    -------
+    tuple
+        The number of delivered emails and the number of failed delivery attempts.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    now = timezone.now()
+    due = OutgoingEmail.objects.filter(status=OutgoingEmail.PENDING, next_attempt__lte=now).order_by('next_attempt', 'id')[:batch_size]
+    emails = [email for email in due if _claim(email, now)]
+    if not emails:
+        return 0, 0
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as error:
+        for email in emails:
+            _record_failure(email, error)
+        return 0, len(emails)
+    try:
+        for email in emails:
+            message = EmailMessage(email.subject, email.body, email.from_email or None, email.to.split(","), connection=connection)
+            try:
+                message.send()
+            except Exception as error:
+                _record_failure(email, error)
+                failed += 1
+            else:
+                email.status = OutgoingEmail.SENT
+                email.sent_date = timezone.now()
+                email.save(update_fields=['status', 'sent_date'])
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def _claim(email, now):
+    """
+    A function that claims a due email for delivery by moving its next attempt past the claim timeout.
+    The email is only updated if no other worker claimed it since it was fetched, which a single conditional UPDATE checks
+    on every database. If the worker stops before delivering the email, it is due again once the claim timed out.
+
+    Parameters
+    ----------
+    email : OutgoingEmail object
+        The due email.
+    now : datetime.datetime
+        The time the email was found due at.
+
+    Returns
+    -------
+    bool
+        True if the email was claimed, False if another worker claimed it first.
+    """
+    claimed_until = now + timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT)
+    claimed = OutgoingEmail.objects.filter(pk=email.pk, status=OutgoingEmail.PENDING, next_attempt=email.next_attempt).update(next_attempt=claimed_until)
+    email.next_attempt = claimed_until
+    return claimed == 1
+
+
+def _record_failure(email, error):
+    """
+    A function that records a failed delivery attempt of an email and schedules its next attempt.
+
+    Parameters
+    ----------
+    email : OutgoingEmail object
+        The email that could not be delivered.
+    error : Exception
+        The delivery error.
+    """
+    email.attempts += 1
+    email.last_error = "{}: {}".format(type(error).__name__, error)
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = OutgoingEmail.FAILED
+        logger.error("Giving up on email %s after %s attempts: %s", email.pk, email.attempts, email.last_error)
+    else:
+        delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (email.attempts - 1)
+        email.next_attempt = timezone.now() + timedelta(seconds=delay)
+        logger.warning("Delivery of email %s failed, retrying in %s seconds: %s", email.pk, delay, email.last_error)
+    email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt'])
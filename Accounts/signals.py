@@ -0,0 +1,44 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from Accounts.cache import invalidate_user
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """
+    A receiver that removes a user from the cache when the user is saved or deleted,
+    such as when the user updates their account details or changes or resets their password.
+
+    Parameters
+    ----------
+    sender : class
+        The User model class.
+    instance : User object
+        The saved or deleted user.
+    **kwargs : dict
+        Variable dictionary arguments.
+    """
+    invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def user_signed_out(sender, request, user, **kwargs):
+    """
+    A receiver that removes a user from the cache when the user signs out.
+
+    Parameters
+    ----------
+    sender : class
+        The class of the signed out user.
+    request : HttpRequest object
+        The sign out request.
+    user : User object
+        The signed out user or None if the request was anonymous.
+    **kwargs : dict
+        Variable dictionary arguments.
+    """
+    if user is not None:
+        invalidate_user(user.pk)
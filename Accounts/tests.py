@@ -1,3 +1,93 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
 from django.test import TestCase
+from django.urls import resolve, reverse
+from django.utils.http import urlencode
+from Accounts import async_views
+from Accounts.backends import CachedModelBackend
+from Accounts.cache import get_cached_user
+from Accounts.models import OutgoingEmail
+from Accounts.outbox import _claim, deliver_queued_emails, queue_email
+from Notes.benchmarks import _load_urls
 
-# Create your tests here.
+
+class CachedModelBackendTests(TestCase):
+    """
+    A class that tests the resolution of signed in users from the cache.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+
+    def test_per_process_cache_reads_sessions_and_users_from_the_database(self):
+        if settings.SHARED_CACHE:
+            self.skipTest("A shared cache is configured.")
+        self.assertEqual(settings.SESSION_ENGINE, 'django.contrib.sessions.backends.db')
+        self.assertEqual(settings.AUTHENTICATION_BACKENDS, ['django.contrib.auth.backends.ModelBackend'])
+
+    def test_user_is_cached_until_saved(self):
+        backend = CachedModelBackend()
+        self.assertEqual(backend.get_user(self.user.pk), self.user)
+        self.assertEqual(get_cached_user(self.user.pk), self.user)
+        with self.assertNumQueries(0):
+            backend.get_user(self.user.pk)
+        self.user.set_password('another long password')
+        self.user.save()
+        self.assertIsNone(get_cached_user(self.user.pk))
+
+    def test_deleted_user_is_not_resolved(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        user_id = self.user.pk
+        self.user.delete()
+        self.assertIsNone(backend.get_user(user_id))
+
+
+class OutboxTests(TestCase):
+    """
+    A class that tests the delivery of queued emails.
+    """
+    def setUp(self):
+        self.email = queue_email('Welcome', 'Hello', ['writer@example.com'])
+
+    def test_email_is_delivered_once(self):
+        self.assertEqual(deliver_queued_emails(), (1, 0))
+        self.assertEqual(deliver_queued_emails(), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(OutgoingEmail.objects.get(pk=self.email.pk).status, OutgoingEmail.SENT)
+
+    def test_email_claimed_by_another_worker_is_skipped(self):
+        fetched = OutgoingEmail.objects.get(pk=self.email.pk)
+        self.assertTrue(_claim(OutgoingEmail.objects.get(pk=self.email.pk), fetched.next_attempt))
+        self.assertFalse(_claim(fetched, fetched.next_attempt))
+        self.assertEqual(deliver_queued_emails(), (0, 0))
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class AsyncViewTests(TestCase):
+    """
+    A class that tests the async email views, which are routed when the ASYNC_VIEWS setting is True.
+    """
+    def setUp(self):
+        _load_urls(True)
+        self.addCleanup(_load_urls, settings.ASYNC_VIEWS)
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+
+    def test_async_views_are_routed(self):
+        self.assertIs(resolve(reverse('Accounts:send_username')).func, async_views.send_username)
+
+    async def test_forms_are_rendered(self):
+        response = await self.async_client.get(reverse('Accounts:signup'))
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        response = await self.async_client.get(reverse('Accounts:send_username'))
+        self.assertContains(response, 'name="email"')
+
+    async def test_submitted_form_is_handed_to_the_sync_view(self):
+        #The form is urlencoded, since the multipart bodies of the async client cannot be parsed in Django 3.1.
+        data = urlencode({'email': 'writer@example.com'})
+        response = await self.async_client.post(reverse('Accounts:send_username'), data, content_type='application/x-www-form-urlencoded')
+        self.assertRedirects(response, reverse('Accounts:send_username_done'), fetch_redirect_response=False)
+        emails = await sync_to_async(list)(OutgoingEmail.objects.values_list('to', flat=True))
+        self.assertEqual(emails, ['writer@example.com'])
+        self.assertEqual(len(mail.outbox), 0)
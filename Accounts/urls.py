@@ -12,7 +12,8 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from . import views
+from . import async_views, views
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
 from Accounts.forms import SignInForm, ForgotPasswordForm, NewPasswordForm, ChangePasswordForm
@@ -21,6 +22,9 @@ from django.urls import reverse_lazy
 #Namespace for the Accounts app.
 app_name = 'Accounts'
 
+#The module of the views that queue emails, which are native async views when the project is served over ASGI.
+email_views = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
     #A url mapped to a view that generates an email confirmation request.
     path('email_confirmation/<uidb64>/<token>/',views.email_confirmation, name='email_confirmation'),
@@ -43,13 +47,13 @@ urlpatterns = [
     #A url mapped to a view that handles a user signout.
     path('signout/', auth_views.LogoutView.as_view(), name = 'logout'),
     #A url mapped to a view that renders the signup page.
-    path('signup/', views.signup, name = 'signup'),
+    path('signup/', email_views.signup, name = 'signup'),
     #A url mapped to a view that renders a response when a user confirms their email address.
     path('signup/complete/',views.SignUpCompleteView.as_view(), name='signup_complete'),
     #A url mapped to a view that renders a response when a user signs up.
     path('signup/done/',views.SignUpDoneView.as_view(), name='signup_done'),
     #A url mapped to a view that renders a forgot username page.
-    path('username_send/', views.send_username, name='send_username'),
+    path('username_send/', email_views.send_username, name='send_username'),
     #A url mapped to a view that renders a response when a user's username is emailed to their email address.
     path('username_send_done/',views.SendUsernameDoneView.as_view(), name='send_username_done'),
 ]
@@ -1,9 +1,9 @@
 from Accounts.forms import SignUpForm, SignInForm, ForgotUserNameForm, UpdateUserForm
+from Accounts.outbox import queue_email
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.sites.shortcuts import get_current_site
-from django.core.mail import EmailMessage
 from django.db.models import Q
 from django.shortcuts import render, redirect
 from django.template.loader import render_to_string
@@ -56,7 +56,7 @@ def signup(request):
         renders the signup page.
         Validates the SignUpForm data.
         Creates a new User object with 'is_active' status as 'False' if the SignUpForm POST data is valid.
-        Sends an email confirmation email to a newly created user.
+        Queues an email confirmation email to a newly created user in the outbox.
         An activation link is created by using:
             The desired protocol.
             the current domain name.
@@ -99,8 +99,7 @@ def signup(request):
                 'protocol': 'http',
             })
             email_id = form.cleaned_data.get('email')
-            email = EmailMessage(mail_subject, message, to=[email_id])
-            email.send()
+            queue_email(mail_subject, message, [email_id])
             return redirect('Accounts:signup_done')
         return render(request, 'Accounts/signup.html', {'form':form, 'i_agree':i_agree})
     else:
@@ -191,7 +190,7 @@ def email_confirmation(request, uidb64, token):
 def send_username(request):
     """
     A view that sends an email to a user if they forget their username_send.
-    An email is sent to a registered email address that the user enters after validation.
+    An email is queued in the outbox for a registered email address that the user enters after validation.
     A response message is rendered irrespective of whether the email is sent or not. This
     is done in order to avoid exposure of user data.
 
@@ -223,8 +222,7 @@ def send_username(request):
                 message = render_to_string('Accounts/username_send_email.html', {
                     'user': user
                 })
-                email = EmailMessage(mail_subject, message, to=[email_id])
-                email.send()
+                queue_email(mail_subject, message, [email_id])
 
             return redirect('Accounts:send_username_done')
         return render(request, 'Accounts/username_send_form.html', {'form':form})
@@ -0,0 +1,50 @@
+from django.db.backends.postgresql import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    A class that extends Django's PostgreSQL database wrapper with health checks of persistent connections.
+    When the CONN_HEALTH_CHECKS database setting is True, a connection kept open by CONN_MAX_AGE is checked
+    the first time it is used by every request and replaced if the server closed it,
+    instead of failing the request's first query.
+    """
+    #True once the connection was checked or opened during the current request.
+    health_check_done = False
+
+    def get_new_connection(self, conn_params):
+        """
+        Opens a new connection, which needs no health check during the current request.
+
+        Parameters
+        ----------
+        conn_params : dict
+            The connection parameters.
+
+        Returns
+        -------
+        psycopg2.extensions.connection
+            The connection.
+        """
+        connection = super(DatabaseWrapper, self).get_new_connection(conn_params)
+        self.health_check_done = True
+        return connection
+
+    def ensure_connection(self):
+        """
+        Guarantees that a working connection to the database is established.
+        A persistent connection is checked once per request, outside of transactions.
+        """
+        if (self.connection is not None and self.settings_dict.get('CONN_HEALTH_CHECKS')
+                and not self.health_check_done and not self.in_atomic_block):
+            if not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        super(DatabaseWrapper, self).ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        """
+        Closes the connection if it is unusable or outlived CONN_MAX_AGE, as Django does at the start and end of every request,
+        and schedules a health check for its next use.
+        """
+        super(DatabaseWrapper, self).close_if_unusable_or_obsolete()
+        self.health_check_done = False
@@ -0,0 +1,52 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    A class that extends Django's SQLite database wrapper for concurrent use by several workers.
+    Two extra keys are read from the database OPTIONS setting:
+    'pragmas', a dictionary of PRAGMA statements run on every new connection, such as journal_mode=WAL,
+    and 'transaction_mode', the mode of the transactions started by atomic blocks.
+    With the IMMEDIATE mode a transaction takes the write lock when it begins, so that a writer waits for
+    the busy timeout instead of failing with "database is locked" when it upgrades a read lock to a write lock.
+    The remaining OPTIONS, such as 'timeout', are passed to sqlite3.connect().
+    """
+    def get_connection_params(self):
+        """
+        Returns the parameters of sqlite3.connect() without the keys handled by this wrapper.
+
+        Returns
+        -------
+        dict
+            The connection parameters.
+        """
+        params = super(DatabaseWrapper, self).get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        """
+        Opens a new connection and runs the configured pragmas on it.
+
+        Parameters
+        ----------
+        conn_params : dict
+            The connection parameters.
+
+        Returns
+        -------
+        sqlite3.Connection
+            The connection.
+        """
+        connection = super(DatabaseWrapper, self).get_new_connection(conn_params)
+        for name, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            connection.execute('PRAGMA {} = {}'.format(name, value))
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        """
+        Starts a transaction in the configured mode.
+        """
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        self.cursor().execute('BEGIN {}'.format(mode) if mode else 'BEGIN')
@@ -0,0 +1,62 @@
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+
+
+def _is_authenticated(request):
+    """
+    A function that loads the user of a request and checks whether they are authenticated.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+
+    Returns
+    -------
+    bool
+        True if the user is authenticated.
+    """
+    return request.user.is_authenticated
+
+
+async def load_user(request):
+    """
+    A function that loads the user of a request in a worker thread.
+    The user is loaded lazily from the session and the database, which cannot be accessed from the event loop,
+    so an async view loads it before it renders a template that shows the user.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+
+    Returns
+    -------
+    bool
+        True if the user is authenticated.
+    """
+    return await sync_to_async(_is_authenticated)(request)
+
+
+def async_login_required(view):
+    """
+    A decorator that redirects anonymous users to the sign in page before an async view is run.
+    It is the counterpart of Django's login_required decorator, which only supports sync views in Django 3.1.
+
+    Parameters
+    ----------
+    view : function
+        The async view.
+
+    Returns
+    -------
+    function
+        The decorated async view.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not await load_user(request):
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,222 @@
+import math
+import threading
+
+#The number of linear sub-buckets in every power of two range of a histogram.
+#It bounds the relative error of the reported quantiles to about 1/16.
+SUB_BUCKETS = 16
+#The quantiles reported for every histogram.
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+class Histogram:
+    """
+    A class that represents an HDR-style histogram of non-negative values.
+    Values are counted in log-linear buckets: every power of two range is split into SUB_BUCKETS linear buckets,
+    so the memory used is logarithmic in the range of the values while quantiles keep a bounded relative error.
+
+    Attributes
+    ----------
+    counts : dict
+        The number of values counted in every bucket by bucket index.
+    count : int
+        The number of recorded values.
+    total : float
+        The sum of the recorded values.
+    maximum : float
+        The largest recorded value.
+
+    Methods
+    -------
+    record(value)
+        Counts a value.
+    quantile(q)
+        Returns an estimate of a quantile of the recorded values.
+    """
+    def __init__(self, unit=1e-6):
+        """
+        Initializes a Histogram object.
+
+        Parameters
+        ----------
+        unit : float, optional
+            The smallest distinguishable value. Values are counted as multiples of it.
+        """
+        self.unit = unit
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def record(self, value):
+        """
+        A method that counts a value.
+
+        Parameters
+        ----------
+        value : float
+            The value.
+        """
+        index = self._index(value / self.unit)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+    def quantile(self, q):
+        """
+        A method that returns an estimate of a quantile of the recorded values.
+
+        Parameters
+        ----------
+        q : float
+            The quantile between 0 and 1.
+
+        Returns
+        -------
+        float
+            The midpoint of the bucket that holds the quantile, or 0 if no value was recorded.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = self._bounds(index)
+                return min((low + high) / 2 * self.unit, self.maximum)
+        return self.maximum
+
+    @staticmethod
+    def _index(units):
+        """
+        A method that returns the index of the bucket that counts a value.
+
+        Parameters
+        ----------
+        units : float
+            The value as a multiple of the histogram's unit.
+
+        Returns
+        -------
+        int
+            The bucket index.
+        """
+        if units < 1:
+            return 0
+        exponent = int(math.log2(units))
+        return 1 + exponent * SUB_BUCKETS + int((units / 2 ** exponent - 1) * SUB_BUCKETS)
+
+    @staticmethod
+    def _bounds(index):
+        """
+        A method that returns the range of values counted by a bucket.
+
+        Parameters
+        ----------
+        index : int
+            The bucket index.
+
+        Returns
+        -------
+        tuple
+            The lower and upper bounds of the bucket as multiples of the histogram's unit.
+        """
+        if index == 0:
+            return 0.0, 1.0
+        exponent, sub_bucket = divmod(index - 1, SUB_BUCKETS)
+        width = 2 ** exponent / SUB_BUCKETS
+        low = 2 ** exponent + sub_bucket * width
+        return low, low + width
+
+
+class RequestMetrics:
+    """
+    A class that aggregates request measurements per view in the current process.
+
+    Attributes
+    ----------
+    histograms : dict
+        The histograms of every measurement by (measurement, view name).
+
+    Methods
+    -------
+    record(view, duration, queries, sql_duration, template_duration)
+        Records the measurements of a request.
+    render()
+        Returns the measurements in the Prometheus text exposition format.
+    """
+    #The reported measurements as (name, help text, histogram unit).
+    MEASUREMENTS = (
+        ('request_duration_seconds', "Wall time spent handling requests.", 1e-6),
+        ('sql_queries', "Number of SQL queries run per request.", 1),
+        ('sql_duration_seconds', "Time spent in SQL queries per request.", 1e-6),
+        ('template_render_seconds', "Time spent rendering templates per request.", 1e-6),
+    )
+
+    def __init__(self):
+        """
+        Initializes a RequestMetrics object.
+        """
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def record(self, view, duration, queries, sql_duration, template_duration):
+        """
+        A method that records the measurements of a request.
+
+        Parameters
+        ----------
+        view : str
+            The name of the URL pattern that handled the request.
+        duration : float
+            The wall time of the request in seconds.
+        queries : int
+            The number of SQL queries.
+        sql_duration : float
+            The time spent in SQL queries in seconds.
+        template_duration : float
+            The time spent rendering templates in seconds.
+        """
+        values = (duration, queries, sql_duration, template_duration)
+        with self.lock:
+            for (name, _, unit), value in zip(self.MEASUREMENTS, values):
+                key = (name, view)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(unit)
+                self.histograms[key].record(value)
+
+    def render(self, prefix='diaryapp_'):
+        """
+        A method that returns the measurements in the Prometheus text exposition format.
+        Every measurement is exposed as a summary with quantiles, a sum and a count per view.
+
+        Parameters
+        ----------
+        prefix : str, optional
+            The prefix of the metric names.
+
+        Returns
+        -------
+        str
+            The metrics.
+        """
+        lines = []
+        with self.lock:
+            for name, help_text, _ in self.MEASUREMENTS:
+                metric = prefix + name
+                lines.append("# HELP {} {}".format(metric, help_text))
+                lines.append("# TYPE {} summary".format(metric))
+                for (key, view), histogram in sorted(self.histograms.items()):
+                    if key != name:
+                        continue
+                    label = 'view="{}"'.format(view.replace('\\', '\\\\').replace('"', '\\"'))
+                    for q in QUANTILES:
+                        lines.append('{}{{{},quantile="{}"}} {:.6g}'.format(metric, label, q, histogram.quantile(q)))
+                    lines.append('{}_sum{{{}}} {:.6g}'.format(metric, label, histogram.total))
+                    lines.append('{}_count{{{}}} {}'.format(metric, label, histogram.count))
+        return "\n".join(lines) + "\n"
+
+
+#The request metrics of the current process.
+request_metrics = RequestMetrics()
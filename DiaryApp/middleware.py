@@ -0,0 +1,447 @@
+import asyncio
+import contextvars
+import json
+import logging
+import mimetypes
+import os
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from DiaryApp.metrics import request_metrics
+
+logger = logging.getLogger(__name__)
+
+#The profile of the request being handled in the current thread or task.
+#It is read by the execute wrapper of the database connections and by the ProfilingDjangoTemplates template backend.
+current_profile = contextvars.ContextVar('request_profile', default=None)
+
+
+class _RequestProfile:
+    """
+    A class that collects the measurements of a single request.
+
+    Attributes
+    ----------
+    queries : int
+        The number of SQL queries.
+    sql_duration : float
+        The time spent in SQL queries in seconds.
+    template_duration : float
+        The time spent rendering templates in seconds.
+    template_depth : int
+        The number of template renders in progress, used to time only the outermost one.
+    """
+    def __init__(self):
+        """
+        Initializes a _RequestProfile object.
+        """
+        self.queries = 0
+        self.sql_duration = 0.0
+        self.template_duration = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Times a SQL query. It is called by the execute wrapper installed on every database connection.
+
+        Parameters
+        ----------
+        execute : callable
+            The function that runs the query.
+        sql : str
+            The query.
+        params : list
+            The query parameters.
+        many : bool
+            True if the query is run with executemany().
+        context : dict
+            The query context.
+
+        Returns
+        -------
+        object
+            The result of the query.
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_duration += time.perf_counter() - started
+
+
+def _profiled_execute(execute, sql, params, many, context):
+    """
+    A function that times a SQL query for the current request's profile, if any.
+    It is installed once as an execute wrapper of every database connection.
+    The profile is found through a context variable, so that queries run by sync_to_async() in a worker thread
+    on behalf of an async view are counted for the request that awaits them.
+
+    Parameters
+    ----------
+    execute : callable
+        The function that runs the query.
+    sql : str
+        The query.
+    params : list
+        The query parameters.
+    many : bool
+        True if the query is run with executemany().
+    context : dict
+        The query context.
+
+    Returns
+    -------
+    object
+        The result of the query.
+    """
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def _instrument_connection(connection, **kwargs):
+    """
+    A function that installs the profiling execute wrapper on a database connection once.
+    It is also connected to the connection_created signal, so that connections opened in worker threads are instrumented.
+
+    Parameters
+    ----------
+    connection : DatabaseWrapper object
+        The database connection.
+    **kwargs : dict
+        The signal's arguments.
+    """
+    if _profiled_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_profiled_execute)
+
+
+class RequestProfilingMiddleware:
+    """
+    A middleware that measures the wall time, SQL query count, SQL time and template render time of every request.
+    The measurements are aggregated per URL name in histograms that are exposed by the metrics view.
+    Requests exceeding the PROFILING_QUERY_BUDGET or PROFILING_LATENCY_BUDGET_MS settings are logged.
+    The body of a streaming response is produced after the middleware returns and is not measured.
+    The middleware supports both WSGI and ASGI, so that it does not force async views to run in a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """
+        Initializes the middleware and instruments database connections once per process.
+        Template rendering is timed by the ProfilingDjangoTemplates backend configured in the TEMPLATES setting.
+
+        Parameters
+        ----------
+        get_response : callable
+            The next middleware or view.
+        """
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            #Marks the middleware as a coroutine function for Django, as MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        connection_created.connect(_instrument_connection, dispatch_uid='request_profiling')
+
+    def __call__(self, request):
+        """
+        Handles a request while measuring it.
+
+        Parameters
+        ----------
+        request : HttpRequest object
+            An HttpRequest object that contains metadata about a request.
+
+        Returns
+        -------
+        HttpResponse
+            The response of the next middleware or view.
+        """
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        for connection in connections.all():
+            _instrument_connection(connection)
+        profile = _RequestProfile()
+        token = current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        self._record(request, profile, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        """
+        Handles a request while measuring it when the project is served over ASGI.
+
+        Parameters
+        ----------
+        request : HttpRequest object
+            An HttpRequest object that contains metadata about a request.
+
+        Returns
+        -------
+        HttpResponse
+            The response of the next middleware or view.
+        """
+        profile = _RequestProfile()
+        token = current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        self._record(request, profile, time.perf_counter() - started)
+        return response
+
+    def _record(self, request, profile, duration):
+        """
+        A method that records the measurements of a request and logs it if it is over budget.
+
+        Parameters
+        ----------
+        request : HttpRequest object
+            An HttpRequest object that contains metadata about a request.
+        profile : _RequestProfile object
+            The request's measurements.
+        duration : float
+            The request's wall time in seconds.
+        """
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        request_metrics.record(view, duration, profile.queries, profile.sql_duration, profile.template_duration)
+        if profile.queries > settings.PROFILING_QUERY_BUDGET or duration * 1000 > settings.PROFILING_LATENCY_BUDGET_MS:
+            logger.warning(
+                "Request over budget: %s %s (%s) took %.1f ms with %d queries (%.1f ms SQL, %.1f ms templates)",
+                request.method, request.path, view, duration * 1000, profile.queries,
+                profile.sql_duration * 1000, profile.template_duration * 1000,
+            )
+
+
+def _accepted_encodings(header):
+    """
+    A function that parses an Accept-Encoding header into the quality value of every content coding.
+    A coding without a q parameter has the quality 1, and one with an invalid q parameter has the quality 0.
+
+    Parameters
+    ----------
+    header : str
+        The Accept-Encoding header.
+
+    Returns
+    -------
+    dict
+        The quality values between 0 and 1 by lowercase content coding, including '*' if it is listed.
+    """
+    accepted = {}
+    for item in header.split(','):
+        coding, *params = item.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+class _StaticFile:
+    """
+    A class that describes a collected static file and its precompressed copies.
+
+    Attributes
+    ----------
+    path : str
+        The file's path.
+    content_type : str
+        The file's content type.
+    last_modified : int
+        The file's modification time as a timestamp.
+    encodings : dict
+        The paths of the compressed copies by content encoding, preferred first.
+    immutable : bool
+        True if the file has a content hashed name, so that it never changes.
+    """
+    def __init__(self, path, immutable):
+        """
+        Initializes a _StaticFile object.
+
+        Parameters
+        ----------
+        path : str
+            The file's path.
+        immutable : bool
+            True if the file has a content hashed name.
+        """
+        self.path = path
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.last_modified = int(os.stat(path).st_mtime)
+        self.encodings = {}
+        for encoding, extension in (('br', '.br'), ('gzip', '.gz')):
+            if os.path.isfile(path + extension):
+                self.encodings[encoding] = path + extension
+        self.immutable = immutable
+
+
+class StaticFilesMiddleware:
+    """
+    A middleware that serves the static files collected in STATIC_ROOT by the CompressedManifestStaticFilesStorage.
+    The files are indexed once when the middleware is loaded, so serving a file costs a dictionary lookup.
+    The brotli or gzip compressed copy of a file is served to clients that accept it.
+    Files with a content hashed name are cached by browsers for a year, the others for STATIC_MAX_AGE seconds.
+    The middleware is not used when STATIC_ROOT has not been collected, such as while developing with runserver,
+    which serves the static files itself.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """
+        Initializes the middleware and indexes the collected static files.
+
+        Parameters
+        ----------
+        get_response : callable
+            The next middleware or view.
+
+        Raises
+        ------
+        MiddlewareNotUsed
+            If STATIC_ROOT does not exist.
+        """
+        if not settings.STATIC_ROOT or not os.path.isdir(settings.STATIC_ROOT):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            #Marks the middleware as a coroutine function for Django, as MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        self.files = self._index(settings.STATIC_ROOT)
+
+    @staticmethod
+    def _index(root):
+        """
+        A method that indexes the collected static files by URL path.
+
+        Parameters
+        ----------
+        root : str
+            The STATIC_ROOT directory.
+
+        Returns
+        -------
+        dict
+            The _StaticFile objects by URL path.
+        """
+        try:
+            with open(os.path.join(root, 'staticfiles.json')) as file:
+                hashed = set(json.load(file)['paths'].values())
+        except (OSError, ValueError, KeyError):
+            hashed = set()
+        files = {}
+        for directory, _, names in os.walk(root):
+            for name in names:
+                if name.endswith(('.br', '.gz')):
+                    continue
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, root).replace(os.sep, '/')
+                files[settings.STATIC_URL + relative] = _StaticFile(path, relative in hashed)
+        return files
+
+    def __call__(self, request):
+        """
+        Serves a request for a collected static file or passes the request on.
+
+        Parameters
+        ----------
+        request : HttpRequest object
+            An HttpRequest object that contains metadata about a request.
+
+        Returns
+        -------
+        HttpResponse
+            The static file or the response of the next middleware or view.
+        """
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        static_file = self.files.get(request.path_info)
+        if static_file is None or request.method not in ('GET', 'HEAD'):
+            return self.get_response(request)
+        return self._serve(request, static_file)
+
+    async def __acall__(self, request):
+        """
+        Serves a request for a collected static file or passes the request on when the project is served over ASGI.
+
+        Parameters
+        ----------
+        request : HttpRequest object
+            An HttpRequest object that contains metadata about a request.
+
+        Returns
+        -------
+        HttpResponse
+            The static file or the response of the next middleware or view.
+        """
+        static_file = self.files.get(request.path_info)
+        if static_file is None or request.method not in ('GET', 'HEAD'):
+            return await self.get_response(request)
+        return self._serve(request, static_file)
+
+    def _serve(self, request, static_file):
+        """
+        A method that returns a static file's response in the best encoding the client accepts.
+        The copy whose encoding has the highest quality value in the Accept-Encoding header is served,
+        and encodings with a quality value of 0 are never served.
+
+        Parameters
+        ----------
+        request : HttpRequest object
+            An HttpRequest object that contains metadata about a request.
+        static_file : _StaticFile object
+            The requested file.
+
+        Returns
+        -------
+        HttpResponse
+            The file, an empty response to a HEAD request or a 304 response if the client's copy is up to date.
+        """
+        accepted = _accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        qualities = {encoding: accepted.get(encoding, accepted.get('*', 0.0)) for encoding in static_file.encodings}
+        #The copies are listed preferred first, and sorted() keeps that order between equal quality values.
+        encoding = next((encoding for encoding in sorted(qualities, key=lambda encoding: -qualities[encoding]) if qualities[encoding] > 0), None)
+        path = static_file.encodings[encoding] if encoding else static_file.path
+        size = os.path.getsize(path)
+        etag = '"{:x}-{:x}{}"'.format(static_file.last_modified, size, '-' + encoding if encoding else '')
+        response = get_conditional_response(request, etag=etag, last_modified=static_file.last_modified)
+        if response is None:
+            if request.method == 'HEAD':
+                response = HttpResponse(content_type=static_file.content_type)
+            else:
+                response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+                #FileResponse names the file after the compressed copy.
+                del response['Content-Disposition']
+            response['Content-Length'] = size
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(static_file.last_modified)
+        if static_file.encodings:
+            response['Vary'] = 'Accept-Encoding'
+        if static_file.immutable:
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = 'public, max-age={}'.format(settings.STATIC_MAX_AGE)
+        return response
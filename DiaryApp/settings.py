@@ -43,7 +43,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'DiaryApp.middleware.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'DiaryApp.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -52,11 +54,21 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+#Serves the read pages and the email forms with native async views, which is meant for ASGI servers such as uvicorn.
+#Under WSGI, Django runs every async view in its own event loop, so it should stay off.
+ASYNC_VIEWS = os.environ.get('DIARYAPP_ASYNC_VIEWS') == '1'
+
+#Requests running more SQL queries or taking longer than these budgets are logged by the RequestProfilingMiddleware.
+PROFILING_QUERY_BUDGET = 25
+PROFILING_LATENCY_BUDGET_MS = 500
+
 ROOT_URLCONF = 'DiaryApp.urls'
 
+#The Django template backend, extended so that the RequestProfilingMiddleware measures the time spent rendering templates.
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'DiaryApp.template_backends.ProfilingDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -78,16 +90,148 @@ CKEDITOR_CONFIGS = {
          'height' : 800,
     }
 }
+
+#The number of notes listed on a page of a diary.
+NOTES_PAGE_SIZE = 50
+
+#The maximum number of results returned by a note search.
+NOTES_SEARCH_RESULTS = 50
+
+#The number of notes fetched from the database at a time while exporting a user's diaries.
+EXPORT_CHUNK_SIZE = 200
+
+#The number of notes created per transaction while importing an archive.
+IMPORT_BATCH_SIZE = 500
+
+#The maximum number of notes deleted, moved or copied by a single bulk operation.
+NOTES_BULK_LIMIT = 5000
+
+#The number of seconds a note's rendered content is cached. The cache key changes whenever the note is updated.
+NOTE_FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+#The size in bytes above which a note is streamed in read mode, and the number of characters streamed at a time.
+NOTE_STREAMING_THRESHOLD = 256 * 1024
+NOTE_STREAMING_CHUNK_SIZE = 64 * 1024
+
+#The minimum size in bytes of the chunks of a note's content sent by the reader's JSON API. Chunks end between top-level elements.
+NOTE_READER_CHUNK_SIZE = 16 * 1024
+
+#Whether note contents are written compressed, and the zlib compression level. Compressed contents are always readable.
+NOTE_CONTENT_COMPRESSION = True
+NOTE_CONTENT_COMPRESSION_LEVEL = 6
+
+#The maximum number of deltas stored between two full snapshots of a note's revisions.
+NOTE_REVISION_SNAPSHOT_INTERVAL = 20
+#The number of days for which every revision of a note is kept before compact_revisions thins them out.
+NOTE_REVISION_RETENTION_DAYS = 30
+#The number of notes of a deleted diary purged per transaction by purge_deleted_diaries,
+#and the number of seconds it waits between transactions so that other writers get the database in between.
+DIARY_PURGE_BATCH_SIZE = 500
+DIARY_PURGE_PAUSE = 0.05
+#The number of notes matched by each statement of a bulk delete, move or copy, which keeps the statements under
+#SQLite's limit of 999 bound parameters.
+BULK_NOTES_BATCH_SIZE = 500
+#The number of diaries recounted per transaction by reconcile_diary_counters.
+DIARY_RECONCILE_BATCH_SIZE = 500
+
+#The maximum number of changes returned by a request to the change feed, and deleted per query by compact_change_feed.
+SYNC_BATCH_SIZE = 1000
+
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+#The database profiles. The profile in use is chosen with the DIARYAPP_DB_PROFILE environment variable.
+DATABASE_PROFILES = {
+    #Django's default SQLite configuration.
+    'sqlite-basic': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    #SQLite tuned for several workers: WAL lets readers run alongside a writer, and writers wait for each other
+    #for up to 'timeout' seconds. Transactions take the write lock when they begin.
+    'sqlite': {
+        'ENGINE': 'DiaryApp.db.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'cache_size': -20000,
+                'mmap_size': 256 * 1024 * 1024,
+                'temp_store': 'MEMORY',
+            },
+        },
+    },
+    #PostgreSQL with persistent connections that are checked before they are reused.
+    'postgresql': {
+        'ENGINE': 'DiaryApp.db.postgresql',
+        'NAME': os.environ.get('DIARYAPP_DB_NAME', 'diaryapp'),
+        'USER': os.environ.get('DIARYAPP_DB_USER', ''),
+        'PASSWORD': os.environ.get('DIARYAPP_DB_PASSWORD', ''),
+        'HOST': os.environ.get('DIARYAPP_DB_HOST', ''),
+        'PORT': os.environ.get('DIARYAPP_DB_PORT', ''),
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+DATABASE_PROFILE = os.environ.get('DIARYAPP_DB_PROFILE', 'sqlite')
+
+DATABASES = {
+    'default': DATABASE_PROFILES[DATABASE_PROFILE],
+}
+
+#The number of seconds a change waits before the change feed returns it. SQLite commits one transaction at a time,
+#so its changes are visible in id order. PostgreSQL can commit concurrent transactions out of id order, and a client
+#whose cursor passed a change before it was committed would never see it. The lag covers transactions shorter than it.
+SYNC_VISIBILITY_LAG = 10 if DATABASE_PROFILE == 'postgresql' else 0
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+#The cache profiles. The profile in use is chosen with the DIARYAPP_CACHE_PROFILE environment variable.
+CACHE_PROFILES = {
+    #A cache per process. What one worker writes or deletes is not seen by the others.
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    #A memcached server shared by every worker. It requires the python-memcached package.
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.environ.get('DIARYAPP_CACHE_LOCATION', '127.0.0.1:11211'),
+    },
+    #A database table shared by every worker. It is created with the createcachetable command.
+    'database': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'diaryapp_cache',
+    },
+}
+CACHE_PROFILE = os.environ.get('DIARYAPP_CACHE_PROFILE', 'locmem')
+#Whether every worker sees the same cache, so that what a worker writes through or deletes is seen by the others.
+SHARED_CACHE = CACHE_PROFILE != 'locmem'
+
+CACHES = {
+    'default': CACHE_PROFILES[CACHE_PROFILE],
 }
 
+#The number of seconds a user's cached diary index is kept. The index is removed from the cache on every change
+#and rebuilt by the next request. It is only cached with a shared cache, since a per process cache would keep serving
+#a deleted or renamed diary in the other workers.
+DIARY_INDEX_CACHE_TIMEOUT = 60 * 60
+
+#With a shared cache, sessions are read from the cache and written through to the database, so they outlive a cache restart.
+#A per process cache would keep honoring a session that another worker ended, so sessions are then read from the database.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db' if SHARED_CACHE else 'django.contrib.sessions.backends.db'
+
+#With a shared cache, the signed in user of every request is resolved from the cache instead of the User table.
+#A per process cache would keep a user whose password changed in another worker, so users are then read from the database.
+AUTHENTICATION_BACKENDS = ['Accounts.backends.CachedModelBackend' if SHARED_CACHE else 'django.contrib.auth.backends.ModelBackend']
+
+#The number of seconds a signed in user is cached.
+AUTH_USER_CACHE_TIMEOUT = 5 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -118,6 +262,16 @@ EMAIL_HOST_USER = "Your Email"
 EMAIL_HOST_PASSWORD = "Your password"
 EMAIL_PORT = 587
 
+#Emails are queued in the outbox and delivered by the send_queued_email management command.
+#The number of emails delivered over one connection.
+EMAIL_OUTBOX_BATCH_SIZE = 50
+#The number of delivery attempts before an email is marked as failed.
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+#The number of seconds before the first retry of a failed email. It doubles on every failed attempt.
+EMAIL_OUTBOX_RETRY_DELAY = 60
+#The number of seconds a worker has to deliver the emails it claimed before other workers may claim them again.
+EMAIL_OUTBOX_CLAIM_TIMEOUT = 600
+
 
 LOGIN_URL = '/signin/'
 LOGIN_REDIRECT_URL = 'Notes:my_diaries'
@@ -141,7 +295,19 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
 STATIC_URL = '/static/'
-#STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+#The directory collectstatic writes the static files to. They are served from it by the StaticFilesMiddleware.
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "static")
 ]
+#Gives the collected files content hashed names and writes their compressed copies and responsive image derivatives.
+STATICFILES_STORAGE = 'DiaryApp.storage.CompressedManifestStaticFilesStorage'
+#The directory of the static images that get responsive WebP and AVIF derivatives, and the derivatives' widths in pixels.
+STATIC_RESPONSIVE_DIRECTORY = 'images'
+STATIC_RESPONSIVE_WIDTHS = (480, 960, 1920)
+#The number of seconds browsers cache the static files that have no content hashed name.
+STATIC_MAX_AGE = 60 * 60
+
+# Media files (images extracted from notes)
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
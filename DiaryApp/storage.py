@@ -0,0 +1,200 @@
+import gzip
+import io
+import os
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, StaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+
+#The extensions of the static files that are precompressed. Images and fonts are already compressed.
+COMPRESSED_EXTENSIONS = {'.css', '.html', '.js', '.json', '.map', '.svg', '.txt', '.xml'}
+#The extensions of the images that get responsive derivatives.
+RESPONSIVE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+#The formats of the responsive derivatives, with the options of Pillow's save(), by file extension.
+RESPONSIVE_FORMATS = {
+    'avif': ('AVIF', {'quality': 60}),
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+}
+
+
+def derivative_name(name, width, extension):
+    """
+    A function that returns the name of a responsive derivative of a static image.
+
+    Parameters
+    ----------
+    name : str
+        The image's static file name, such as 'images/home.png'.
+    width : int
+        The derivative's width in pixels.
+    extension : str
+        The derivative's file extension, such as 'webp'.
+
+    Returns
+    -------
+    str
+        The derivative's static file name, such as 'images/home.960w.webp'.
+    """
+    return '{}.{}w.{}'.format(os.path.splitext(name)[0], width, extension)
+
+
+def available_formats():
+    """
+    A function that returns the responsive derivative formats supported by the installed Pillow.
+
+    Returns
+    -------
+    list
+        The file extensions of the supported formats, preferred first. It is empty if Pillow is not installed.
+    """
+    if Image is None:
+        return []
+    return [extension for extension in RESPONSIVE_FORMATS if features.check(extension)]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    A class that extends Django's ManifestStaticFilesStorage, which gives every collected file a content hashed name.
+    After the files are hashed by collectstatic, it also writes:
+    gzip and, if the brotli package is installed, brotli compressed copies of the text files next to their hashed files,
+    and, if Pillow is installed, WebP and AVIF derivatives of the images in the STATIC_RESPONSIVE_DIRECTORY directory
+    at the widths of the STATIC_RESPONSIVE_WIDTHS setting. The derivatives are recorded in the manifest.
+    The compressed copies are served by the StaticFilesMiddleware.
+    Until collectstatic has written the manifest, such as in a fresh checkout or under the test runner,
+    the files' URLs use their original names instead of failing.
+    """
+    def url(self, name, force=False):
+        """
+        Returns the URL of a static file under its hashed name, or under its original name if there is no manifest.
+
+        Parameters
+        ----------
+        name : str
+            The file's original name.
+        force : bool, optional
+            True if the hashed name is returned even when DEBUG is True.
+
+        Returns
+        -------
+        str
+            The file's URL.
+        """
+        if not self.hashed_files:
+            return StaticFilesStorage.url(self, name)
+        return super(CompressedManifestStaticFilesStorage, self).url(name, force)
+
+    def post_process(self, paths, dry_run=False, **options):
+        """
+        Hashes the collected files and writes their compressed copies and responsive derivatives.
+
+        Parameters
+        ----------
+        paths : dict
+            The collected files by name.
+        dry_run : bool, optional
+            True if nothing is written.
+        **options : dict
+            The collectstatic options.
+
+        Yields
+        ------
+        tuple
+            The original name, the processed name and whether the file was processed, or an exception.
+        """
+        yield from super(CompressedManifestStaticFilesStorage, self).post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(paths):
+            hashed_name = self.hashed_files.get(self.hash_key(self.clean_name(name)))
+            if hashed_name is None:
+                continue
+            extension = os.path.splitext(name)[1].lower()
+            if extension in COMPRESSED_EXTENSIONS:
+                self._compress(hashed_name)
+            elif extension in RESPONSIVE_EXTENSIONS and name.startswith(settings.STATIC_RESPONSIVE_DIRECTORY + '/'):
+                for derivative, derivative_hashed_name in self._derive(name, hashed_name):
+                    self.hashed_files[self.hash_key(derivative)] = derivative_hashed_name
+                    yield derivative, derivative_hashed_name, True
+        self.save_manifest()
+
+    def _compress(self, name):
+        """
+        A method that writes the gzip and brotli compressed copies of a file when they are smaller than the file.
+
+        Parameters
+        ----------
+        name : str
+            The file's hashed name.
+        """
+        with self.open(name) as file:
+            data = file.read()
+        copies = {'gz': gzip.compress(data, 9, mtime=0)}
+        if brotli is not None:
+            copies['br'] = brotli.compress(data, quality=11)
+        for extension, compressed in copies.items():
+            if len(compressed) < len(data):
+                self._save_file('{}.{}'.format(name, extension), compressed)
+
+    def _derive(self, name, hashed_name):
+        """
+        A method that writes the responsive derivatives of an image.
+        An image is never enlarged: widths larger than the image are replaced by the image's own width.
+
+        Parameters
+        ----------
+        name : str
+            The image's original name.
+        hashed_name : str
+            The image's hashed name.
+
+        Returns
+        -------
+        list
+            The (derivative name, hashed derivative name) pairs.
+        """
+        formats = available_formats()
+        if not formats:
+            return []
+        with self.open(hashed_name) as file:
+            image = Image.open(io.BytesIO(file.read()))
+            image.load()
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        widths = sorted({min(width, image.width) for width in settings.STATIC_RESPONSIVE_WIDTHS})
+        derivatives = []
+        for width in widths:
+            resized = image if width == image.width else image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+            for extension in formats:
+                pillow_format, save_options = RESPONSIVE_FORMATS[extension]
+                output = io.BytesIO()
+                resized.save(output, pillow_format, **save_options)
+                derivative = derivative_name(name, width, extension)
+                content = ContentFile(output.getvalue())
+                derivative_hashed_name = self.hashed_name(derivative, content)
+                self._save_file(derivative_hashed_name, output.getvalue())
+                derivatives.append((derivative, derivative_hashed_name))
+        return derivatives
+
+    def _save_file(self, name, data):
+        """
+        A method that writes a file, replacing the file of the same name left by an earlier collectstatic run.
+
+        Parameters
+        ----------
+        name : str
+            The file name.
+        data : bytes
+            The file content.
+        """
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(data))
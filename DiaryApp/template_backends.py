@@ -0,0 +1,81 @@
+import time
+from django.template.backends.django import DjangoTemplates, Template
+from DiaryApp.middleware import current_profile
+
+
+class ProfiledTemplate(Template):
+    """
+    A class that extends the template of Django's template backend to add the time spent rendering
+    to the profile of the current request, if any.
+    Nested renders, such as templates rendered by template tags, are counted once as part of the outermost render.
+    """
+    def render(self, context=None, request=None):
+        """
+        Renders the template while timing it.
+
+        Parameters
+        ----------
+        context : dict, optional
+            The template context.
+        request : HttpRequest object, optional
+            An HttpRequest object that contains metadata about a request.
+
+        Returns
+        -------
+        SafeString
+            The rendered template.
+        """
+        profile = current_profile.get()
+        if profile is None:
+            return super(ProfiledTemplate, self).render(context, request)
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super(ProfiledTemplate, self).render(context, request)
+        finally:
+            profile.template_depth -= 1
+            if not profile.template_depth:
+                profile.template_duration += time.perf_counter() - started
+
+
+class ProfilingDjangoTemplates(DjangoTemplates):
+    """
+    A class that extends Django's template backend so that the RequestProfilingMiddleware measures the time spent rendering templates.
+    It is enabled in the TEMPLATES setting and only affects the templates loaded through it.
+    """
+    def from_string(self, template_code):
+        """
+        Compiles a template from a string.
+
+        Parameters
+        ----------
+        template_code : str
+            The template's source.
+
+        Returns
+        -------
+        ProfiledTemplate object
+            The template.
+        """
+        return ProfiledTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        """
+        Loads a template by name.
+
+        Parameters
+        ----------
+        template_name : str
+            The template's name.
+
+        Returns
+        -------
+        ProfiledTemplate object
+            The template.
+
+        Raises
+        ------
+        TemplateDoesNotExist
+            If no template with this name is found.
+        """
+        return ProfiledTemplate(super(ProfilingDjangoTemplates, self).get_template(template_name).template, self)
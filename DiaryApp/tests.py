@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.template import engines
+from django.template.base import Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from DiaryApp.metrics import SUB_BUCKETS, Histogram, RequestMetrics, request_metrics
+from DiaryApp.middleware import StaticFilesMiddleware, _accepted_encodings, _RequestProfile, current_profile
+
+
+class HistogramTests(SimpleTestCase):
+    """
+    A class that tests the log-linear buckets and the quantiles of the histograms.
+    """
+    def test_values_below_the_unit_share_the_first_bucket(self):
+        self.assertEqual(Histogram._index(0), 0)
+        self.assertEqual(Histogram._index(0.99), 0)
+        self.assertEqual(Histogram._bounds(0), (0.0, 1.0))
+
+    def test_every_power_of_two_has_linear_sub_buckets(self):
+        self.assertEqual(Histogram._index(1), 1)
+        self.assertEqual(Histogram._index(2), 1 + SUB_BUCKETS)
+        self.assertEqual(Histogram._index(3), 1 + SUB_BUCKETS + SUB_BUCKETS // 2)
+        for value in (1, 7, 100, 12345.6, 2 ** 20):
+            low, high = Histogram._bounds(Histogram._index(value))
+            self.assertLessEqual(low, value)
+            self.assertLess(value, high)
+            self.assertLessEqual((high - low) / low, 1 / SUB_BUCKETS)
+
+    def test_quantiles_have_a_bounded_relative_error(self):
+        histogram = Histogram(unit=1)
+        for value in range(1, 1001):
+            histogram.record(value)
+        self.assertEqual(histogram.count, 1000)
+        self.assertEqual(histogram.maximum, 1000)
+        for q in (0.5, 0.9, 0.99):
+            self.assertAlmostEqual(histogram.quantile(q), q * 1000, delta=q * 1000 / SUB_BUCKETS)
+
+    def test_empty_histogram(self):
+        self.assertEqual(Histogram().quantile(0.5), 0.0)
+
+
+class RequestMetricsTests(SimpleTestCase):
+    """
+    A class that tests the Prometheus text exposition of the request metrics.
+    """
+    def test_render(self):
+        metrics = RequestMetrics()
+        metrics.record('Notes:my_diaries', 0.25, 4, 0.01, 0.02)
+        metrics.record('Notes:my_diaries', 0.75, 6, 0.03, 0.04)
+        metrics.record('a"b', 0.1, 1, 0.0, 0.0)
+        lines = metrics.render().splitlines()
+        self.assertIn('# TYPE diaryapp_request_duration_seconds summary', lines)
+        self.assertIn('diaryapp_sql_queries_count{view="Notes:my_diaries"} 2', lines)
+        self.assertIn('diaryapp_sql_queries_sum{view="Notes:my_diaries"} 10', lines)
+        self.assertIn('diaryapp_sql_queries_count{view="a\\"b"} 1', lines)
+        quantiles = [line for line in lines if line.startswith('diaryapp_request_duration_seconds{view="Notes:my_diaries"')]
+        self.assertEqual(len(quantiles), 4)
+        label, value = quantiles[0].split(' ')
+        self.assertEqual(label, 'diaryapp_request_duration_seconds{view="Notes:my_diaries",quantile="0.5"}')
+        self.assertAlmostEqual(float(value), 0.25, delta=0.25 / SUB_BUCKETS)
+
+
+class TemplateProfilingTests(SimpleTestCase):
+    """
+    A class that tests the timing of template renders by the ProfilingDjangoTemplates backend.
+    """
+    def test_render_is_timed_for_the_current_request_only(self):
+        template = engines['django'].from_string('{% for i in items %}{{ i }}{% endfor %}')
+        self.assertEqual(template.render({'items': [1, 2]}), '12')
+        profile = _RequestProfile()
+        token = current_profile.set(profile)
+        try:
+            self.assertEqual(template.render({'items': [1, 2]}), '12')
+        finally:
+            current_profile.reset(token)
+        self.assertGreater(profile.template_duration, 0)
+        self.assertEqual(profile.template_depth, 0)
+
+    def test_template_class_is_not_patched(self):
+        self.assertFalse(hasattr(Template.render, 'profiled'))
+
+
+class MetricsViewTests(TestCase):
+    """
+    A class that tests the access to the metrics view.
+    """
+    def setUp(self):
+        self.url = reverse('metrics')
+
+    def test_anonymous_users_are_redirected(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_users_who_are_not_staff_are_redirected(self):
+        self.client.force_login(User.objects.create_user('writer', 'writer@example.com', 'a long enough password'))
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_staff_users_get_the_metrics(self):
+        self.client.force_login(User.objects.create_user('admin', 'admin@example.com', 'a long enough password', is_staff=True))
+        self.client.get(reverse('Notes:home_page'))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertContains(response, 'diaryapp_request_duration_seconds_count{view="Notes:home_page"}')
+        self.assertContains(response, 'diaryapp_diary_index_cache_hits_total')
+        self.assertGreater(request_metrics.histograms[('template_render_seconds', 'Notes:home_page')].total, 0)
+
+
+class StaticFilesMiddlewareTests(SimpleTestCase):
+    """
+    A class that tests the choice of the precompressed copy of a static file from the Accept-Encoding header.
+    """
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        for name in ('app.css', 'app.css.br', 'app.css.gz'):
+            with open(os.path.join(self.root, name), 'w') as file:
+                file.write(name)
+        with override_settings(STATIC_ROOT=self.root):
+            self.middleware = StaticFilesMiddleware(lambda request: HttpResponse())
+
+    def encoding(self, header):
+        """
+        A method that returns the content encoding of the response to a request with the given Accept-Encoding header.
+        """
+        request = RequestFactory().get('/static/app.css', HTTP_ACCEPT_ENCODING=header)
+        return self.middleware(request).get('Content-Encoding')
+
+    def test_header_is_parsed_into_quality_values(self):
+        self.assertEqual(_accepted_encodings('gzip, BR;q=0.5 , deflate;q=x,'), {'gzip': 1.0, 'br': 0.5, 'deflate': 0.0})
+
+    def test_preferred_accepted_encoding_is_served(self):
+        self.assertEqual(self.encoding('gzip, deflate, br'), 'br')
+        self.assertEqual(self.encoding('br;q=0.5, gzip;q=0.8'), 'gzip')
+        self.assertEqual(self.encoding('*'), 'br')
+
+    def test_refused_encodings_are_not_served(self):
+        self.assertEqual(self.encoding('br;q=0, gzip'), 'gzip')
+        self.assertEqual(self.encoding('br;q=0, *'), 'gzip')
+        self.assertIsNone(self.encoding('br;q=0, gzip;q=0'))
+        self.assertIsNone(self.encoding('*;q=0'))
+        self.assertIsNone(self.encoding(''))
+
+    def test_encodings_are_matched_as_tokens(self):
+        self.assertIsNone(self.encoding('xbr, gzipped'))
@@ -14,14 +14,22 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
+from DiaryApp import views
 
 urlpatterns = [
     #url for the admin section of the website
     path('admin/', admin.site.urls),
+    #url for the staff-only request metrics
+    path('metrics/', views.metrics, name='metrics'),
     #The Notes app urls
     path('',include('Notes.urls')),
     #The Accounts app urls
     path('', include('Accounts.urls'))
 ]
+
+#Serves the images extracted from notes while developing. They are served by the web server in production.
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
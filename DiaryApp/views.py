@@ -0,0 +1,30 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
+from DiaryApp.metrics import request_metrics
+from Notes.cache import get_diary_index_stats
+
+
+@staff_member_required
+def metrics(request):
+    """
+    A view that exposes the request metrics of the current process in the Prometheus text exposition format.
+    The diary index cache counters are included.
+    This view can only be accessed by staff users.
+    The staff_member_required decorator is used to ensure the previous point.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+
+    Returns
+    -------
+    HttpResponse
+        The metrics as plain text.
+    """
+    stats = get_diary_index_stats()
+    lines = [request_metrics.render()]
+    for name in ('hits', 'misses'):
+        metric = 'diaryapp_diary_index_cache_{}_total'.format(name)
+        lines.append("# TYPE {} counter\n{} {}\n".format(metric, metric, stats[name]))
+    return HttpResponse(''.join(lines), content_type='text/plain; version=0.0.4; charset=utf-8')
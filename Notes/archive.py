@@ -0,0 +1,579 @@
+import json
+import time
+import zipfile
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+from Notes.cache import invalidate_diary_index
+from Notes.changes import record_changes
+from Notes.counters import adjust_diary_counters
+from Notes.fields import decompress_text
+from Notes.models import Change, Diary, Note, NoteRevision, content_size
+from Notes.revisions import snapshot_revisions
+from Notes.sanitizer import sanitize_note_content
+from Notes.search import index_notes
+
+#The version of the archive format written in the manifest.
+ARCHIVE_VERSION = 1
+#The name of the manifest file in an archive.
+MANIFEST_NAME = 'manifest.json'
+#The number of characters of a note's content written to the archive at a time.
+CONTENT_CHUNK_SIZE = 64 * 1024
+
+
+class _ZipStream:
+    """
+    A class that represents a write-only, unseekable file that collects the bytes written by a ZipFile.
+    The collected bytes are drained after every write so that an archive can be streamed while it is built.
+
+    Methods
+    -------
+    write(data)
+        Collects the written bytes.
+    tell()
+        Returns the number of bytes written so far.
+    flush()
+        Does nothing. It is required by ZipFile.
+    drain()
+        Returns and forgets the collected bytes.
+    """
+    def __init__(self):
+        """
+        Initializes a _ZipStream object.
+        """
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        """
+        A method that collects the written bytes.
+
+        Parameters
+        ----------
+        data : bytes
+            The written bytes.
+
+        Returns
+        -------
+        int
+            The number of written bytes.
+        """
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        """
+        A method that returns the number of bytes written so far.
+
+        Returns
+        -------
+        int
+            The number of bytes written so far.
+        """
+        return self.position
+
+    def flush(self):
+        """
+        A method that does nothing. It is required by ZipFile.
+        """
+
+    def drain(self):
+        """
+        A method that returns and forgets the collected bytes.
+
+        Returns
+        -------
+        bytes
+            The bytes collected since the last call.
+        """
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def diary_directory(diary_id, title):
+    """
+    A function that returns the name of a diary's directory in an archive.
+
+    Parameters
+    ----------
+    diary_id : int
+        The diary's id.
+    title : str
+        The diary's title.
+
+    Returns
+    -------
+    str
+        The directory name.
+    """
+    return "{}-{}".format(slugify(title, allow_unicode=True) or 'diary', diary_id)
+
+
+def note_file(directory, note_id, title):
+    """
+    A function that returns the path of a note's file in an archive.
+
+    Parameters
+    ----------
+    directory : str
+        The name of the note's diary directory.
+    note_id : int
+        The note's id.
+    title : str
+        The note's title.
+
+    Returns
+    -------
+    str
+        The file path.
+    """
+    return "{}/{}-{}.html".format(directory, slugify(title, allow_unicode=True) or 'note', note_id)
+
+
+def stream_export(user, chunk_size=None):
+    """
+    A generator that streams a ZIP archive of all of a user's diaries and notes.
+    The archive holds a JSON manifest describing the diaries and notes followed by one HTML file per note.
+    The notes are read with a chunked iterator and every file is drained as soon as it is compressed,
+    so the memory used does not depend on the size of the account.
+
+    Parameters
+    ----------
+    user : User object
+        The user whose diaries are exported.
+    chunk_size : int, optional
+        The number of notes fetched from the database at a time. Defaults to the EXPORT_CHUNK_SIZE setting.
+
+    Yields
+    ------
+    bytes
+        The next part of the archive.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    stream = _ZipStream()
+    diaries = list(Diary.objects.live().filter(author=user).order_by('title').values_list('id', 'title', 'create_date'))
+    directories = {diary_id: diary_directory(diary_id, title) for diary_id, title, create_date in diaries}
+    notes = Note.objects.filter(diary__author=user, diary__deleted_at__isnull=True)
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(MANIFEST_NAME, 'w') as manifest:
+            for part in _manifest_parts(diaries, directories, notes, chunk_size):
+                manifest.write(part.encode())
+                yield stream.drain()
+        rows = notes.order_by('diary_id', 'id').values_list('id', 'diary_id', 'title', 'content')
+        for note_id, diary_id, title, content in rows.iterator(chunk_size=chunk_size):
+            with archive.open(note_file(directories[diary_id], note_id, title), 'w') as output:
+                content = decompress_text(content) if content else ''
+                for start in range(0, len(content), CONTENT_CHUNK_SIZE):
+                    output.write(content[start:start + CONTENT_CHUNK_SIZE].encode())
+                    yield stream.drain()
+            yield stream.drain()
+    yield stream.drain()
+
+
+def _manifest_parts(diaries, directories, notes, chunk_size):
+    """
+    A generator that serializes an archive's JSON manifest piece by piece.
+
+    Parameters
+    ----------
+    diaries : list
+        The user's diaries as (id, title, create_date) tuples ordered by title.
+    directories : dict
+        The directory name of every diary by diary id.
+    notes : QuerySet
+        The user's notes.
+    chunk_size : int
+        The number of notes fetched from the database at a time.
+
+    Yields
+    ------
+    str
+        The next part of the manifest.
+    """
+    yield '{{"version": {}, "exported": {}, "diaries": ['.format(ARCHIVE_VERSION, json.dumps(timezone.now().isoformat()))
+    rows = notes.order_by('diary__title', 'title').values_list('id', 'diary_id', 'title', 'create_date', 'last_update_time')
+    rows = rows.iterator(chunk_size=chunk_size)
+    row = next(rows, None)
+    for position, (diary_id, title, create_date) in enumerate(diaries):
+        diary = {'title': title, 'create_date': create_date.isoformat(), 'directory': directories[diary_id]}
+        yield '{}{}, "notes": ['.format(', ' if position else '', json.dumps(diary)[:-1])
+        separator = ''
+        while row is not None and row[1] == diary_id:
+            note_id, diary_id, note_title, note_create_date, last_update_time = row
+            yield separator + json.dumps({
+                'title': note_title,
+                'create_date': note_create_date.isoformat(),
+                'last_update_time': last_update_time.isoformat(),
+                'file': note_file(directories[diary_id], note_id, note_title),
+            })
+            separator = ', '
+            row = next(rows, None)
+        yield ']}'
+    yield ']}'
+
+
+class ArchiveError(Exception):
+    """
+    A class that extends Python's Exception class.
+    It is raised when an archive cannot be imported.
+
+    Attributes
+    ----------
+    errors : list
+        The problems found in the archive.
+    """
+    def __init__(self, errors):
+        """
+        Initializes an ArchiveError object.
+
+        Parameters
+        ----------
+        errors : list
+            The problems found in the archive.
+        """
+        super(ArchiveError, self).__init__("; ".join(errors))
+        self.errors = errors
+
+
+class ImportResult:
+    """
+    A class that represents the outcome of an archive import.
+
+    Attributes
+    ----------
+    diaries_created : int
+        The number of created diaries.
+    notes_created : int
+        The number of created notes.
+    notes_skipped : int
+        The number of notes skipped because they were imported by an earlier attempt.
+    seconds : float
+        The duration of the import.
+
+    Methods
+    -------
+    notes_per_second
+        Returns the import throughput.
+    """
+    def __init__(self, diaries_created, notes_created, notes_skipped, seconds):
+        """
+        Initializes an ImportResult object.
+
+        Parameters
+        ----------
+        diaries_created : int
+            The number of created diaries.
+        notes_created : int
+            The number of created notes.
+        notes_skipped : int
+            The number of skipped notes.
+        seconds : float
+            The duration of the import.
+        """
+        self.diaries_created = diaries_created
+        self.notes_created = notes_created
+        self.notes_skipped = notes_skipped
+        self.seconds = seconds
+
+    @property
+    def notes_per_second(self):
+        """
+        A method that returns the number of notes created per second.
+
+        Returns
+        -------
+        float
+            The import throughput.
+        """
+        return self.notes_created / self.seconds if self.seconds else float(self.notes_created)
+
+
+def read_archive(file):
+    """
+    A function that reads the manifest of an archive.
+    A ZIP archive in the export format and a JSON bundle with the same structure are accepted.
+    In a JSON bundle every note holds its HTML in a 'content' key instead of a 'file' key.
+
+    Parameters
+    ----------
+    file : file object
+        The uploaded archive opened in binary mode.
+
+    Returns
+    -------
+    tuple
+        The manifest, a function that returns the content of a note of the manifest
+        and the set of the ZIP archive's file names or None for a JSON bundle.
+
+    Raises
+    ------
+    ArchiveError
+        If the archive is not a valid ZIP archive or JSON bundle.
+    """
+    try:
+        if zipfile.is_zipfile(file):
+            archive = zipfile.ZipFile(file)
+            manifest = json.loads(archive.read(MANIFEST_NAME).decode())
+            return manifest, lambda note: _read_member(archive, note['file']), set(archive.namelist())
+        file.seek(0)
+        return json.loads(file.read().decode()), lambda note: note.get('content') or '', None
+    except (KeyError, ValueError, zipfile.BadZipFile) as error:
+        raise ArchiveError(["The archive could not be read: {}".format(error)])
+
+
+def _read_member(archive, name):
+    """
+    A function that reads the content of a note from a ZIP archive.
+
+    Parameters
+    ----------
+    archive : ZipFile object
+        The archive.
+    name : str
+        The name of the note's file in the archive.
+
+    Returns
+    -------
+    str
+        The note's content.
+
+    Raises
+    ------
+    ArchiveError
+        If the file cannot be read or is not UTF-8 encoded.
+    """
+    try:
+        return archive.read(name).decode()
+    except (KeyError, UnicodeDecodeError, zipfile.BadZipFile) as error:
+        raise ArchiveError(["The file '{}' could not be read: {}".format(name, error)])
+
+
+def validate_archive(user, manifest, resume=False, members=None):
+    """
+    A function that checks an archive's structure and its titles against the 'unique_diaries' and 'unique_notes' constraints
+    without writing anything. The titles of the user's existing diaries and notes are loaded once.
+    Diaries that already exist receive the archive's notes.
+
+    Parameters
+    ----------
+    user : User object
+        The user into whose account the archive is imported.
+    manifest : dict
+        The archive's manifest.
+    resume : bool, optional
+        True if notes that already exist were imported by an earlier attempt and are skipped.
+        Otherwise they are reported as errors.
+    members : set, optional
+        The file names of a ZIP archive, which must hold the file of every note, or None for a JSON bundle.
+
+    Returns
+    -------
+    list
+        The (diary, notes) pairs to import, where notes are the manifest entries of the notes to create.
+    int
+        The number of skipped notes.
+
+    Raises
+    ------
+    ArchiveError
+        If the manifest is malformed, a note's file is missing, or a title is missing, too long or duplicated.
+    """
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('diaries') or [], list):
+        raise ArchiveError(["The manifest must be an object with a list of diaries."])
+    max_diary = Diary._meta.get_field('title').max_length
+    max_note = Note._meta.get_field('title').max_length
+    existing = set(Note.objects.filter(diary__author=user, diary__deleted_at__isnull=True).values_list('diary__title', 'title'))
+    errors = []
+    plan = []
+    skipped = 0
+    seen_diaries = set()
+    for diary in manifest.get('diaries') or []:
+        if not isinstance(diary, dict) or not isinstance(diary.get('notes') or [], list):
+            errors.append("Every diary must be an object with a list of notes.")
+            continue
+        title = diary.get('title') or ''
+        if not isinstance(title, str) or not title or len(title) > max_diary:
+            errors.append("Invalid diary title '{}'.".format(title))
+            continue
+        if title in seen_diaries:
+            errors.append("The diary '{}' appears more than once.".format(title))
+            continue
+        seen_diaries.add(title)
+        notes = []
+        seen_notes = set()
+        for note in diary.get('notes') or []:
+            if not isinstance(note, dict):
+                errors.append("Every note of the diary '{}' must be an object.".format(title))
+                continue
+            note_title = note.get('title') or ''
+            if not isinstance(note_title, str) or not note_title or len(note_title) > max_note:
+                errors.append("Invalid note title '{}' in the diary '{}'.".format(note_title, title))
+                continue
+            if members is not None and (not isinstance(note.get('file'), str) or note['file'] not in members):
+                errors.append("The file of the note '{}' in the diary '{}' is missing.".format(note_title, title))
+            elif members is None and not isinstance(note.get('content') or '', str):
+                errors.append("The content of the note '{}' in the diary '{}' must be a string.".format(note_title, title))
+            elif note_title in seen_notes:
+                errors.append("The note '{}' appears more than once in the diary '{}'.".format(note_title, title))
+            elif (title, note_title) in existing:
+                if resume:
+                    skipped += 1
+                else:
+                    errors.append("The note '{}' already exists in the diary '{}'.".format(note_title, title))
+            else:
+                notes.append(note)
+            seen_notes.add(note_title)
+        plan.append((diary, notes))
+    if errors:
+        raise ArchiveError(errors)
+    return plan, skipped
+
+
+def import_archive(user, file, resume=False, batch_size=None):
+    """
+    A function that imports an archive of diaries and notes into a user's account.
+    The archive is validated completely before anything is written.
+    The notes are then created with bulk_create() in batches, each committed in its own transaction,
+    so that an import interrupted by a failure can be resumed without creating duplicates.
+
+    Parameters
+    ----------
+    user : User object
+        The user into whose account the archive is imported.
+    file : file object
+        The archive opened in binary mode.
+    resume : bool, optional
+        True if notes that already exist were imported by an earlier attempt and are skipped.
+    batch_size : int, optional
+        The number of notes created per transaction. Defaults to the IMPORT_BATCH_SIZE setting.
+
+    Returns
+    -------
+    ImportResult
+        The outcome of the import.
+
+    Raises
+    ------
+    ArchiveError
+        If the archive cannot be read or is invalid, or one of its diaries was created while it was imported,
+        in which case nothing is imported. A note whose file turns out not to be UTF-8 encoded, or that was created
+        while the archive was imported, stops the import after the batches created before it, which a resumed import skips.
+    """
+    started = time.monotonic()
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    manifest, read_content, members = read_archive(file)
+    plan, skipped = validate_archive(user, manifest, resume, members)
+    diary_ids = dict(Diary.objects.live().filter(author=user).values_list('title', 'id'))
+    now = timezone.now()
+    new_diaries = [
+        Diary(author=user, title=diary['title'], create_date=_parse_date(diary.get('create_date'), now))
+        for diary, notes in plan if diary['title'] not in diary_ids
+    ]
+    try:
+        with transaction.atomic():
+            Diary.objects.bulk_create(new_diaries)
+            diary_ids = dict(Diary.objects.live().filter(author=user).values_list('title', 'id'))
+            record_changes(user.pk, Change.DIARY, [diary_ids[diary.title] for diary in new_diaries])
+    except IntegrityError:
+        raise ArchiveError(["A diary of the archive was created while the archive was imported. Nothing was imported, try again."])
+    created = 0
+    batch = []
+    for diary, notes in plan:
+        for entry in notes:
+            content, saved = sanitize_note_content(read_content(entry))
+            batch.append(Note(
+                diary_id=diary_ids[diary['title']],
+                title=entry['title'],
+                content=content,
+                content_bytes=content_size(content),
+                create_date=_parse_date(entry.get('create_date'), now),
+                last_update_time=_parse_date(entry.get('last_update_time'), now),
+                content_bytes_saved=saved,
+            ))
+            if len(batch) == batch_size:
+                created += _create_notes(user, batch)
+                batch = []
+    created += _create_notes(user, batch)
+    invalidate_diary_index(user.pk)
+    return ImportResult(len(new_diaries), created, skipped, time.monotonic() - started)
+
+
+def _create_notes(user, notes):
+    """
+    A function that creates a batch of notes in one transaction with their first revisions and indexes them for full-text search.
+    The counters of the notes' diaries and the change feed are updated in the same transaction.
+
+    Parameters
+    ----------
+    user : User object
+        The user who owns the notes.
+    notes : list
+        The unsaved Note objects.
+
+    Returns
+    -------
+    int
+        The number of created notes.
+
+    Raises
+    ------
+    ArchiveError
+        If a note with the title of one of the notes was created in its diary in the meantime.
+    """
+    if not notes:
+        return 0
+    try:
+        with transaction.atomic():
+            Note.objects.bulk_create(notes)
+            keys = {(note.diary_id, note.title): note for note in notes}
+            rows = Note.objects.filter(diary_id__in={note.diary_id for note in notes}, title__in={note.title for note in notes})
+            for note_id, diary_id, title in rows.values_list('id', 'diary_id', 'title'):
+                if (diary_id, title) in keys:
+                    keys[(diary_id, title)].pk = note_id
+            NoteRevision.objects.bulk_create(snapshot_revisions(notes))
+            index_notes(notes, user.pk)
+            record_changes(user.pk, Change.NOTE, [note.pk for note in notes])
+            by_diary = {}
+            for note in notes:
+                by_diary.setdefault(note.diary_id, []).append(note)
+            for diary_id, diary_notes in by_diary.items():
+                adjust_diary_counters(
+                    diary_id, len(diary_notes), sum(note.content_bytes for note in diary_notes), max(note.last_update_time for note in diary_notes),
+                )
+    except IntegrityError:
+        raise ArchiveError(["A note of the archive was created while the archive was imported. Import it again with resume to finish the import."])
+    return len(notes)
+
+
+def _parse_date(value, default):
+    """
+    A function that parses an ISO 8601 date and time from an archive.
+    A date and time without a UTC offset is taken in the current time zone, so that it is aware when USE_TZ is True.
+
+    Parameters
+    ----------
+    value : str
+        The date and time.
+    default : datetime.datetime
+        The value returned if the date and time is missing or invalid.
+
+    Returns
+    -------
+    datetime.datetime
+        The parsed date and time.
+    """
+    try:
+        value = parse_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if value is None:
+        return default
+    if settings.USE_TZ and timezone.is_naive(value):
+        return timezone.make_aware(value)
+    if not settings.USE_TZ and timezone.is_aware(value):
+        return timezone.make_naive(value)
+    return value
@@ -0,0 +1,185 @@
+from calendar import timegm
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from DiaryApp.decorators import async_login_required
+from Notes import views
+from Notes.cache import get_diary_index
+from Notes.forms import DiaryForm, NewNoteForm
+from Notes.pagination import paginate_notes
+from Notes.resolvers import get_diary, get_note
+from Notes.streaming import note_page_chunks, streaming_response
+
+#The async views are used instead of the views of the same name in Notes.views when the ASYNC_VIEWS setting is True.
+#They only serve reads natively: the database is accessed through sync_to_async() in as few calls as possible
+#and templates are rendered in the event loop. Form submissions are handed to the sync views in a worker thread.
+
+
+def _diary_page(user, diary, after, before):
+    """
+    A function that resolves a user's diary and loads a page of its notes and the user's diary index.
+
+    Parameters
+    ----------
+    user : User object
+        The user who owns the diary.
+    diary : str
+        The user's diary name.
+    after : str
+        The title after which the page starts or None.
+    before : str
+        The title before which the page ends or None.
+
+    Returns
+    -------
+    tuple
+        The page of notes as a NotePage object and the user's diary index, which lists the targets of bulk operations.
+
+    Raises
+    ------
+    Http404
+        If the user has no diary with the given title.
+    """
+    return paginate_notes(get_diary(user, diary), after=after, before=before), get_diary_index(user)
+
+
+def _note_validators(request, diary, note):
+    """
+    A function that returns the validators of a note's read mode page for conditional requests.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+    diary : str
+        The user's diary name.
+    note : str
+        The user's note name in the diary.
+
+    Returns
+    -------
+    tuple
+        The quoted ETag and the last update time as a timestamp, both None if the user has no such note.
+    """
+    last_update_time = views.note_last_modified(request, diary, note)
+    if last_update_time is None:
+        return None, None
+    return quote_etag(views.note_etag(request, diary, note)), timegm(last_update_time.utctimetuple())
+
+
+@async_login_required
+async def my_diaries(request):
+    """
+    An async view that renders a user's diaries and a DiaryForm for adding new diaries.
+    The diaries are read from the user's cached diary index. A submitted DiaryForm is handled by the sync view.
+    This view can only be accessed if a user is authenticated.
+    The async_login_required decorator is used to ensure the previous point.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+
+    Returns
+    -------
+    HttpResponseRedirect
+        A request to the diary_content view when the user submits valid POST data and a new Diary object is created.
+    HttpResponse
+        A new DiaryForm instance when the user accesses the mydiaries page.
+        A DiaryForm instance with errors when the user enters invalid data or enters an existing diary name.
+    """
+    if request.method == "POST":
+        return await sync_to_async(views.my_diaries)(request)
+    diaries = await sync_to_async(get_diary_index)(request.user)
+    return render(request, 'Notes/my_diaries.html', {'form':DiaryForm(), 'diaries':diaries})
+
+
+@async_login_required
+async def diary_content(request, diary):
+    """
+    An async view that renders a user's diary content and a NewNoteForm for adding new notes.
+    The diary and a page of its notes are loaded in a single worker thread call. A submitted NewNoteForm is handled by the sync view.
+    This view can only be accessed if a user is authenticated.
+    The async_login_required decorator is used to ensure the previous point.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+    diary : str
+        The user's diary name.
+
+    Returns
+    -------
+    HttpResponseRedirect
+        A request to the note_content view when the user submits valid POST data and a new Note object is created.
+    HttpResponse
+        A new NewNoteForm instance when the user accesses the diary_content page.
+        A NewNoteForm instance with errors when the user enters invalid data or enters an existing note name.
+
+    Raises
+    ------
+    Http404
+        If the user has no diary with the given name.
+    """
+    if request.method == "POST":
+        return await sync_to_async(views.diary_content)(request, diary)
+    page, diaries = await sync_to_async(_diary_page)(request.user, diary, request.GET.get('after'), request.GET.get('before'))
+    return render(request, 'Notes/diary_content.html', {'diary':diary, 'notes':page.notes, 'page':page, 'diaries':diaries, 'form':NewNoteForm()})
+
+
+@async_login_required
+async def note_read_mode(request, diary, note):
+    """
+    An async view that renders a user's note content in read mode.
+    Like the sync view, the response carries an ETag and a Last-Modified header and an unchanged note is answered with a 304 response
+    before the note is loaded. The note is loaded with its content, since the content cannot be loaded lazily from the event loop
+    while the page is rendered or streamed.
+    Notes larger than the NOTE_STREAMING_THRESHOLD setting are streamed.
+    This view can only be accessed if a user is authenticated.
+    The async_login_required decorator is used to ensure the previous point.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+    diary : str
+        The user's diary name.
+    note : str
+        The user's note name in the diary.
+
+    Returns
+    -------
+    HttpResponse
+        The note's read mode page.
+    StreamingHttpResponse
+        The page, gzip compressed if the client accepts it, when the note is larger than the streaming threshold.
+    HttpResponseNotModified
+        An empty response when the user's cached copy of the page is up to date.
+
+    Raises
+    ------
+    Http404
+        If the user has no such note in the given diary.
+    """
+    etag, last_modified = await sync_to_async(_note_validators)(request, diary, note)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        note = await sync_to_async(get_note)(request.user, diary, note)
+        context = {'diary':diary, 'note':note, 'fragment_timeout':settings.NOTE_FRAGMENT_CACHE_TIMEOUT}
+        if note.content_bytes > settings.NOTE_STREAMING_THRESHOLD:
+            chunks = note_page_chunks(request, 'Notes/notes_content.html', context, note, settings.NOTE_STREAMING_CHUNK_SIZE, note.content)
+            response = streaming_response(request, chunks)
+            #The compressed body differs from the uncompressed one, so the ETag is weak.
+            response['ETag'] = 'W/{}'.format(etag)
+        else:
+            response = render(request, 'Notes/notes_content.html', context)
+    if request.method in ('GET', 'HEAD'):
+        if last_modified and not response.has_header('Last-Modified'):
+            response['Last-Modified'] = http_date(last_modified)
+        if etag:
+            response.setdefault('ETag', etag)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,87 @@
+from Notes.concurrency import StaleVersionError, update_note
+from Notes.sanitizer import sanitize_note_content
+
+
+class PatchError(ValueError):
+    """
+    A class that represents a patch that cannot be applied to a note's content.
+    """
+
+
+def apply_patch(content, ops):
+    """
+    A function that applies splice operations to a note's content.
+    Every operation is a [start, delete, insert] list that removes 'delete' characters at 'start' and inserts 'insert' there.
+    Offsets and lengths refer to the content the patch was made against and are counted in UTF-16 code units,
+    as in the editor's JavaScript strings. The operations must be ordered and must not overlap.
+
+    Parameters
+    ----------
+    content : str
+        The content the patch was made against.
+    ops : list
+        The splice operations.
+
+    Returns
+    -------
+    str
+        The patched content.
+
+    Raises
+    ------
+    PatchError
+        If an operation is malformed, out of range, out of order or splits a character.
+    """
+    if not isinstance(ops, list):
+        raise PatchError("The operations must be a list.")
+    data = (content or '').encode('utf-16-le')
+    parts = []
+    position = 0
+    for op in ops:
+        if not (isinstance(op, list) and len(op) == 3 and all(type(value) is int and value >= 0 for value in op[:2]) and isinstance(op[2], str)):
+            raise PatchError("Every operation must be a [start, delete, insert] list.")
+        start, delete, insert = op[0] * 2, op[1] * 2, op[2]
+        if start < position or start + delete > len(data):
+            raise PatchError("The operations are out of order or out of range.")
+        parts.append(data[position:start])
+        parts.append(insert.encode('utf-16-le', 'surrogatepass'))
+        position = start + delete
+    parts.append(data[position:])
+    try:
+        return b''.join(parts).decode('utf-16-le')
+    except UnicodeDecodeError:
+        raise PatchError("The operations split a character.")
+
+
+def apply_autosave(note, version, ops):
+    """
+    A function that applies a patch to a note and saves the sanitized result if the note is still at the patch's base version.
+    The content is written with update_note(), so a concurrent save of the note makes the patch stale instead of being overwritten.
+
+    Parameters
+    ----------
+    note : Note object
+        The note with its content, version and diary loaded.
+    version : int
+        The version of the note the patch was made against.
+    ops : list
+        The splice operations as accepted by apply_patch().
+
+    Returns
+    -------
+    tuple
+        The note with its new content, version and last update time
+        and True if the sanitization changed the patched content, in which case the editor must reload it.
+
+    Raises
+    ------
+    StaleVersionError
+        If the note is no longer at the given version.
+    PatchError
+        If the patch cannot be applied.
+    """
+    if note.version != version:
+        raise StaleVersionError(note.version)
+    patched = apply_patch(note.content, ops)
+    content, bytes_saved = sanitize_note_content(patched)
+    return update_note(note, version, bytes_saved, content=content), content != patched
@@ -0,0 +1,883 @@
+import asyncio
+import copy
+import http.client
+import importlib
+import os
+import platform
+import random
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+from django import get_version
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, OperationalError, connection, connections, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Length
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import clear_url_caches, reverse
+from django.utils import timezone
+from Notes.counters import reconcile_diary_counters
+from Notes.models import Diary, Note, NoteRevision
+from Notes.search import rebuild_search_index
+
+#The version of the benchmark results format.
+RESULTS_VERSION = 1
+#The percentiles reported for every route.
+PERCENTILES = (50, 95, 99)
+#The words synthetic notes are made of.
+WORDS = (
+    'morning', 'garden', 'letter', 'travel', 'coffee', 'meeting', 'project', 'weekend', 'reading', 'family',
+    'rain', 'market', 'music', 'train', 'dinner', 'idea', 'walk', 'office', 'holiday', 'recipe',
+)
+
+
+def generate_data(users, diaries, notes, content_size, seed=0):
+    """
+    A function that creates synthetic users, diaries and notes with bulk inserts.
+    Every user gets the same number of diaries and every diary the same number of notes.
+
+    Parameters
+    ----------
+    users : int
+        The number of users.
+    diaries : int
+        The number of diaries per user.
+    notes : int
+        The number of notes per diary.
+    content_size : int
+        The approximate size of every note's content in bytes.
+    seed : int, optional
+        The seed of the random content, so that runs are reproducible.
+
+    Returns
+    -------
+    list
+        A list of (User object, list of (diary title, list of note titles)) tuples.
+    """
+    rng = random.Random(seed)
+    password = make_password(None)
+    User.objects.bulk_create([
+        User(username='bench{}'.format(i), email='bench{}@example.com'.format(i), password=password) for i in range(users)
+    ])
+    accounts = list(User.objects.filter(username__startswith='bench').order_by('id'))
+    now = timezone.now()
+    Diary.objects.bulk_create([
+        Diary(author=user, title='Diary {}'.format(d), create_date=now) for user in accounts for d in range(diaries)
+    ])
+    layout = []
+    for user in accounts:
+        user_diaries = list(Diary.objects.filter(author=user).order_by('id'))
+        new_notes = []
+        for diary in user_diaries:
+            for n in range(notes):
+                content = _content(rng, content_size)
+                new_notes.append(Note(
+                    diary=diary, title='Note {}'.format(n), content=content, content_bytes=len(content.encode()),
+                    create_date=now, last_update_time=now,
+                ))
+        Note.objects.bulk_create(new_notes, batch_size=500)
+        layout.append((user, [(diary.title, ['Note {}'.format(n) for n in range(notes)]) for diary in user_diaries]))
+    rebuild_search_index()
+    reconcile_diary_counters()
+    cache.clear()
+    return layout
+
+
+def _content(rng, size):
+    """
+    A function that returns random HTML content shaped like the editor's output.
+
+    Parameters
+    ----------
+    rng : Random object
+        The random number generator.
+    size : int
+        The approximate size of the content in bytes.
+
+    Returns
+    -------
+    str
+        The content.
+    """
+    paragraphs = []
+    length = 0
+    while length < size:
+        paragraph = '<p>{}</p>'.format(' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 40))))
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 1
+    return '\n'.join(paragraphs)
+
+
+def current_rss():
+    """
+    A function that returns the resident set size of the current process.
+
+    Returns
+    -------
+    int
+        The resident set size in bytes. Where /proc is not available, the peak resident set size is returned.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if platform.system() == 'Darwin' else peak * 1024
+
+
+def percentile(samples, p):
+    """
+    A function that returns a percentile of samples using the nearest-rank method.
+
+    Parameters
+    ----------
+    samples : list
+        The sorted samples.
+    p : float
+        The percentile between 0 and 100.
+
+    Returns
+    -------
+    float
+        The percentile or 0 if there are no samples.
+    """
+    if not samples:
+        return 0.0
+    rank = max(1, -(-len(samples) * p // 100))
+    return samples[int(rank) - 1]
+
+
+def summarize(latencies, queries):
+    """
+    A function that summarizes the measurements of a route.
+
+    Parameters
+    ----------
+    latencies : list
+        The latency of every request in seconds.
+    queries : list
+        The number of SQL queries of every request.
+
+    Returns
+    -------
+    dict
+        The number of requests, the latency percentiles and mean in milliseconds and the mean queries per request.
+    """
+    latencies = sorted(latencies)
+    summary = {'requests': len(latencies)}
+    for p in PERCENTILES:
+        summary['p{}_ms'.format(p)] = round(percentile(latencies, p) * 1000, 3)
+    summary['mean_ms'] = round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0
+    summary['queries_per_request'] = round(sum(queries) / len(queries), 2) if queries else 0.0
+    return summary
+
+
+class _QueryCounter:
+    """
+    A class that counts SQL queries. It is installed as a database execute wrapper.
+
+    Attributes
+    ----------
+    count : int
+        The number of queries run since the counter was created.
+    """
+    def __init__(self):
+        """
+        Initializes a _QueryCounter object.
+        """
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Counts a SQL query and runs it.
+        """
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class ClientTransport:
+    """
+    A class that sends requests through Django's test client, without any network or WSGI server.
+
+    Methods
+    -------
+    login(user)
+        Authenticates the following requests as a user.
+    get(path)
+        Sends a GET request and returns its status code.
+    close()
+        Releases the transport's resources.
+    """
+    name = 'client'
+
+    def __init__(self):
+        """
+        Initializes a ClientTransport object.
+        """
+        self.client = Client()
+
+    def login(self, user):
+        """
+        A method that authenticates the following requests as a user.
+
+        Parameters
+        ----------
+        user : User object
+            The user.
+        """
+        self.client.force_login(user)
+
+    def get(self, path):
+        """
+        A method that sends a GET request and consumes its response.
+
+        Parameters
+        ----------
+        path : str
+            The request path.
+
+        Returns
+        -------
+        int
+            The response status code.
+        """
+        response = self.client.get(path)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response.status_code
+
+    def close(self):
+        """
+        A method that releases the transport's resources.
+        """
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    """
+    A class that extends wsgiref's request handler to stop it from logging every request.
+    """
+    def log_message(self, format, *args):
+        """
+        Discards the request log line.
+        """
+
+
+class WSGITransport(ClientTransport):
+    """
+    A class that sends requests over HTTP to a local WSGI server running the project's application in a thread.
+    The server thread uses the benchmark's database connection, so that it can read the test database.
+    """
+    name = 'wsgi'
+
+    def __init__(self):
+        """
+        Initializes a WSGITransport object and starts the server on a free local port.
+        """
+        super(WSGITransport, self).__init__()
+        self.cookie = ''
+        self.connection = connections['default']
+        self.connection.inc_thread_sharing()
+        self.server = make_server('127.0.0.1', 0, self._application(WSGIHandler()), WSGIServer, _QuietRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.http = http.client.HTTPConnection('127.0.0.1', self.server.server_port)
+
+    def _application(self, handler):
+        """
+        A method that wraps the WSGI application so that it runs on the benchmark's database connection.
+
+        Parameters
+        ----------
+        handler : WSGIHandler object
+            The project's WSGI application.
+
+        Returns
+        -------
+        function
+            The wrapped application.
+        """
+        def application(environ, start_response):
+            connections['default'] = self.connection
+            return handler(environ, start_response)
+        return application
+
+    def login(self, user):
+        """
+        A method that authenticates the following requests as a user with a session cookie.
+
+        Parameters
+        ----------
+        user : User object
+            The user.
+        """
+        self.client.force_login(user)
+        self.cookie = '{}={}'.format(settings.SESSION_COOKIE_NAME, self.client.cookies[settings.SESSION_COOKIE_NAME].value)
+
+    def get(self, path):
+        """
+        A method that sends a GET request and reads its response.
+
+        Parameters
+        ----------
+        path : str
+            The request path.
+
+        Returns
+        -------
+        int
+            The response status code.
+        """
+        self.http.request('GET', path, headers={'Cookie': self.cookie, 'Host': 'testserver'})
+        response = self.http.getresponse()
+        response.read()
+        return response.status
+
+    def close(self):
+        """
+        A method that stops the server.
+        """
+        self.http.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.connection.dec_thread_sharing()
+
+
+#The available transports by name.
+TRANSPORTS = {transport.name: transport for transport in (ClientTransport, WSGITransport)}
+
+
+def _routes(diary, note):
+    """
+    A function that returns the read routes measured for a note.
+
+    Parameters
+    ----------
+    diary : str
+        The diary title.
+    note : str
+        The note title.
+
+    Returns
+    -------
+    list
+        A list of (route name, path) tuples.
+    """
+    return [
+        ('my_diaries', reverse('Notes:my_diaries')),
+        ('diary_content', reverse('Notes:diary_content', kwargs={'diary': diary})),
+        ('note_content', reverse('Notes:note_content', kwargs={'diary': diary, 'note': note})),
+        ('note_read_mode', reverse('Notes:note_read_mode', kwargs={'diary': diary, 'note': note})),
+    ]
+
+
+def run_routes(transport, layout, requests, seed=0):
+    """
+    A function that measures the project's routes through a transport.
+    The read routes are requested for random notes of every user.
+    The delete routes are measured last, on notes and diaries that are not requested again.
+
+    Parameters
+    ----------
+    transport : ClientTransport object
+        The transport the requests are sent through.
+    layout : list
+        The synthetic data returned by generate_data().
+    requests : int
+        The number of requests per read route.
+    seed : int, optional
+        The seed of the random choice of notes.
+
+    Returns
+    -------
+    dict
+        The summary of every route by route name.
+    """
+    rng = random.Random(seed)
+    counter = _QueryCounter()
+    measurements = {}
+
+    def measure(route, path):
+        queries = counter.count
+        started = time.perf_counter()
+        status = transport.get(path)
+        elapsed = time.perf_counter() - started
+        if status >= 400:
+            raise RuntimeError("GET {} returned {}.".format(path, status))
+        latencies, counts = measurements.setdefault(route, ([], []))
+        latencies.append(elapsed)
+        counts.append(counter.count - queries)
+
+    with connection.execute_wrapper(counter):
+        for i in range(requests):
+            user, diaries = layout[i % len(layout)]
+            transport.login(user)
+            diary, notes = rng.choice(diaries)
+            for route, path in _routes(diary, rng.choice(notes)):
+                measure(route, path)
+        for user, diaries in layout:
+            transport.login(user)
+            for diary, notes in diaries[1:]:
+                for note in notes[:max(1, len(notes) // 2)]:
+                    measure('delete_note', reverse('Notes:delete_note', kwargs={'diary': diary, 'note': note}))
+                measure('delete_diary', reverse('Notes:delete_diary', kwargs={'diary': diary}))
+    return {route: summarize(*values) for route, values in measurements.items()}
+
+
+def run_benchmarks(users, diaries, notes, content_size, requests, transports=('client', 'wsgi'), seed=0):
+    """
+    A function that runs the request benchmarks on fresh synthetic data for every transport.
+    It must be run against a disposable database, such as a test database.
+
+    Parameters
+    ----------
+    users : int
+        The number of users.
+    diaries : int
+        The number of diaries per user.
+    notes : int
+        The number of notes per diary.
+    content_size : int
+        The approximate size of every note's content in bytes.
+    requests : int
+        The number of requests per read route.
+    transports : tuple, optional
+        The names of the transports to measure.
+    seed : int, optional
+        The seed of the synthetic data and the random choice of notes.
+
+    Returns
+    -------
+    dict
+        The benchmark results, including the parameters, the environment and the route summaries per transport.
+    """
+    results = {
+        'version': RESULTS_VERSION,
+        'date': timezone.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'django': get_version(),
+            'database': connection.vendor,
+            'platform': platform.platform(),
+        },
+        'parameters': {
+            'users': users, 'diaries': diaries, 'notes': notes, 'content_size': content_size,
+            'requests': requests, 'seed': seed,
+        },
+        'transports': {},
+    }
+    for name in transports:
+        User.objects.filter(username__startswith='bench').delete()
+        started = time.perf_counter()
+        layout = generate_data(users, diaries, notes, content_size, seed)
+        setup_seconds = time.perf_counter() - started
+        transport = TRANSPORTS[name]()
+        rss = current_rss()
+        try:
+            routes = run_routes(transport, layout, requests, seed)
+        finally:
+            transport.close()
+        results['transports'][name] = {
+            'setup_seconds': round(setup_seconds, 3),
+            'rss_growth_bytes': current_rss() - rss,
+            'routes': routes,
+        }
+    return results
+
+
+def _load_urls(async_views):
+    """
+    A function that reloads the project's URL configuration with or without the async views.
+    The views are chosen from the ASYNC_VIEWS setting when the URL modules are imported.
+
+    Parameters
+    ----------
+    async_views : bool
+        True to route the read pages and the email forms to the async views.
+    """
+    with override_settings(ASYNC_VIEWS=async_views):
+        for name in ('Notes.urls', 'Accounts.urls', settings.ROOT_URLCONF):
+            importlib.reload(importlib.import_module(name))
+    clear_url_caches()
+
+
+def _measure_wsgi(requests, connections_count, threads):
+    """
+    A function that sends requests through the WSGI handler from concurrent connections.
+    Like a threaded WSGI server, at most 'threads' requests are handled at a time and the other connections wait.
+
+    Parameters
+    ----------
+    requests : list
+        The (session cookie, path) pairs of the requests.
+    connections_count : int
+        The number of concurrent connections, each sending its share of the requests one after another.
+    threads : int
+        The number of worker threads of the server.
+
+    Returns
+    -------
+    tuple
+        The latency of every request in seconds and the elapsed time.
+    """
+    workers = threading.BoundedSemaphore(threads)
+    latencies = []
+
+    def connection_loop(share):
+        client = Client()
+        for cookie, path in share:
+            client.cookies[settings.SESSION_COOKIE_NAME] = cookie
+            started = time.perf_counter()
+            with workers:
+                response = client.get(path)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            latencies.append(time.perf_counter() - started)
+        connections.close_all()
+
+    loops = [threading.Thread(target=connection_loop, args=(requests[i::connections_count],)) for i in range(connections_count)]
+    started = time.perf_counter()
+    for loop in loops:
+        loop.start()
+    for loop in loops:
+        loop.join()
+    return latencies, time.perf_counter() - started
+
+
+def _measure_asgi(requests, connections_count):
+    """
+    A function that sends requests through the ASGI handler from concurrent connections served by a single event loop.
+
+    Parameters
+    ----------
+    requests : list
+        The (session cookie, path) pairs of the requests.
+    connections_count : int
+        The number of concurrent connections, each sending its share of the requests one after another.
+
+    Returns
+    -------
+    tuple
+        The latency of every request in seconds and the elapsed time.
+    """
+    latencies = []
+
+    async def connection_loop(share):
+        client = AsyncClient()
+        for cookie, path in share:
+            client.cookies[settings.SESSION_COOKIE_NAME] = cookie
+            started = time.perf_counter()
+            response = await client.get(path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            latencies.append(time.perf_counter() - started)
+
+    async def serve():
+        await asyncio.gather(*(connection_loop(requests[i::connections_count]) for i in range(connections_count)))
+
+    started = time.perf_counter()
+    asyncio.run(serve())
+    return latencies, time.perf_counter() - started
+
+
+def run_concurrency_benchmark(users, diaries, notes, content_size, levels, requests, threads, seed=0):
+    """
+    A function that compares how many concurrent connections the WSGI and ASGI deployments serve on the read pages.
+    The 'wsgi' deployment handles requests with the sync views in a pool of worker threads, like a threaded WSGI server.
+    The 'asgi' deployment handles every connection in a single event loop with the async views, like uvicorn.
+    The requests are handled in process, without sockets, so that only the handlers and the views are compared.
+    It must be run against a disposable database, such as a test database.
+
+    Parameters
+    ----------
+    users : int
+        The number of users.
+    diaries : int
+        The number of diaries per user.
+    notes : int
+        The number of notes per diary.
+    content_size : int
+        The approximate size of every note's content in bytes.
+    levels : list
+        The numbers of concurrent connections measured.
+    requests : int
+        The number of requests sent at every level.
+    threads : int
+        The number of worker threads of the WSGI deployment.
+    seed : int, optional
+        The seed of the synthetic data and the random choice of notes.
+
+    Returns
+    -------
+    dict
+        The throughput and latency summary per deployment and number of connections.
+    """
+    rng = random.Random(seed)
+    User.objects.filter(username__startswith='bench').delete()
+    layout = generate_data(users, diaries, notes, content_size, seed)
+    cookies = []
+    for user, _ in layout:
+        client = Client()
+        client.force_login(user)
+        cookies.append(client.cookies[settings.SESSION_COOKIE_NAME].value)
+    paths = []
+    for i in range(requests):
+        user_index = i % len(layout)
+        diary, titles = rng.choice(layout[user_index][1])
+        #The edit page has no async view.
+        route, path = rng.choice([route for route in _routes(diary, rng.choice(titles)) if route[0] != 'note_content'])
+        paths.append((cookies[user_index], path))
+    results = {}
+    for deployment in ('wsgi', 'asgi'):
+        _load_urls(deployment == 'asgi')
+        try:
+            for level in levels:
+                if deployment == 'wsgi':
+                    latencies, elapsed = _measure_wsgi(paths, level, threads)
+                else:
+                    latencies, elapsed = _measure_asgi(paths, level)
+                results.setdefault(deployment, {})[str(level)] = {
+                    'requests_per_second': round(len(latencies) / elapsed, 1),
+                    'latency': summarize(latencies, []),
+                }
+        finally:
+            _load_urls(settings.ASYNC_VIEWS)
+    return results
+
+
+def _database_size():
+    """
+    A function that returns the size of the default database.
+
+    Returns
+    -------
+    int
+        The size in bytes, or None if the database is not SQLite.
+    """
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA page_count')
+        pages = cursor.fetchone()[0]
+        cursor.execute('PRAGMA page_size')
+        return pages * cursor.fetchone()[0]
+
+
+def run_storage_benchmark(notes, content_size, reads, seed=0):
+    """
+    A function that compares the storage size and read latency of plain and compressed note contents.
+    The same synthetic notes are written once with the NOTE_CONTENT_COMPRESSION setting off and once with it on.
+    Reads are timed both for loading notes without accessing their content, which never decompresses it,
+    and for loading notes and accessing their content.
+
+    Parameters
+    ----------
+    notes : int
+        The number of notes written in each mode.
+    content_size : int
+        The approximate size of every note's content in bytes.
+    reads : int
+        The number of timed reads of each kind.
+    seed : int, optional
+        The seed of the synthetic data and the random choice of notes.
+
+    Returns
+    -------
+    dict
+        The stored content size, the database growth and the read latency summaries per mode.
+    """
+    rng = random.Random(seed)
+    contents = [_content(rng, rng.randint(content_size // 4, content_size * 2)) for _ in range(notes)]
+    user = User.objects.create(username='bench-storage', email='bench-storage@example.com', password=make_password(None))
+    results = {}
+    for mode, compressed in (('plain', False), ('compressed', True)):
+        with override_settings(NOTE_CONTENT_COMPRESSION=compressed):
+            size = _database_size()
+            diary = Diary.objects.create(author=user, title='Storage {}'.format(mode))
+            Note.objects.bulk_create([
+                Note(diary=diary, title='Note {}'.format(n), content=content, content_bytes=len(content.encode()))
+                for n, content in enumerate(contents)
+            ], batch_size=500)
+            ids = list(Note.objects.filter(diary=diary).values_list('id', flat=True))
+            stored = Note.objects.filter(diary=diary).aggregate(total=Sum(Length('content')))['total']
+            growth = _database_size() - size if size is not None else None
+            timings = {}
+            for kind, access in (('load', False), ('load_and_read', True)):
+                latencies = []
+                for _ in range(reads):
+                    started = time.perf_counter()
+                    note = Note.objects.get(pk=rng.choice(ids))
+                    if access:
+                        note.content
+                    latencies.append(time.perf_counter() - started)
+                timings[kind] = summarize(latencies, [])
+            results[mode] = {
+                'content_bytes': sum(len(content.encode()) for content in contents),
+                'stored_bytes': stored,
+                'database_growth_bytes': growth,
+                'reads': timings,
+            }
+    user.delete()
+    return results
+
+
+def run_write_benchmark(profiles, workers, operations, content_size, seed=0):
+    """
+    A function that measures the write throughput of database profiles under concurrent writers.
+    For every profile a test database is created from the profile's settings under a separate alias,
+    and every worker thread saves its own note with a new revision in a transaction, the way autosaves do.
+    SQLite test databases are files in a temporary directory, since locking only matters between connections to a file.
+    A profile whose database cannot be created, such as PostgreSQL without a server, is reported with its error.
+
+    Parameters
+    ----------
+    profiles : list
+        The names of the profiles in the DATABASE_PROFILES setting.
+    workers : int
+        The number of concurrent writers.
+    operations : int
+        The number of saves per writer.
+    content_size : int
+        The approximate size of every saved content in bytes.
+    seed : int, optional
+        The seed of the synthetic content.
+
+    Returns
+    -------
+    dict
+        The throughput, failed saves and latency summary per profile.
+    """
+    results = {}
+    for name in profiles:
+        alias = 'benchmark-{}'.format(name)
+        settings_dict = copy.deepcopy(settings.DATABASE_PROFILES[name])
+        directory = None
+        if 'sqlite' in settings_dict['ENGINE']:
+            directory = tempfile.mkdtemp()
+            settings_dict['TEST'] = {'NAME': os.path.join(directory, 'benchmark.sqlite3')}
+        connections.databases[alias] = settings_dict
+        try:
+            creation = connections[alias].creation
+            old_name = creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        except (DatabaseError, ImproperlyConfigured) as error:
+            results[name] = {'error': str(error)}
+        else:
+            try:
+                results[name] = _run_writers(alias, workers, operations, content_size, seed)
+            finally:
+                creation.destroy_test_db(old_name, verbosity=0)
+                connections[alias].close()
+        finally:
+            del connections.databases[alias]
+            if directory:
+                shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def _run_writers(alias, workers, operations, content_size, seed):
+    """
+    A function that runs concurrent writer threads against a database.
+
+    Parameters
+    ----------
+    alias : str
+        The database alias.
+    workers : int
+        The number of writer threads.
+    operations : int
+        The number of saves per writer.
+    content_size : int
+        The approximate size of every saved content in bytes.
+    seed : int
+        The seed of the synthetic content.
+
+    Returns
+    -------
+    dict
+        The throughput, failed saves and latency summary.
+    """
+    rng = random.Random(seed)
+    contents = [_content(rng, content_size) for _ in range(16)]
+    User.objects.using(alias).bulk_create([User(username='bench-writer', email='bench-writer@example.com', password=make_password(None))])
+    user = User.objects.using(alias).get(username='bench-writer')
+    Diary.objects.using(alias).bulk_create([Diary(author=user, title='Writers')])
+    diary = Diary.objects.using(alias).get(author=user)
+    Note.objects.using(alias).bulk_create([Note(diary=diary, title='Writer {}'.format(i), content='') for i in range(workers)])
+    note_ids = list(Note.objects.using(alias).filter(diary=diary).order_by('id').values_list('id', flat=True))
+    barrier = threading.Barrier(workers + 1)
+    latencies = [[] for _ in range(workers)]
+    failures = [0] * workers
+
+    def write(worker):
+        barrier.wait()
+        for operation in range(operations):
+            content = contents[(worker + operation) % len(contents)]
+            started = time.perf_counter()
+            try:
+                with transaction.atomic(using=alias):
+                    Note.objects.using(alias).filter(pk=note_ids[worker]).update(
+                        content=content, content_bytes=len(content.encode()), version=F('version') + 1, last_update_time=timezone.now()
+                    )
+                    NoteRevision.objects.using(alias).create(note_id=note_ids[worker], number=operation + 2, data=content.encode(), size=len(content))
+            except OperationalError:
+                failures[worker] += 1
+            else:
+                latencies[worker].append(time.perf_counter() - started)
+        connections[alias].close()
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(workers)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    saved = sum(len(worker_latencies) for worker_latencies in latencies)
+    return {
+        'workers': workers,
+        'saves': saved,
+        'failed_saves': sum(failures),
+        'saves_per_second': round(saved / elapsed, 1),
+        'latency': summarize([latency for worker_latencies in latencies for latency in worker_latencies], []),
+    }
+
+
+def compare_results(baseline, results, threshold=0.1):
+    """
+    A function that compares benchmark results with a baseline and reports regressions.
+    A route regresses when its p95 latency or its queries per request grow by more than the threshold.
+
+    Parameters
+    ----------
+    baseline : dict
+        The baseline results.
+    results : dict
+        The new results.
+    threshold : float, optional
+        The relative growth that counts as a regression.
+
+    Returns
+    -------
+    list
+        A list of messages describing the regressions.
+    """
+    regressions = []
+    for transport, measured in results['transports'].items():
+        previous = baseline.get('transports', {}).get(transport, {}).get('routes', {})
+        for route, summary in measured['routes'].items():
+            if route not in previous:
+                continue
+            for key in ('p95_ms', 'queries_per_request'):
+                old, new = previous[route][key], summary[key]
+                if old and (new - old) / old > threshold:
+                    regressions.append("{} {}: {} went from {} to {} ({:+.0%}).".format(transport, route, key, old, new, (new - old) / old))
+    return regressions
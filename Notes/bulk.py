@@ -0,0 +1,169 @@
+from django.db import connection, transaction
+from django.utils import timezone
+from Notes.cache import invalidate_diary_index
+from Notes.changes import record_changes
+from Notes.counters import adjust_diary_counters
+from Notes.models import Change, Note, NoteRevision
+from Notes.purge import _delete_rows, batches
+from Notes.search import copy_index_entries, unindex_notes
+
+#The bulk operations on the notes of a diary.
+DELETE = 'delete'
+MOVE = 'move'
+COPY = 'copy'
+OPERATIONS = (DELETE, MOVE, COPY)
+
+
+class BulkOperationError(Exception):
+    """
+    A class that represents a bulk operation that cannot be performed on the selected notes.
+
+    Attributes
+    ----------
+    titles : list
+        The titles of the selected notes that already exist in the target diary.
+    """
+    def __init__(self, message, titles=()):
+        """
+        Parameters
+        ----------
+        message : str
+            The error message.
+        titles : list, optional
+            The titles of the selected notes that already exist in the target diary.
+        """
+        super(BulkOperationError, self).__init__(message)
+        self.titles = list(titles)
+
+
+def apply_bulk_operation(diary, note_ids, operation, target=None):
+    """
+    A function that deletes, moves or copies notes of a diary with a fixed number of queries per BULK_NOTES_BATCH_SIZE selected notes.
+    The notes are deleted with raw DELETEs, moved with a single UPDATE and copied with INSERT ... SELECT statements
+    that copy their stored contents, revisions and search index entries without loading them.
+    Whether any selected title already exists in the target diary is checked before anything is written.
+    Everything is done in one transaction, along with the updates of the diaries' counters and the change feed,
+    and the author's diary index is refreshed once.
+    Unlike QuerySet.delete() and save(), no signals are sent.
+
+    Parameters
+    ----------
+    diary : Diary object
+        The diary holding the notes.
+    note_ids : iterable
+        The ids of the selected notes. Ids of notes outside the diary are ignored.
+    operation : str
+        One of 'delete', 'move' and 'copy'.
+    target : Diary object, optional
+        The diary the notes are moved or copied to. It must belong to the diary's author.
+
+    Returns
+    -------
+    int
+        The number of deleted, moved or copied notes.
+
+    Raises
+    ------
+    BulkOperationError
+        If the operation is unknown, the target diary is missing or is the diary itself,
+        or some of the selected titles already exist in the target diary.
+    """
+    if operation not in OPERATIONS:
+        raise BulkOperationError("Unknown operation '{}'.".format(operation))
+    if operation != DELETE and (target is None or target.pk == diary.pk or target.author_id != diary.author_id):
+        raise BulkOperationError("Choose another one of your diaries.")
+    with transaction.atomic():
+        rows = []
+        for batch in batches(list(note_ids)):
+            rows += Note.objects.filter(diary_id=diary.pk, id__in=batch).values_list('id', 'content_bytes')
+        if not rows:
+            return 0
+        ids = [note_id for note_id, content_bytes in rows]
+        size = sum(content_bytes for note_id, content_bytes in rows)
+        if operation == DELETE:
+            _delete_rows(NoteRevision, NoteRevision._meta.get_field('note').column, ids)
+            unindex_notes(ids)
+            count = _delete_rows(Note, 'id', ids)
+            adjust_diary_counters(diary.pk, -count, -size)
+            record_changes(diary.author_id, Change.NOTE, ids, deleted=True)
+        else:
+            existing = []
+            for batch in batches(ids):
+                titles = Note.objects.filter(id__in=batch).values('title')
+                existing += Note.objects.filter(diary_id=target.pk, title__in=titles).values_list('title', flat=True)
+            if existing:
+                existing.sort()
+                raise BulkOperationError("{} of the selected notes already exist in '{}'.".format(len(existing), target.title), existing)
+            count = 0
+            if operation == MOVE:
+                for batch in batches(ids):
+                    count += Note.objects.filter(id__in=batch).update(diary_id=target.pk)
+                adjust_diary_counters(diary.pk, -count, -size)
+                record_changes(diary.author_id, Change.NOTE, ids)
+            else:
+                copies = []
+                for batch in batches(ids):
+                    count += _copy_notes(batch, target.pk)
+                    titles = Note.objects.filter(id__in=batch).values('title')
+                    copies += Note.objects.filter(diary_id=target.pk, title__in=titles).values_list('id', flat=True)
+                record_changes(diary.author_id, Change.NOTE, copies)
+            adjust_diary_counters(target.pk, count, size)
+    invalidate_diary_index(diary.author_id)
+    return count
+
+
+def _copy_notes(note_ids, diary_id):
+    """
+    A function that copies notes to another diary of the same user along with their revisions and search index entries.
+    The copies keep the notes' versions, so their copied revisions stay valid bases for later deltas.
+
+    Parameters
+    ----------
+    note_ids : list
+        The ids of the notes to copy, at most BULK_NOTES_BATCH_SIZE of them.
+    diary_id : int
+        The id of the diary the notes are copied to.
+
+    Returns
+    -------
+    int
+        The number of copied notes.
+    """
+    qn = connection.ops.quote_name
+    ids = ', '.join(['%s'] * len(note_ids))
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    note_columns = [qn(Note._meta.get_field(name).column) for name in ['title', 'content', 'content_bytes_saved', 'version', 'content_bytes']]
+    note_sql = (
+        'INSERT INTO {table} ({diary}, {create_date}, {last_update_time}, {columns}) '
+        'SELECT %s, %s, %s, {columns} FROM {table} WHERE id IN ({ids})'
+    ).format(
+        table=qn(Note._meta.db_table),
+        diary=qn(Note._meta.get_field('diary').column),
+        create_date=qn(Note._meta.get_field('create_date').column),
+        last_update_time=qn(Note._meta.get_field('last_update_time').column),
+        columns=', '.join(note_columns),
+        ids=ids,
+    )
+    #A copied revision is matched to its copied note by the title, which is unique in the target diary.
+    revision_columns = [qn(NoteRevision._meta.get_field(name).column) for name in ['number', 'base', 'depth', 'data', 'size', 'checksum', 'create_date']]
+    revision_sql = (
+        'INSERT INTO {table} ({note}, {columns}) SELECT c.id, {source_columns} FROM {table} r '
+        'INNER JOIN {note_table} n ON n.id = r.{note} '
+        'INNER JOIN {note_table} c ON c.{diary} = %s AND c.{title} = n.{title} '
+        'WHERE r.{note} IN ({ids})'
+    ).format(
+        table=qn(NoteRevision._meta.db_table),
+        note=qn(NoteRevision._meta.get_field('note').column),
+        columns=', '.join(revision_columns),
+        source_columns=', '.join('r.{}'.format(column) for column in revision_columns),
+        note_table=qn(Note._meta.db_table),
+        diary=qn(Note._meta.get_field('diary').column),
+        title=qn(Note._meta.get_field('title').column),
+        ids=ids,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(note_sql, [diary_id, now, now, *note_ids])
+        count = cursor.rowcount
+        cursor.execute(revision_sql, [diary_id, *note_ids])
+    copy_index_entries(note_ids, diary_id)
+    return count
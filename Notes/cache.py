@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from Notes.models import Diary
+
+#The cache key of a user's diary index. It is formatted with the user's id.
+DIARY_INDEX_KEY = 'diary_index:{}'
+#The cache keys of the diary index hit and miss counters.
+DIARY_INDEX_HITS_KEY = 'diary_index:hits'
+DIARY_INDEX_MISSES_KEY = 'diary_index:misses'
+
+
+def build_diary_index(user_id):
+    """
+    A function that builds a user's diary index from the database.
+    The index is an ordered list of the user's diaries with their note counts, content sizes and last activity,
+    which are read from the diaries' counter columns without aggregating their notes. Deleted diaries are left out.
+
+    Parameters
+    ----------
+    user_id : int
+        The id of the user whose diary index is built.
+
+    Returns
+    -------
+    list
+        A list of dictionaries with the 'id', 'title', 'create_date', 'note_count', 'total_content_bytes' and 'last_activity' keys
+        ordered by title.
+    """
+    diaries = Diary.objects.live().filter(author_id=user_id).order_by('title')
+    return list(diaries.values('id', 'title', 'create_date', 'note_count', 'total_content_bytes', 'last_activity'))
+
+
+def get_diary_index(user):
+    """
+    A function that returns a user's diary index from the cache.
+    The index is built from the database and cached if it is not cached yet.
+    It is only cached with a shared cache, since a per process cache would keep serving a deleted or renamed diary
+    in the workers that did not make the change. Every call counts a cache hit or a cache miss.
+
+    Parameters
+    ----------
+    user : User object
+        The user whose diary index is returned.
+
+    Returns
+    -------
+    list
+        A list of dictionaries with the 'id', 'title', 'create_date', 'note_count', 'total_content_bytes' and 'last_activity' keys
+        ordered by title.
+    """
+    if not settings.SHARED_CACHE:
+        _count(DIARY_INDEX_MISSES_KEY)
+        return build_diary_index(user.pk)
+    key = DIARY_INDEX_KEY.format(user.pk)
+    index = cache.get(key)
+    if index is not None:
+        _count(DIARY_INDEX_HITS_KEY)
+        return index
+    _count(DIARY_INDEX_MISSES_KEY)
+    index = build_diary_index(user.pk)
+    cache.set(key, index, settings.DIARY_INDEX_CACHE_TIMEOUT)
+    return index
+
+
+def invalidate_diary_index(user_id):
+    """
+    A function that removes a user's diary index from the cache once the current transaction is committed.
+    The index is rebuilt by the next get_diary_index() call, so a write never pays for the index query.
+    Removing it before the commit would let a concurrent request cache the index as it was before the change.
+
+    Parameters
+    ----------
+    user_id : int
+        The id of the user whose diary index changed.
+    """
+    if settings.SHARED_CACHE:
+        transaction.on_commit(lambda: cache.delete(DIARY_INDEX_KEY.format(user_id)))
+
+
+def get_diary_index_stats():
+    """
+    A function that returns the diary index cache hit and miss counters.
+    With a per process cache, they only count the requests served by the calling process, which are all misses.
+
+    Returns
+    -------
+    dict
+        A dictionary with the 'hits' and 'misses' keys.
+    """
+    counters = cache.get_many([DIARY_INDEX_HITS_KEY, DIARY_INDEX_MISSES_KEY])
+    return {'hits': counters.get(DIARY_INDEX_HITS_KEY, 0), 'misses': counters.get(DIARY_INDEX_MISSES_KEY, 0)}
+
+
+def _count(key):
+    """
+    A function that increments a cache counter, creating it if it does not exist.
+
+    Parameters
+    ----------
+    key : str
+        The cache key of the counter.
+    """
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        #The counter was evicted between add() and incr().
+        cache.set(key, 1, None)
@@ -0,0 +1,125 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from Notes.models import Change, Diary, Note
+
+#The fields of the diary and note rows of a change feed response, in order.
+DIARY_FIELDS = ['id', 'title', 'create_date']
+NOTE_FIELDS = ['id', 'diary', 'title', 'version', 'last_update_time', 'content_bytes', 'content']
+
+
+def record_changes(user_id, kind, object_ids, deleted=False):
+    """
+    A function that records changes of a user's diaries or notes in the change feed with a single INSERT.
+
+    Parameters
+    ----------
+    user_id : int
+        The id of the user who owns the diaries or notes.
+    kind : str
+        Change.DIARY or Change.NOTE.
+    object_ids : iterable
+        The ids of the changed diaries or notes.
+    deleted : bool, optional
+        True if the diaries or notes were deleted, which records tombstones.
+    """
+    Change.objects.bulk_create([Change(user_id=user_id, kind=kind, object_id=object_id, deleted=deleted) for object_id in object_ids])
+
+
+def get_changes(user, since=0, limit=None, content=True):
+    """
+    A function that returns a batch of the changes of a user's diaries and notes after a cursor.
+    Only the latest change of every diary and note in the batch is returned, with the diary or note as it is now,
+    so a client applies the batch and stores the returned cursor. A changed diary or note that no longer exists,
+    including the notes of a deleted diary, is returned as deleted.
+    The batch is read with three queries, however many changes it holds.
+    Changes younger than the SYNC_VISIBILITY_LAG setting are left for a later call. On databases whose concurrent transactions
+    can commit their changes out of id order, a change with a smaller id may become visible after the cursor has passed it,
+    which the lag prevents for every transaction committed within the lag of recording its change.
+
+    Parameters
+    ----------
+    user : User object
+        The user whose changes are returned.
+    since : int, optional
+        The cursor returned by the previous call or 0 for a first sync.
+    limit : int, optional
+        The maximum number of changes read. Defaults to the SYNC_BATCH_SIZE setting.
+    content : bool, optional
+        False if the notes are returned without their content, which is then null.
+
+    Returns
+    -------
+    dict
+        The 'cursor' to pass as 'since' next time, whether there are 'more' changes after it,
+        the 'fields' of the diary and note rows, the changed 'diaries' and 'notes' as lists of values in the order of the fields,
+        and the ids of the 'deleted_diaries' and 'deleted_notes'.
+    """
+    limit = min(limit or settings.SYNC_BATCH_SIZE, settings.SYNC_BATCH_SIZE)
+    entries = Change.objects.filter(user=user, id__gt=since)
+    if settings.SYNC_VISIBILITY_LAG:
+        entries = entries.filter(create_date__lte=timezone.now() - timedelta(seconds=settings.SYNC_VISIBILITY_LAG))
+    entries = list(entries.order_by('id').values_list('id', 'kind', 'object_id', 'deleted')[:limit + 1])
+    more = len(entries) > limit
+    entries = entries[:limit]
+    latest = {}
+    for change_id, kind, object_id, is_deleted in entries:
+        latest[(kind, object_id)] = is_deleted
+    changed = {Change.DIARY: [], Change.NOTE: []}
+    deleted = {Change.DIARY: set(), Change.NOTE: set()}
+    for (kind, object_id), is_deleted in latest.items():
+        if is_deleted:
+            deleted[kind].add(object_id)
+        else:
+            changed[kind].append(object_id)
+    diaries = []
+    if changed[Change.DIARY]:
+        rows = Diary.objects.live().filter(author=user, id__in=changed[Change.DIARY]).order_by('id').values_list(*DIARY_FIELDS)
+        diaries = [[diary_id, title, create_date.isoformat()] for diary_id, title, create_date in rows]
+    notes = []
+    if changed[Change.NOTE]:
+        rows = Note.objects.filter(diary__author=user, diary__deleted_at__isnull=True, id__in=changed[Change.NOTE]).order_by('id')
+        rows = rows.only(*NOTE_FIELDS) if content else rows.defer('content')
+        notes = [[
+            note.pk, note.diary_id, note.title, note.version, note.last_update_time.isoformat(), note.content_bytes,
+            (note.content or '') if content else None,
+        ] for note in rows]
+    deleted[Change.DIARY].update(set(changed[Change.DIARY]) - {row[0] for row in diaries})
+    deleted[Change.NOTE].update(set(changed[Change.NOTE]) - {row[0] for row in notes})
+    return {
+        'cursor': entries[-1][0] if entries else since,
+        'more': more,
+        'fields': {'diaries': DIARY_FIELDS, 'notes': NOTE_FIELDS},
+        'diaries': diaries,
+        'notes': notes,
+        'deleted_diaries': sorted(deleted[Change.DIARY]),
+        'deleted_notes': sorted(deleted[Change.NOTE]),
+    }
+
+
+def compact_changes(batch_size=None):
+    """
+    A function that deletes the changes superseded by a later change of the same diary or note, in batches.
+    A client never needs them: whatever its cursor, the later change is still returned to it.
+    Tombstones are kept, unless a later change supersedes them.
+
+    Parameters
+    ----------
+    batch_size : int, optional
+        The number of changes deleted per query. Defaults to the SYNC_BATCH_SIZE setting.
+
+    Returns
+    -------
+    int
+        The number of deleted changes.
+    """
+    batch_size = batch_size or settings.SYNC_BATCH_SIZE
+    later = Change.objects.filter(kind=OuterRef('kind'), object_id=OuterRef('object_id'), id__gt=OuterRef('id'))
+    superseded = Change.objects.filter(Exists(later)).order_by('id').values_list('id', flat=True)
+    removed = 0
+    while True:
+        ids = list(superseded[:batch_size])
+        if not ids:
+            return removed
+        removed += Change.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from Notes.counters import adjust_diary_counters
+from Notes.models import Note, content_size
+from Notes.revisions import record_revision
+from Notes.signals import note_updated
+
+
+class StaleVersionError(Exception):
+    """
+    A class that represents a change made against a version of a note that is no longer the current one.
+
+    Attributes
+    ----------
+    version : int
+        The current version of the note or None if the note no longer exists.
+    """
+    def __init__(self, version):
+        """
+        Initializes a StaleVersionError object.
+
+        Parameters
+        ----------
+        version : int
+            The current version of the note or None if the note no longer exists.
+        """
+        super(StaleVersionError, self).__init__("The note is at version {}.".format(version))
+        self.version = version
+
+
+def update_note(note, version, bytes_saved=0, previous_content=None, **fields):
+    """
+    A function that saves fields of a note if it is still at the version the change was made against.
+    The check and the write are a single UPDATE ... WHERE version = ? statement that also increments the version
+    and sets the last update time, so two concurrent saves of the same version cannot both succeed.
+    The note object is updated with the saved values and a revision is recorded if the content changed.
+    The diary's total content size and last activity, the revision, the search index and the change feed are updated
+    in the same transaction, so a note never gets a new version without them.
+
+    Parameters
+    ----------
+    note : Note object
+        The note with its diary loaded.
+    version : int
+        The version of the note the change was made against.
+    bytes_saved : int, optional
+        The number of bytes the sanitization removed from the new content.
+    previous_content : str, optional
+        The content of the note at the given version. Defaults to the note object's content.
+    **fields : dict
+        The new values of the note's fields.
+
+    Returns
+    -------
+    Note object
+        The note with its new fields, version and last update time.
+
+    Raises
+    ------
+    StaleVersionError
+        If the note is no longer at the given version.
+    IntegrityError
+        If the new title is already used by another note of the diary.
+    """
+    if previous_content is None:
+        previous_content = note.content
+    size = 0
+    if 'content' in fields:
+        fields['content_bytes'] = content_size(fields['content'])
+        size = fields['content_bytes'] - content_size(previous_content)
+    now = timezone.now()
+    with transaction.atomic():
+        updated = Note.objects.filter(pk=note.pk, version=version).update(
+            version=F('version') + 1, last_update_time=now, content_bytes_saved=F('content_bytes_saved') + bytes_saved, **fields
+        )
+        if updated:
+            adjust_diary_counters(note.diary_id, 0, size, now)
+            for name, value in fields.items():
+                setattr(note, name, value)
+            note.version, note.last_update_time = version + 1, now
+            note.content_bytes_saved += bytes_saved
+            if 'content' in fields and fields['content'] != previous_content:
+                record_revision(note, previous_content)
+            note_updated.send(sender=Note, notes=[note], author_id=note.diary.author_id)
+    if not updated:
+        raise StaleVersionError(Note.objects.filter(pk=note.pk).values_list('version', flat=True).first())
+    return note
@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DateTimeField, F, Max, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from Notes.cache import invalidate_diary_index
+from Notes.models import Diary, Note
+
+
+def adjust_diary_counters(diary_id, notes=0, content_bytes=0, activity=None):
+    """
+    A function that adds to the note count and the total content size of a diary and records its last activity
+    with a single UPDATE. The counters are changed with F() expressions, so concurrent writers never overwrite each other's changes.
+
+    Parameters
+    ----------
+    diary_id : int
+        The id of the diary.
+    notes : int, optional
+        The change of the number of notes.
+    content_bytes : int, optional
+        The change of the total content size in bytes.
+    activity : datetime.datetime, optional
+        The time of the change. Defaults to now. The last activity is never moved back.
+    """
+    activity = Value(activity or timezone.now(), output_field=DateTimeField())
+    Diary.objects.filter(pk=diary_id).update(
+        note_count=F('note_count') + notes,
+        total_content_bytes=F('total_content_bytes') + content_bytes,
+        last_activity=Greatest(Coalesce('last_activity', activity), activity),
+    )
+
+
+def reconcile_diary_counters(batch_size=None, progress=None):
+    """
+    A function that recounts the notes and content sizes of every diary and repairs the counters that drifted,
+    such as after notes were written without going through the application.
+    The diaries are checked in batches, each locked and recounted with a single grouped query in its own transaction.
+    The last activity is only moved forward to the latest update of the diary's notes, since deletions leave no trace to recount.
+
+    Parameters
+    ----------
+    batch_size : int, optional
+        The number of diaries checked per transaction. Defaults to the DIARY_RECONCILE_BATCH_SIZE setting.
+    progress : function, optional
+        A function called after every batch with the number of diaries checked and repaired so far.
+
+    Returns
+    -------
+    tuple
+        The number of checked diaries and the number of repaired diaries.
+    """
+    batch_size = batch_size or settings.DIARY_RECONCILE_BATCH_SIZE
+    checked = repaired = 0
+    last_id = 0
+    while True:
+        authors = set()
+        with transaction.atomic():
+            diaries = list(Diary.objects.select_for_update().filter(pk__gt=last_id).order_by('id')[:batch_size])
+            if not diaries:
+                break
+            stats = Note.objects.filter(diary_id__in=[diary.pk for diary in diaries]).order_by().values('diary_id').annotate(
+                count=Count('id'), size=Sum('content_bytes'), latest=Max('last_update_time'),
+            )
+            stats = {row['diary_id']: row for row in stats}
+            drifted = []
+            for diary in diaries:
+                row = stats.get(diary.pk, {'count': 0, 'size': 0, 'latest': None})
+                latest = row['latest']
+                if diary.last_activity is not None and (latest is None or diary.last_activity > latest):
+                    latest = diary.last_activity
+                if (diary.note_count, diary.total_content_bytes, diary.last_activity) != (row['count'], row['size'] or 0, latest):
+                    diary.note_count, diary.total_content_bytes, diary.last_activity = row['count'], row['size'] or 0, latest
+                    drifted.append(diary)
+                    authors.add(diary.author_id)
+            Diary.objects.bulk_update(drifted, ['note_count', 'total_content_bytes', 'last_activity'])
+        for author_id in authors:
+            invalidate_diary_index(author_id)
+        checked += len(diaries)
+        repaired += len(drifted)
+        last_id = diaries[-1].pk
+        if progress is not None:
+            progress(checked, repaired)
+    return checked, repaired
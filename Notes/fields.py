@@ -0,0 +1,245 @@
+import zlib
+from django.conf import settings
+from django.db.models.query_utils import DeferredAttribute
+from ckeditor.fields import RichTextField
+
+#The header byte of content stored as plain UTF-8.
+RAW = b'\x00'
+#The header byte of content compressed with zlib.
+ZLIB = b'\x01'
+#The header byte of content compressed with zlib and the preset dictionary below.
+ZLIB_DICTIONARY = b'\x02'
+#The preset dictionary used for small notes, made of the markup and words the editor produces most.
+#Compressed content refers to it, so it must never be changed. A new dictionary needs a new header byte.
+DICTIONARY = (
+    b' the and that with for this was have from they will would there their what about which when your '
+    b'can said were been has more some into just also than them only time very after over well day today '
+    b'<br />\n&nbsp;&quot;&amp;&#39;<a href="https://" target="_blank"><img alt="" src="/media/note_images/'
+    b'" style="height:px; width:px" /><span style="font-size:px"><span style="color:#"><span style="background-color:#">'
+    b'<h1></h1>\n\n<h2></h2>\n\n<h3></h3>\n\n<blockquote>\n<p></p>\n</blockquote>\n\n<ol>\n\t<li></li>\n</ol>\n\n'
+    b'<ul>\n\t<li></li>\n\t<li></li>\n</ul>\n\n<p style="text-align:center"><p style="margin-left:40px">'
+    b'<s></s><u></u><em></em><strong></strong></span></a></p>\n\n<p>&nbsp;</p>\n\n<p>'
+)
+#The size in bytes up to which content is compressed with the preset dictionary.
+DICTIONARY_MAX_SIZE = 4096
+
+
+class CompressedValue(bytes):
+    """
+    A class that represents the stored form of a compressed text value: a header byte followed by the data.
+    Model instances hold it until the field is accessed, and it is written back as it is if the field was never accessed.
+    """
+
+
+def compress_text(value, level=6):
+    """
+    A function that converts a text value into its stored form.
+    Small values are compressed with the preset dictionary. Values that do not get smaller are stored as plain UTF-8.
+
+    Parameters
+    ----------
+    value : str
+        The text value.
+    level : int, optional
+        The zlib compression level. 0 stores the value as plain UTF-8.
+
+    Returns
+    -------
+    CompressedValue object
+        The stored form.
+    """
+    data = value.encode()
+    if not level:
+        return CompressedValue(RAW + data)
+    if len(data) <= DICTIONARY_MAX_SIZE:
+        compressor = zlib.compressobj(level, zdict=DICTIONARY)
+        header = ZLIB_DICTIONARY
+    else:
+        compressor = zlib.compressobj(level)
+        header = ZLIB
+    compressed = compressor.compress(data) + compressor.flush()
+    if len(compressed) >= len(data):
+        return CompressedValue(RAW + data)
+    return CompressedValue(header + compressed)
+
+
+def decompress_text(value):
+    """
+    A function that converts the stored form of a text value back into the text.
+
+    Parameters
+    ----------
+    value : bytes
+        The stored form.
+
+    Returns
+    -------
+    str
+        The text value.
+
+    Raises
+    ------
+    ValueError
+        If the header byte is unknown.
+    """
+    header, data = value[:1], bytes(value[1:])
+    if header == RAW:
+        return data.decode()
+    if header == ZLIB:
+        return zlib.decompress(data).decode()
+    if header == ZLIB_DICTIONARY:
+        decompressor = zlib.decompressobj(zdict=DICTIONARY)
+        return (decompressor.decompress(data) + decompressor.flush()).decode()
+    raise ValueError("Unknown compressed value header {!r}.".format(header))
+
+
+class DecompressingAttribute(DeferredAttribute):
+    """
+    A class that extends Django's DeferredAttribute.
+    It decompresses the stored form of a field the first time the field is accessed on an instance,
+    so instances whose field is never accessed never decompress it.
+    """
+    def __get__(self, instance, cls=None):
+        """
+        Returns the field's text value, loading it if it was deferred and decompressing it on first access.
+
+        Parameters
+        ----------
+        instance : Model object
+            The model instance.
+        cls : class, optional
+            The model class.
+
+        Returns
+        -------
+        str
+            The text value.
+        """
+        if instance is None:
+            return self
+        value = super(DecompressingAttribute, self).__get__(instance, cls)
+        if isinstance(value, CompressedValue):
+            value = decompress_text(value)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+    def __set__(self, instance, value):
+        """
+        Sets the field's value on an instance.
+        Defining it makes the attribute a data descriptor, so that __get__() is called even once the value is set.
+
+        Parameters
+        ----------
+        instance : Model object
+            The model instance.
+        value : object
+            The text value or its stored form.
+        """
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedRichTextField(RichTextField):
+    """
+    A class that extends CKEditor's RichTextField.
+    The HTML is stored compressed with zlib in a binary column behind a header byte that tells how it was stored,
+    and it is decompressed lazily when the field is accessed.
+    Writes are compressed unless the NOTE_CONTENT_COMPRESSION setting is False, and all stored forms are always readable.
+    The stored form cannot be filtered on, and values() and values_list() return it as a CompressedValue
+    to be converted with decompress_text().
+    """
+    descriptor_class = DecompressingAttribute
+
+    def get_internal_type(self):
+        """
+        Returns the internal type that decides the column type.
+
+        Returns
+        -------
+        str
+            'BinaryField', so that the column is a BLOB or bytea column.
+        """
+        return 'BinaryField'
+
+    def from_db_value(self, value, expression, connection):
+        """
+        Converts a database value into its stored form without decompressing it.
+
+        Returns
+        -------
+        CompressedValue object
+            The stored form or None.
+        """
+        if value is None:
+            return None
+        return CompressedValue(value)
+
+    def pre_save(self, model_instance, add):
+        """
+        Returns the value of an instance to be saved. A stored form that was never decompressed is returned as it is,
+        so saving an instance whose field was not accessed does not decompress it.
+
+        Parameters
+        ----------
+        model_instance : Model object
+            The model instance being saved.
+        add : bool
+            True if the instance is being added.
+
+        Returns
+        -------
+        object
+            The text value or its stored form.
+        """
+        value = model_instance.__dict__.get(self.attname)
+        if isinstance(value, CompressedValue):
+            return value
+        return super(CompressedRichTextField, self).pre_save(model_instance, add)
+
+    def get_prep_value(self, value):
+        """
+        Converts a text value into its stored form. A stored form that was never decompressed is kept as it is.
+
+        Parameters
+        ----------
+        value : str
+            The text value or its stored form.
+
+        Returns
+        -------
+        bytes
+            The stored form or None.
+        """
+        if value is None or isinstance(value, CompressedValue):
+            return value
+        level = settings.NOTE_CONTENT_COMPRESSION_LEVEL if settings.NOTE_CONTENT_COMPRESSION else 0
+        return compress_text(str(value), level)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        """
+        Converts a value into a database binary value.
+
+        Returns
+        -------
+        object
+            The database driver's binary value or None.
+        """
+        value = super(CompressedRichTextField, self).get_db_prep_value(value, connection, prepared)
+        if value is not None:
+            return connection.Database.Binary(value)
+        return value
+
+    def value_to_string(self, obj):
+        """
+        Returns the text value of an instance for serialization.
+
+        Parameters
+        ----------
+        obj : Model object
+            The model instance.
+
+        Returns
+        -------
+        str
+            The text value.
+        """
+        return self.value_from_object(obj)
@@ -1,5 +1,9 @@
 from django import forms
+from django.conf import settings
+from .concurrency import update_note
+from .bulk import COPY, MOVE, OPERATIONS
 from .models import Diary, Note
+from .sanitizer import sanitize_note_content
 
 class DiaryForm(forms.ModelForm):
     """
@@ -42,7 +46,22 @@ class EditNoteForm(forms.ModelForm):
     """
     This class extends Django's ModelForm.
     This class is used for creating a form for editing a user's notes.
+    The submitted content is sanitized and compacted before it is saved.
+    The form carries the version of the note it was rendered with, and the note is only saved if it is still at that version.
+
+    Attributes
+    ----------
+    version : IntegerField
+        A hidden field holding the version of the note the edit was made against.
+
+    Methods
+    -------
+    clean_content()
+        Sanitizes the submitted content.
+    save(commit=True)
+        Overrides Django's default ModelForm class save() method.
     """
+    version = forms.IntegerField(min_value=1, widget=forms.HiddenInput)
 
     class Meta:
         """
@@ -75,6 +94,52 @@ class EditNoteForm(forms.ModelForm):
         #Changes the default form widgets appearance of every field in the form class using update()
         self.fields['title'].widget.attrs.update({'class':'form-control', 'placeholder':"Enter your note's title here"})
         self.fields['content'].widget.attrs.update({'class':'form-control', 'placeholder':'Enter your content here'})
+        self.fields['version'].initial = self.instance.version
+        self.content_bytes_saved = 0
+        self.previous_content = self.instance.content or ''
+
+    def clean_content(self):
+        """
+        Sanitizes the submitted content to the allowed tags, attributes and styles,
+        collapses redundant markup and moves embedded data URI images into the default storage.
+
+        Returns
+        -------
+        content : str
+            The sanitized content.
+        """
+        content, self.content_bytes_saved = sanitize_note_content(self.cleaned_data['content'])
+        return content
+
+    def save(self, commit=True):
+        """
+        Overrides the default ModelForm save().
+        The note is saved with a single conditional UPDATE that checks the submitted version,
+        increments it and adds the bytes saved by the sanitization of the content to the note's total.
+
+        Parameters
+        ----------
+        commit : bool, optional
+            Sets the flag to True or False for commiting changes to the database.
+            The default value is True.
+
+        Returns
+        -------
+        note : object
+            The note object.
+
+        Raises
+        ------
+        StaleVersionError
+            If the note was saved by someone else since the form was rendered.
+        IntegrityError
+            If the new title is already used by another note of the diary.
+        """
+        note = super(EditNoteForm, self).save(commit=False)
+        if not commit:
+            note.content_bytes_saved += self.content_bytes_saved
+            return note
+        return update_note(note, self.cleaned_data['version'], self.content_bytes_saved, self.previous_content, title=note.title, content=note.content)
 
 
 class NewNoteForm(forms.ModelForm):
@@ -113,3 +178,136 @@ class NewNoteForm(forms.ModelForm):
 
         #Changes the default form widgets appearance of every field in the form class using update()
         self.fields['title'].widget.attrs.update({'class':'form-control', 'placeholder':"Enter your note's title here"})
+
+
+class SearchForm(forms.Form):
+    """
+    This class extends Django's default Form class.
+    This class is used for creating a form for searching a user's notes.
+
+    Attributes
+    ----------
+    q : str
+        The search text.
+    """
+    q = forms.CharField(max_length=200)
+
+    def __init__(self, *args, **kwargs):
+        """
+        Overrides the default form widgets for modifying the form field appearance.
+
+        Parameters
+        ----------
+        *args
+            Non key-worded variable number arguments.
+        **kwargs : dict
+            Variable dictionary arguments.
+        """
+        super(SearchForm, self).__init__(*args, **kwargs)
+
+        #Changes the default form widgets appearance of every field in the form class using update()
+        self.fields['q'].widget.attrs.update({'class':'form-control', 'placeholder':'Search your notes'})
+
+
+class ImportForm(forms.Form):
+    """
+    This class extends Django's default Form class.
+    This class is used for creating a form for importing an archive of diaries and notes.
+
+    Attributes
+    ----------
+    archive : file
+        A ZIP archive in the export format or a JSON bundle.
+    resume : bool
+        True if notes imported by an earlier attempt are skipped instead of reported as duplicates.
+    """
+    archive = forms.FileField()
+    resume = forms.BooleanField(required=False)
+
+    def __init__(self, *args, **kwargs):
+        """
+        Overrides the default form widgets for modifying the form field appearance.
+
+        Parameters
+        ----------
+        *args
+            Non key-worded variable number arguments.
+        **kwargs : dict
+            Variable dictionary arguments.
+        """
+        super(ImportForm, self).__init__(*args, **kwargs)
+
+        #Changes the default form widgets appearance of every field in the form class using update()
+        self.fields['archive'].widget.attrs.update({'class':'form-control-file text-white', 'accept':'.zip,.json'})
+        self.fields['resume'].widget.attrs.update({'class':'form-check-input'})
+
+
+class BulkNotesForm(forms.Form):
+    """
+    This class extends Django's default Form class.
+    This class is used for creating a form for deleting, moving or copying the selected notes of a user's diary.
+
+    Attributes
+    ----------
+    operation : str
+        One of 'delete', 'move' and 'copy'.
+    notes : list
+        The ids of the selected notes, submitted as repeated 'notes' values.
+    target : Diary object
+        The diary the notes are moved or copied to, chosen by title among the user's other diaries.
+    """
+    operation = forms.ChoiceField(choices=[(operation, operation.capitalize()) for operation in OPERATIONS])
+    notes = forms.Field(widget=forms.MultipleHiddenInput)
+    target = forms.ModelChoiceField(queryset=Diary.objects.none(), to_field_name='title', required=False)
+
+    def __init__(self, diary, *args, **kwargs):
+        """
+        Limits the target diaries to the diary author's other diaries.
+
+        Parameters
+        ----------
+        diary : Diary object
+            The diary holding the notes.
+        *args
+            Non key-worded variable number arguments.
+        **kwargs : dict
+            Variable dictionary arguments.
+        """
+        super(BulkNotesForm, self).__init__(*args, **kwargs)
+        self.fields['target'].queryset = Diary.objects.live().filter(author_id=diary.author_id).exclude(pk=diary.pk)
+
+    def clean_notes(self):
+        """
+        Converts the selected note ids to integers.
+
+        Returns
+        -------
+        list
+            The distinct note ids.
+
+        Raises
+        ------
+        ValidationError
+            If an id is not an integer or more than NOTES_BULK_LIMIT notes are selected.
+        """
+        try:
+            ids = sorted({int(value) for value in self.cleaned_data['notes']})
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Select the notes from the list.")
+        if len(ids) > settings.NOTES_BULK_LIMIT:
+            raise forms.ValidationError("Select at most {} notes at a time.".format(settings.NOTES_BULK_LIMIT))
+        return ids
+
+    def clean(self):
+        """
+        Requires a target diary when the notes are moved or copied.
+
+        Returns
+        -------
+        dict
+            The cleaned data.
+        """
+        cleaned_data = super(BulkNotesForm, self).clean()
+        if cleaned_data.get('operation') in (MOVE, COPY) and not cleaned_data.get('target'):
+            self.add_error('target', "Choose the diary the notes are moved or copied to.")
+        return cleaned_data
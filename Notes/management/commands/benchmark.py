@@ -0,0 +1,119 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from Notes.benchmarks import (
+    TRANSPORTS, compare_results, run_benchmarks, run_concurrency_benchmark, run_storage_benchmark, run_write_benchmark,
+)
+
+
+class Command(BaseCommand):
+    """
+    A management command that benchmarks the diary and note routes on synthetic data.
+    The benchmark runs in a test database that is created and destroyed by the command, so real data is never touched.
+    """
+    help = "Benchmarks the diary and note routes on synthetic data in a test database."
+
+    def add_arguments(self, parser):
+        """
+        Adds the command's arguments.
+
+        Parameters
+        ----------
+        parser : ArgumentParser object
+            The command's argument parser.
+        """
+        parser.add_argument('--users', type=int, default=5, help="The number of synthetic users.")
+        parser.add_argument('--diaries', type=int, default=10, help="The number of diaries per user.")
+        parser.add_argument('--notes', type=int, default=50, help="The number of notes per diary.")
+        parser.add_argument('--content-size', type=int, default=4000, help="The approximate size of every note in bytes.")
+        parser.add_argument('--requests', type=int, default=200, help="The number of requests per read route.")
+        parser.add_argument('--transport', choices=sorted(TRANSPORTS), action='append', help="The transport to measure. Defaults to all of them.")
+        parser.add_argument('--storage', action='store_true', help="Also compare the size and read latency of plain and compressed note contents.")
+        parser.add_argument('--write-profile', choices=sorted(settings.DATABASE_PROFILES), action='append', help="A database profile whose write throughput is measured under concurrent writers.")
+        parser.add_argument('--workers', type=int, default=4, help="The number of concurrent writers of the write benchmark.")
+        parser.add_argument('--write-operations', type=int, default=200, help="The number of saves per writer of the write benchmark.")
+        parser.add_argument('--concurrency', type=int, action='append', help="A number of concurrent connections at which the WSGI and ASGI deployments are compared.")
+        parser.add_argument('--threads', type=int, default=8, help="The number of worker threads of the WSGI deployment in the concurrency benchmark.")
+        parser.add_argument('--seed', type=int, default=0, help="The seed of the synthetic data.")
+        parser.add_argument('--output', help="The path of the JSON file the results are saved to.")
+        parser.add_argument('--baseline', help="The path of earlier JSON results to compare with.")
+        parser.add_argument('--threshold', type=float, default=0.1, help="The relative growth reported as a regression.")
+
+    def handle(self, *args, **options):
+        """
+        Runs the benchmarks, prints a summary and saves the results.
+
+        Parameters
+        ----------
+        *args
+            Non key-worded variable number arguments.
+        **options : dict
+            The command options.
+
+        Raises
+        ------
+        CommandError
+            If the baseline cannot be read or the benchmark fails.
+        """
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as error:
+                raise CommandError("The baseline cannot be read: {}".format(error))
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = run_benchmarks(
+                options['users'], options['diaries'], options['notes'], options['content_size'], options['requests'],
+                options['transport'] or sorted(TRANSPORTS), options['seed'],
+            )
+            if options['storage']:
+                notes = options['users'] * options['diaries'] * options['notes']
+                results['storage'] = run_storage_benchmark(notes, options['content_size'], options['requests'], options['seed'])
+            if options['write_profile']:
+                results['writes'] = run_write_benchmark(
+                    options['write_profile'], options['workers'], options['write_operations'], options['content_size'], options['seed'],
+                )
+            if options['concurrency']:
+                results['concurrency'] = run_concurrency_benchmark(
+                    options['users'], options['diaries'], options['notes'], options['content_size'],
+                    options['concurrency'], options['requests'], options['threads'], options['seed'],
+                )
+        except RuntimeError as error:
+            raise CommandError(str(error))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        for transport, measured in results['transports'].items():
+            self.stdout.write("{} (data generated in {}s, RSS growth {:.1f} MiB)".format(
+                transport, measured['setup_seconds'], measured['rss_growth_bytes'] / 2 ** 20))
+            for route, summary in measured['routes'].items():
+                self.stdout.write("  {:<16} n={requests:<5} p50={p50_ms:>8.2f}ms p95={p95_ms:>8.2f}ms p99={p99_ms:>8.2f}ms queries={queries_per_request}".format(route, **summary))
+        for mode, measured in results.get('storage', {}).items():
+            self.stdout.write("storage {}: {} content bytes stored in {} bytes, load p50={:.2f}ms, load and read p50={:.2f}ms".format(
+                mode, measured['content_bytes'], measured['stored_bytes'],
+                measured['reads']['load']['p50_ms'], measured['reads']['load_and_read']['p50_ms']))
+        for profile, measured in results.get('writes', {}).items():
+            if 'error' in measured:
+                self.stdout.write(self.style.WARNING("writes {}: skipped, {}".format(profile, measured['error'])))
+                continue
+            self.stdout.write("writes {}: {saves_per_second} saves per second with {workers} writers, {failed_saves} failed saves, p95={p95_ms:.2f}ms".format(
+                profile, p95_ms=measured['latency']['p95_ms'], **measured))
+        for deployment, levels in results.get('concurrency', {}).items():
+            for level, measured in levels.items():
+                self.stdout.write("concurrency {} with {} connections: {} requests per second, p50={:.2f}ms p95={:.2f}ms".format(
+                    deployment, level, measured['requests_per_second'], measured['latency']['p50_ms'], measured['latency']['p95_ms']))
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+            self.stdout.write("Results saved to {}.".format(options['output']))
+        if baseline is not None:
+            regressions = compare_results(baseline, results, options['threshold'])
+            for regression in regressions:
+                self.stdout.write(self.style.WARNING(regression))
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS("No regressions compared with the baseline."))
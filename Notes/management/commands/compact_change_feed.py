@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from Notes.changes import compact_changes
+
+
+class Command(BaseCommand):
+    """
+    A management command that deletes the changes of the change feed that are superseded by a later change of the same diary or note.
+    """
+    help = "Deletes the superseded changes of the change feed in batches."
+
+    def add_arguments(self, parser):
+        """
+        Adds the command's arguments.
+
+        Parameters
+        ----------
+        parser : ArgumentParser object
+            The command's argument parser.
+        """
+        parser.add_argument('--batch-size', type=int, default=None, help="The number of changes deleted per query.")
+
+    def handle(self, *args, **options):
+        """
+        Deletes the superseded changes and prints their number.
+
+        Parameters
+        ----------
+        *args
+            Non key-worded variable number arguments.
+        **options : dict
+            The command options.
+        """
+        removed = compact_changes(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS("Deleted {} superseded changes.".format(removed)))
@@ -0,0 +1,48 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from Notes.models import NoteRevision
+from Notes.revisions import compact_revisions
+
+
+class Command(BaseCommand):
+    """
+    A management command that thins out old note revisions and merges their deltas.
+    """
+    help = "Keeps one revision per period of the note revisions older than the retention period and merges their deltas."
+
+    def add_arguments(self, parser):
+        """
+        Adds the command's arguments.
+
+        Parameters
+        ----------
+        parser : ArgumentParser object
+            The command's argument parser.
+        """
+        parser.add_argument('--days', type=int, default=None, help="The number of days every revision is kept. Defaults to NOTE_REVISION_RETENTION_DAYS.")
+        parser.add_argument('--period-hours', type=int, default=24, help="The period of which one older revision is kept.")
+
+    def handle(self, *args, **options):
+        """
+        Compacts the revisions of every note with revisions older than the retention period and prints the outcome.
+
+        Parameters
+        ----------
+        *args
+            Non key-worded variable number arguments.
+        **options : dict
+            The command options.
+        """
+        days = options['days'] if options['days'] is not None else settings.NOTE_REVISION_RETENTION_DAYS
+        before = timezone.now() - timedelta(days=days)
+        period = timedelta(hours=options['period_hours'])
+        note_ids = NoteRevision.objects.filter(create_date__lt=before).values_list('note_id', flat=True).distinct()
+        notes = removed = saved = 0
+        for note_id in list(note_ids):
+            note_removed, note_saved = compact_revisions(note_id, before, period)
+            notes += bool(note_removed)
+            removed += note_removed
+            saved += note_saved
+        self.stdout.write("Removed {} revisions of {} notes and saved {} bytes.".format(removed, notes, saved))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from Notes.cache import get_diary_index_stats
+
+
+class Command(BaseCommand):
+    """
+    A management command that prints the diary index cache hit and miss counters.
+    """
+    help = "Prints the diary index cache hit and miss counters."
+
+    def handle(self, *args, **options):
+        """
+        Prints the counters and the resulting hit ratio.
+
+        Parameters
+        ----------
+        *args
+            Non key-worded variable number arguments.
+        **options : dict
+            The command options.
+        """
+        stats = get_diary_index_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0.0
+        self.stdout.write("hits: {hits}\nmisses: {misses}".format(**stats))
+        self.stdout.write("hit ratio: {:.2%}".format(ratio))
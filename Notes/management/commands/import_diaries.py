@@ -0,0 +1,52 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from Notes.archive import ArchiveError, import_archive
+
+
+class Command(BaseCommand):
+    """
+    A management command that imports an archive of diaries and notes into a user's account.
+    """
+    help = "Imports a ZIP archive or JSON bundle of diaries and notes into a user's account."
+
+    def add_arguments(self, parser):
+        """
+        Adds the command's arguments.
+
+        Parameters
+        ----------
+        parser : ArgumentParser object
+            The command's argument parser.
+        """
+        parser.add_argument('username', help="The username of the account the archive is imported into.")
+        parser.add_argument('path', help="The path of the ZIP archive or JSON bundle.")
+        parser.add_argument('--resume', action='store_true', help="Skip notes imported by an earlier attempt.")
+        parser.add_argument('--batch-size', type=int, default=None, help="The number of notes created per transaction.")
+
+    def handle(self, *args, **options):
+        """
+        Imports the archive and prints the outcome and throughput.
+
+        Parameters
+        ----------
+        *args
+            Non key-worded variable number arguments.
+        **options : dict
+            The command options.
+
+        Raises
+        ------
+        CommandError
+            If the user does not exist or the archive cannot be imported.
+        """
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError("The user '{}' does not exist.".format(options['username']))
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_archive(user, file, options['resume'], options['batch_size'])
+        except ArchiveError as error:
+            raise CommandError("\n".join(error.errors))
+        self.stdout.write("Created {} diaries and {} notes, skipped {} notes in {:.2f} seconds ({:.0f} notes per second).".format(
+            result.diaries_created, result.notes_created, result.notes_skipped, result.seconds, result.notes_per_second))
@@ -0,0 +1,60 @@
+import time
+from django.core.management.base import BaseCommand
+from Notes.purge import purge_deleted_diaries
+
+
+class Command(BaseCommand):
+    """
+    A management command that purges the notes of the diaries deleted by their users.
+    It runs as a background worker process when the --loop option is given.
+    """
+    help = "Purges the deleted diaries and their notes in batches."
+
+    def add_arguments(self, parser):
+        """
+        Adds the command's arguments.
+
+        Parameters
+        ----------
+        parser : ArgumentParser object
+            The command's argument parser.
+        """
+        parser.add_argument('--batch-size', type=int, default=None, help="The number of notes deleted per transaction.")
+        parser.add_argument('--pause', type=float, default=None, help="The number of seconds to wait between transactions.")
+        parser.add_argument('--loop', action='store_true', help="Keep polling for deleted diaries instead of exiting when there are none.")
+        parser.add_argument('--interval', type=float, default=30.0, help="The number of seconds to wait between polls.")
+
+    def handle(self, *args, **options):
+        """
+        Purges the deleted diaries until there are none left, or forever with the --loop option.
+        The progress of every diary is printed after each batch.
+
+        Parameters
+        ----------
+        *args
+            Non key-worded variable number arguments.
+        **options : dict
+            The command options.
+        """
+        while True:
+            diaries, notes = purge_deleted_diaries(options['batch_size'], options['pause'], self._progress)
+            if diaries:
+                self.stdout.write(self.style.SUCCESS("Purged {} diaries with {} notes.".format(diaries, notes)))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def _progress(self, diary, purged, total):
+        """
+        A method that prints the progress of a diary's purge.
+
+        Parameters
+        ----------
+        diary : Diary object
+            The diary being purged.
+        purged : int
+            The number of notes purged so far.
+        total : int
+            The number of notes the diary had.
+        """
+        self.stdout.write("Diary {} ({}): {}/{} notes purged.".format(diary.pk, diary.title, purged, total))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from Notes.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    """
+    A management command that rebuilds the full-text search index of the notes.
+    """
+    help = "Rebuilds the full-text search index of the notes."
+
+    def add_arguments(self, parser):
+        """
+        Adds the command's arguments.
+
+        Parameters
+        ----------
+        parser : ArgumentParser object
+            The command's argument parser.
+        """
+        parser.add_argument('--batch-size', type=int, default=1000, help="The number of notes indexed at a time.")
+
+    def handle(self, *args, **options):
+        """
+        Rebuilds the index and prints the number of indexed notes.
+
+        Parameters
+        ----------
+        *args
+            Non key-worded variable number arguments.
+        **options : dict
+            The command options.
+        """
+        count = rebuild_search_index(options['batch_size'])
+        self.stdout.write("Indexed {} notes.".format(count))
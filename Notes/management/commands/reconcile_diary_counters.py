@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from Notes.counters import reconcile_diary_counters
+
+
+class Command(BaseCommand):
+    """
+    A management command that recounts the notes and content sizes of the diaries and repairs the counters that drifted.
+    """
+    help = "Recounts the notes of every diary in batches and repairs the drifted counters."
+
+    def add_arguments(self, parser):
+        """
+        Adds the command's arguments.
+
+        Parameters
+        ----------
+        parser : ArgumentParser object
+            The command's argument parser.
+        """
+        parser.add_argument('--batch-size', type=int, default=None, help="The number of diaries recounted per transaction.")
+
+    def handle(self, *args, **options):
+        """
+        Recounts every diary and prints the number of repaired diaries.
+
+        Parameters
+        ----------
+        *args
+            Non key-worded variable number arguments.
+        **options : dict
+            The command options.
+        """
+        checked, repaired = reconcile_diary_counters(options['batch_size'], self._progress)
+        self.stdout.write(self.style.SUCCESS("Checked {} diaries and repaired {}.".format(checked, repaired)))
+
+    def _progress(self, checked, repaired):
+        """
+        A method that prints the progress of the recount.
+
+        Parameters
+        ----------
+        checked : int
+            The number of diaries checked so far.
+        repaired : int
+            The number of diaries repaired so far.
+        """
+        self.stdout.write("{} diaries checked, {} repaired.".format(checked, repaired))
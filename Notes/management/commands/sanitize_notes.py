@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from Notes.concurrency import StaleVersionError, update_note
+from Notes.models import Note
+from Notes.sanitizer import sanitize_note_content
+
+
+class Command(BaseCommand):
+    """
+    A management command that runs the content sanitization pipeline over the existing notes.
+    The notes are saved with update_note(), so their versions and last update times move on, which expires their cached
+    fragments and ETags, and their diaries' counters, revisions, search index entries and the change feed are updated.
+    """
+    help = "Sanitizes and compacts the content of the existing notes."
+
+    def add_arguments(self, parser):
+        """
+        Adds the command's arguments.
+
+        Parameters
+        ----------
+        parser : ArgumentParser object
+            The command's argument parser.
+        """
+        parser.add_argument('--batch-size', type=int, default=500, help="The number of notes read at a time.")
+
+    def handle(self, *args, **options):
+        """
+        Sanitizes every note whose content changes and prints the number of bytes saved.
+        A note edited while the command runs is skipped, since its new content is sanitized when it is saved.
+
+        Parameters
+        ----------
+        *args
+            Non key-worded variable number arguments.
+        **options : dict
+            The command options.
+        """
+        changed = saved = 0
+        notes = Note.objects.select_related('diary').only(
+            'id', 'title', 'content', 'content_bytes', 'content_bytes_saved', 'version', 'last_update_time', 'diary__author',
+        )
+        for note in notes.iterator(chunk_size=options['batch_size']):
+            content, note_saved = sanitize_note_content(note.content)
+            if content == note.content:
+                continue
+            try:
+                update_note(note, note.version, note_saved, content=content)
+            except StaleVersionError:
+                continue
+            changed += 1
+            saved += note_saved
+        self.stdout.write("Sanitized {} notes and saved {} bytes.".format(changed, saved))
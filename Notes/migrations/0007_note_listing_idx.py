@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-18 00:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Notes', '0006_note_last_update_time'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['diary', 'title', 'last_update_time'], name='note_listing_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+import html
+import re
+from django.db import migrations
+from django.utils.html import strip_tags
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Creates the FTS5 table that indexes the notes and fills it with the existing notes.
+    The table is only created on SQLite.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE notes_note_fts USING fts5("
+        "owner, title, body, tokenize = 'porter unicode61 remove_diacritics 2')"
+    )
+    Note = apps.get_model('Notes', 'Note')
+    rows = []
+    with schema_editor.connection.cursor() as cursor:
+        for note in Note.objects.using(schema_editor.connection.alias).select_related('diary').iterator(chunk_size=1000):
+            body = re.sub(r'\s+', ' ', html.unescape(strip_tags(note.content or ''))).strip()
+            rows.append((note.pk, 'u{}'.format(note.diary.author_id), note.title, body))
+            if len(rows) == 1000:
+                cursor.executemany('INSERT INTO notes_note_fts (rowid, owner, title, body) VALUES (%s, %s, %s, %s)', rows)
+                rows = []
+        cursor.executemany('INSERT INTO notes_note_fts (rowid, owner, title, body) VALUES (%s, %s, %s, %s)', rows)
+
+
+def drop_search_index(apps, schema_editor):
+    """
+    Drops the FTS5 table that indexes the notes.
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS notes_note_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Notes', '0007_note_listing_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
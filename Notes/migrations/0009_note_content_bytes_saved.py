@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-18 00:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Notes', '0008_note_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='content_bytes_saved',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.1.14 on 2026-10-18 00:36
+
+from django.db import migrations, models
+
+
+def measure_content(apps, schema_editor):
+    """
+    Fills the content size of the existing notes in batches.
+    """
+    Note = apps.get_model('Notes', 'Note')
+    batch = []
+    for note in Note.objects.using(schema_editor.connection.alias).only('id', 'content').iterator(chunk_size=1000):
+        note.content_bytes = len((note.content or '').encode())
+        batch.append(note)
+        if len(batch) == 1000:
+            Note.objects.using(schema_editor.connection.alias).bulk_update(batch, ['content_bytes'])
+            batch = []
+    Note.objects.using(schema_editor.connection.alias).bulk_update(batch, ['content_bytes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Notes', '0011_noterevision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='content_bytes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(measure_content, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+import Notes.fields
+from django.db import migrations
+
+#The number of notes converted at a time.
+BATCH_SIZE = 500
+
+
+def compress_content(apps, schema_editor):
+    """
+    Copies the content of the existing notes into the compressed column in batches.
+    """
+    Note = apps.get_model('Notes', 'Note')
+    batch = []
+    for note in Note.objects.using(schema_editor.connection.alias).only('id', 'content').iterator(chunk_size=BATCH_SIZE):
+        note.compressed_content = note.content
+        batch.append(note)
+        if len(batch) == BATCH_SIZE:
+            Note.objects.using(schema_editor.connection.alias).bulk_update(batch, ['compressed_content'])
+            batch = []
+    Note.objects.using(schema_editor.connection.alias).bulk_update(batch, ['compressed_content'])
+
+
+def decompress_content(apps, schema_editor):
+    """
+    Copies the content of the existing notes back into the text column in batches.
+    """
+    Note = apps.get_model('Notes', 'Note')
+    batch = []
+    for note in Note.objects.using(schema_editor.connection.alias).only('id', 'compressed_content').iterator(chunk_size=BATCH_SIZE):
+        note.content = note.compressed_content
+        batch.append(note)
+        if len(batch) == BATCH_SIZE:
+            Note.objects.using(schema_editor.connection.alias).bulk_update(batch, ['content'])
+            batch = []
+    Note.objects.using(schema_editor.connection.alias).bulk_update(batch, ['content'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Notes', '0012_note_content_bytes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='compressed_content',
+            field=Notes.fields.CompressedRichTextField(blank=True, null=True),
+        ),
+        migrations.RunPython(compress_content, decompress_content),
+        migrations.RemoveField(
+            model_name='note',
+            name='content',
+        ),
+        migrations.RenameField(
+            model_name='note',
+            old_name='compressed_content',
+            new_name='content',
+        ),
+    ]
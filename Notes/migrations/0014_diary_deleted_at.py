@@ -0,0 +1,26 @@
+# Generated by Django 3.1.14 on 2026-10-18 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Notes', '0013_compress_note_content'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='diary',
+            name='unique_diaries',
+        ),
+        migrations.AddField(
+            model_name='diary',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='diary',
+            constraint=models.UniqueConstraint(condition=models.Q(deleted_at__isnull=True), fields=('author', 'title'), name='unique_diaries'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.1.14 on 2026-10-18 00:57
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def count_notes(apps, schema_editor):
+    """
+    Fills the note counts, content sizes and last activity of the existing diaries.
+    """
+    Diary = apps.get_model('Notes', 'Diary')
+    Note = apps.get_model('Notes', 'Note')
+    alias = schema_editor.connection.alias
+    stats = Note.objects.using(alias).order_by().values('diary_id').annotate(
+        note_count=Count('id'), total_content_bytes=Sum('content_bytes'), last_activity=Max('last_update_time'),
+    )
+    batch = []
+    for row in stats.iterator(chunk_size=1000):
+        batch.append(Diary(pk=row['diary_id'], note_count=row['note_count'], total_content_bytes=row['total_content_bytes'] or 0, last_activity=row['last_activity']))
+        if len(batch) == 1000:
+            Diary.objects.using(alias).bulk_update(batch, ['note_count', 'total_content_bytes', 'last_activity'])
+            batch = []
+    Diary.objects.using(alias).bulk_update(batch, ['note_count', 'total_content_bytes', 'last_activity'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Notes', '0014_diary_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diary',
+            name='last_activity',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='diary',
+            name='note_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='diary',
+            name='total_content_bytes',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(count_notes, migrations.RunPython.noop),
+    ]
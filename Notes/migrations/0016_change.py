@@ -0,0 +1,55 @@
+# Generated by Django 3.1.14 on 2026-10-18 01:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def record_existing(apps, schema_editor):
+    """
+    Records a change for every existing diary and note that is not deleted, so that a first sync returns all of them.
+    """
+    Change = apps.get_model('Notes', 'Change')
+    Diary = apps.get_model('Notes', 'Diary')
+    Note = apps.get_model('Notes', 'Note')
+    alias = schema_editor.connection.alias
+    diaries = Diary.objects.using(alias).filter(deleted_at__isnull=True).order_by('id').values_list('id', 'author_id')
+    Change.objects.using(alias).bulk_create(
+        (Change(user_id=author_id, kind='diary', object_id=diary_id) for diary_id, author_id in diaries.iterator(chunk_size=1000)), batch_size=1000,
+    )
+    notes = Note.objects.using(alias).filter(diary__deleted_at__isnull=True).order_by('id').values_list('id', 'diary__author_id')
+    Change.objects.using(alias).bulk_create(
+        (Change(user_id=author_id, kind='note', object_id=note_id) for note_id, author_id in notes.iterator(chunk_size=1000)), batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Notes', '0015_diary_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('diary', 'Diary'), ('note', 'Note')], max_length=5)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('create_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['user', 'id'], name='change_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['kind', 'object_id'], name='change_object_idx'),
+        ),
+        migrations.RunPython(record_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+import html
+import re
+from django.db import migrations
+from django.utils.html import strip_tags
+
+#Matches the tags that separate words, as in Notes.search.
+BREAKING_TAG = re.compile(
+    r'<(?:/?(?:blockquote|caption|div|h[1-6]|li|ol|p|pre|table|tbody|td|tfoot|th|thead|tr|ul)|br|hr|img)\b[^>]*>', re.IGNORECASE,
+)
+
+
+def reindex_note_text(apps, schema_editor):
+    """
+    Rewrites the indexed text of the existing notes, which joined the words of adjacent paragraphs and list items.
+    The index only exists on SQLite.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Note = apps.get_model('Notes', 'Note')
+    rows = []
+    with schema_editor.connection.cursor() as cursor:
+        for note in Note.objects.using(schema_editor.connection.alias).only('id', 'content').iterator(chunk_size=1000):
+            body = re.sub(r'\s+', ' ', html.unescape(strip_tags(BREAKING_TAG.sub(' ', note.content or '')))).strip()
+            rows.append((body, note.pk))
+            if len(rows) == 1000:
+                cursor.executemany('UPDATE notes_note_fts SET body = %s WHERE rowid = %s', rows)
+                rows = []
+        cursor.executemany('UPDATE notes_note_fts SET body = %s WHERE rowid = %s', rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Notes', '0016_change'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex_note_text, migrations.RunPython.noop),
+    ]
@@ -2,11 +2,62 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from django.conf import settings
 from django.db import models
-from ckeditor.fields import RichTextField
+from Notes.fields import CompressedRichTextField
 
 #Sets the unique constraint on the 'email' field to True.
 User._meta.get_field('email')._unique = True
 
+def content_size(content):
+    """
+    A function that returns the size of a note's content as stored in the 'content_bytes' field.
+
+    Parameters
+    ----------
+    content : str
+        The note's content.
+
+    Returns
+    -------
+    int
+        The size of the UTF-8 encoded content in bytes.
+    """
+    return len((content or '').encode())
+
+
+class DiaryQuerySet(models.QuerySet):
+    """
+    A class that extends Django's QuerySet class with the filters of Diary objects.
+
+    Methods
+    -------
+    live()
+        Returns the diaries that are not deleted.
+    deleted()
+        Returns the deleted diaries waiting to be purged.
+    """
+    def live(self):
+        """
+        A method that filters out the deleted diaries.
+
+        Returns
+        -------
+        QuerySet
+            The diaries that are not deleted.
+        """
+        return self.filter(deleted_at__isnull=True)
+
+    def deleted(self):
+        """
+        A method that keeps the deleted diaries, whose notes have not been purged yet.
+
+        Returns
+        -------
+        QuerySet
+            The deleted diaries ordered by deletion time.
+        """
+        return self.filter(deleted_at__isnull=False).order_by('deleted_at', 'id')
+
+
 class Diary(models.Model):
     """
     A class that extends Django's Model class.
@@ -21,6 +72,17 @@ class Diary(models.Model):
         The diary name.
     create_date : datetime.datetime
         The diary creation date and time.
+    deleted_at : datetime.datetime
+        The date and time at which the user deleted the diary or None.
+        A deleted diary is hidden at once and its notes are purged later by the purge_deleted_diaries command.
+    note_count : int
+        The number of notes in the diary.
+    total_content_bytes : int
+        The total size of the contents of the diary's notes in bytes.
+    last_activity : datetime.datetime
+        The date and time at which a note of the diary was last created, edited or deleted, or None.
+        The last three fields are kept up to date by the writes to the diary's notes, so that the diary list needs no aggregation.
+        Drift is repaired by the reconcile_diary_counters command.
 
     Methods
     -------
@@ -30,6 +92,12 @@ class Diary(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete = models.CASCADE)
     title = models.CharField(max_length=100)
     create_date = models.DateTimeField(default = timezone.now)
+    deleted_at = models.DateTimeField(blank=True, null=True)
+    note_count = models.IntegerField(default = 0)
+    total_content_bytes = models.BigIntegerField(default = 0)
+    last_activity = models.DateTimeField(blank=True, null=True)
+
+    objects = DiaryQuerySet.as_manager()
 
     class Meta:
         """
@@ -40,10 +108,11 @@ class Diary(models.Model):
         ----------
         constraints : list
             Contains constraints to be applied on the model.
-            In this case a composite unique key is defined on 'author' and 'title' fields.
+            In this case a composite unique key is defined on 'author' and 'title' fields of the diaries that are not deleted,
+            so that a deleted diary's title can be reused before its notes are purged.
         """
         constraints = [
-            models.UniqueConstraint(fields = ["author", "title"], name='unique_diaries')
+            models.UniqueConstraint(fields = ["author", "title"], condition=models.Q(deleted_at__isnull=True), name='unique_diaries')
         ]
 
     def __str__(self):
@@ -72,11 +141,17 @@ class Note(models.Model):
     title : str
         The note's name.
     content : str
-        The note's content.
+        The note's content. It is stored compressed and decompressed when it is first accessed.
     create_date : datetime.datetime
         The note creation date and time.
     last_update_time : datetime.datetime
         The note's last update time.
+    content_bytes_saved : int
+        The total number of bytes removed from the note's content by the sanitization pipeline.
+    version : int
+        The note's version. It is incremented every time the note is saved and identifies the base of autosave patches.
+    content_bytes : int
+        The size of the note's content in bytes, so that it is known without loading the content.
 
     Methods
     -------
@@ -85,9 +160,12 @@ class Note(models.Model):
     """
     diary = models.ForeignKey(Diary, on_delete = models.CASCADE)
     title = models.CharField(max_length=100)
-    content = RichTextField(blank=True, null=True)
+    content = CompressedRichTextField(blank=True, null=True)
     create_date = models.DateTimeField(default = timezone.now)
     last_update_time = models.DateTimeField(default = timezone.now)
+    content_bytes_saved = models.BigIntegerField(default = 0)
+    version = models.PositiveIntegerField(default = 1)
+    content_bytes = models.PositiveIntegerField(default = 0)
 
     class Meta:
         """
@@ -99,10 +177,17 @@ class Note(models.Model):
         constraints : list
             Contains constraints to be applied on the model.
             In this case a composite unique key is defined on 'diary' and 'title' fields.
+        indexes : list
+            Contains indexes to be created on the model.
+            In this case a covering index on 'diary', 'title' and 'last_update_time' is defined
+            so that a diary's note listing is read from the index without touching the content column.
         """
         constraints = [
             models.UniqueConstraint(fields=["diary", "title"], name='unique_notes')
         ]
+        indexes = [
+            models.Index(fields=["diary", "title", "last_update_time"], name='note_listing_idx')
+        ]
 
     def __str__(self):
         """
@@ -115,3 +200,153 @@ class Note(models.Model):
             The title of the note.
         """
         return self.title
+
+
+class NoteRevision(models.Model):
+    """
+    A class that extends Django's Model class.
+    It is used to model the stored revisions of a user's Note objects.
+    A revision is either a full snapshot of the note's content or a delta against the previous stored revision,
+    both compressed with zlib.
+
+    Attributes
+    ----------
+    note : object
+        The note the revision belongs to.
+        It is a foreign key to the Note relation in the database.
+    number : int
+        The note's version when the revision was made.
+    base : int
+        The number of the revision the delta applies to or None if the revision is a snapshot.
+    depth : int
+        The number of deltas applied after the nearest snapshot to rebuild the revision.
+    data : bytes
+        The compressed snapshot or delta.
+    size : int
+        The length of the revision's content.
+    checksum : int
+        The CRC-32 checksum of the revision's content.
+    create_date : datetime.datetime
+        The revision creation date and time.
+
+    Methods
+    -------
+    __str__
+        Returns a string representation of the NoteRevision object.
+    """
+    note = models.ForeignKey(Note, on_delete = models.CASCADE)
+    number = models.PositiveIntegerField()
+    base = models.PositiveIntegerField(null=True, blank=True)
+    depth = models.PositiveSmallIntegerField(default = 0)
+    data = models.BinaryField()
+    size = models.PositiveIntegerField(default = 0)
+    checksum = models.BigIntegerField(default = 0)
+    create_date = models.DateTimeField(default = timezone.now)
+
+    class Meta:
+        """
+        An inner class that specifies the meta data of the Model class.
+        In this case the model's default field configurations have been Overrided.
+
+        Attributes
+        ----------
+        constraints : list
+            Contains constraints to be applied on the model.
+            In this case a composite unique key is defined on 'note' and 'number' fields.
+        """
+        constraints = [
+            models.UniqueConstraint(fields=["note", "number"], name='unique_note_revisions')
+        ]
+
+    @property
+    def is_snapshot(self):
+        """
+        A property that tells whether the revision is a full snapshot.
+
+        Returns
+        -------
+        bool
+            True if the revision is a snapshot.
+        """
+        return self.base is None
+
+    def __str__(self):
+        """
+        A method that returns a string representation of a NoteRevision object.
+        In this case, the note's title and the revision number are used as the string representation.
+
+        Returns
+        -------
+        str
+            The note's title and the revision number.
+        """
+        return "{} #{}".format(self.note.title, self.number)
+
+
+class Change(models.Model):
+    """
+    A class that extends Django's Model class.
+    It is used to model the change feed that clients sync a user's diaries and notes from.
+    A change is recorded whenever a diary or a note is created, updated or deleted. Deletions are recorded as tombstones.
+    The changes are numbered by their ids, which only increase, so a client asks for the changes after the last id it has seen.
+
+    Attributes
+    ----------
+    id : int
+        The change's sequence number.
+    user : object
+        The user whose diary or note changed.
+        It is a foreign key to the User relation in the database.
+    kind : str
+        'diary' or 'note'.
+    object_id : int
+        The id of the changed diary or note.
+    deleted : bool
+        True if the diary or the note was deleted.
+    create_date : datetime.datetime
+        The date and time of the change.
+
+    Methods
+    -------
+    __str__
+        Returns a string representation of the Change object.
+    """
+    DIARY = 'diary'
+    NOTE = 'note'
+    KIND_CHOICES = [(DIARY, 'Diary'), (NOTE, 'Note')]
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete = models.CASCADE)
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default = False)
+    create_date = models.DateTimeField(default = timezone.now)
+
+    class Meta:
+        """
+        An inner class that specifies the meta data of the Model class.
+        In this case the model's default field configurations have been Overrided.
+
+        Attributes
+        ----------
+        indexes : list
+            Contains indexes to be created on the model.
+            In this case an index on 'user' and 'id' serves a user's changes after a cursor,
+            and an index on 'kind' and 'object_id' finds the earlier changes of an object when the feed is compacted.
+        """
+        indexes = [
+            models.Index(fields=["user", "id"], name='change_feed_idx'),
+            models.Index(fields=["kind", "object_id"], name='change_object_idx'),
+        ]
+
+    def __str__(self):
+        """
+        A method that returns a string representation of a Change object.
+        In this case, the sequence number, the kind and the id of the changed object are used as the string representation.
+
+        Returns
+        -------
+        str
+            The sequence number, the kind and the id of the changed object.
+        """
+        return "#{} {} {}{}".format(self.id, self.kind, self.object_id, ' deleted' if self.deleted else '')
@@ -0,0 +1,101 @@
+from django.conf import settings
+from Notes.models import Note
+
+
+class NotePage:
+    """
+    A class that represents a single page of a diary's note listing.
+    The listing is paginated with a keyset (title cursor) instead of an offset,
+    so every page costs a single range scan on the 'note_listing_idx' index.
+
+    Attributes
+    ----------
+    notes : list
+        The Note objects of the page ordered by title.
+        Only the 'id', 'title' and 'last_update_time' fields are loaded.
+    has_next : bool
+        True if there are notes after the last note of the page.
+    has_previous : bool
+        True if there are notes before the first note of the page.
+
+    Methods
+    -------
+    next_cursor
+        Returns the cursor used to request the next page.
+    previous_cursor
+        Returns the cursor used to request the previous page.
+    """
+    def __init__(self, notes, has_next, has_previous):
+        """
+        Initializes a NotePage object.
+
+        Parameters
+        ----------
+        notes : list
+            The Note objects of the page ordered by title.
+        has_next : bool
+            True if there are notes after the last note of the page.
+        has_previous : bool
+            True if there are notes before the first note of the page.
+        """
+        self.notes = notes
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    @property
+    def next_cursor(self):
+        """
+        A method that returns the cursor of the next page.
+
+        Returns
+        -------
+        str
+            The title of the last note of the page or None if there is no next page.
+        """
+        return self.notes[-1].title if self.has_next and self.notes else None
+
+    @property
+    def previous_cursor(self):
+        """
+        A method that returns the cursor of the previous page.
+
+        Returns
+        -------
+        str
+            The title of the first note of the page or None if there is no previous page.
+        """
+        return self.notes[0].title if self.has_previous and self.notes else None
+
+
+def paginate_notes(diary, after=None, before=None, page_size=None):
+    """
+    A function that returns a page of a diary's notes ordered by title.
+    The page starts after the 'after' cursor or ends before the 'before' cursor.
+    One extra row is fetched to find out whether another page exists in the direction of the scan.
+
+    Parameters
+    ----------
+    diary : Diary object
+        The diary whose notes are listed.
+    after : str
+        The title after which the page starts.
+    before : str
+        The title before which the page ends. It is ignored if 'after' is given.
+    page_size : int
+        The number of notes in a page. Defaults to the NOTES_PAGE_SIZE setting.
+
+    Returns
+    -------
+    NotePage
+        The requested page of notes.
+    """
+    page_size = page_size or settings.NOTES_PAGE_SIZE
+    notes = Note.objects.filter(diary=diary).only('id', 'title', 'last_update_time')
+    if after is not None:
+        rows = list(notes.filter(title__gt=after).order_by('title')[:page_size + 1])
+        return NotePage(rows[:page_size], len(rows) > page_size, True)
+    if before is not None:
+        rows = list(notes.filter(title__lt=before).order_by('-title')[:page_size + 1])
+        return NotePage(rows[:page_size][::-1], True, len(rows) > page_size)
+    rows = list(notes.order_by('title')[:page_size + 1])
+    return NotePage(rows[:page_size], len(rows) > page_size, False)
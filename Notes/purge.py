@@ -0,0 +1,150 @@
+import time
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from Notes.cache import invalidate_diary_index
+from Notes.changes import record_changes
+from Notes.counters import adjust_diary_counters
+from Notes.models import Change, Diary, Note, NoteRevision
+from Notes.search import unindex_notes
+
+
+def mark_diary_deleted(diary):
+    """
+    A function that deletes a diary by marking it as deleted.
+    The diary is hidden from the user at once, while its notes are purged later by purge_deleted_diaries(),
+    so that deleting a large diary neither loads its notes nor holds the database write lock for long.
+    A tombstone of the diary, which also stands for its notes, is recorded in the change feed.
+
+    Parameters
+    ----------
+    diary : Diary object
+        The diary to delete.
+    """
+    diary.deleted_at = timezone.now()
+    with transaction.atomic():
+        if Diary.objects.filter(pk=diary.pk, deleted_at__isnull=True).update(deleted_at=diary.deleted_at):
+            record_changes(diary.author_id, Change.DIARY, [diary.pk], deleted=True)
+    invalidate_diary_index(diary.author_id)
+
+
+def batches(ids, size=None):
+    """
+    A function that splits a list of ids into the batches matched by a single statement.
+
+    Parameters
+    ----------
+    ids : list
+        The ids.
+    size : int, optional
+        The number of ids per batch. Defaults to the BULK_NOTES_BATCH_SIZE setting.
+
+    Returns
+    -------
+    list
+        The lists of ids.
+    """
+    size = size or settings.BULK_NOTES_BATCH_SIZE
+    return [ids[start:start + size] for start in range(0, len(ids), size)]
+
+
+def _delete_rows(model, column, ids):
+    """
+    A function that deletes the rows of a model whose column matches any of the given ids with raw DELETEs.
+    Every DELETE matches up to BULK_NOTES_BATCH_SIZE ids. Unlike QuerySet.delete(), the rows are not loaded and no signals are sent.
+
+    Parameters
+    ----------
+    model : class
+        The model class.
+    column : str
+        The name of the column matched against the ids.
+    ids : list
+        The ids.
+
+    Returns
+    -------
+    int
+        The number of deleted rows.
+    """
+    count = 0
+    with connection.cursor() as cursor:
+        for batch in batches(ids):
+            sql = 'DELETE FROM {} WHERE {} IN ({})'.format(
+                connection.ops.quote_name(model._meta.db_table), connection.ops.quote_name(column), ', '.join(['%s'] * len(batch)),
+            )
+            cursor.execute(sql, batch)
+            count += cursor.rowcount
+    return count
+
+
+def purge_diary(diary, batch_size=None, pause=None, progress=None):
+    """
+    A function that purges a deleted diary's notes in batches and then the diary itself.
+    Every batch deletes the revisions, search index entries and rows of up to 'batch_size' notes in its own short transaction,
+    along with the update of the diary's counters, so other writers only wait for one batch. The purge can be interrupted and resumed.
+
+    Parameters
+    ----------
+    diary : Diary object
+        The deleted diary.
+    batch_size : int, optional
+        The number of notes deleted per batch. Defaults to the DIARY_PURGE_BATCH_SIZE setting.
+    pause : float, optional
+        The number of seconds to wait between batches. Defaults to the DIARY_PURGE_PAUSE setting.
+    progress : function, optional
+        A function called after every batch with the diary, the number of notes purged so far and the number of notes it had.
+
+    Returns
+    -------
+    int
+        The number of purged notes.
+    """
+    batch_size = batch_size or settings.DIARY_PURGE_BATCH_SIZE
+    pause = settings.DIARY_PURGE_PAUSE if pause is None else pause
+    notes = Note.objects.filter(diary_id=diary.pk).order_by('id').values_list('id', 'content_bytes')
+    total = notes.count()
+    purged = 0
+    while True:
+        with transaction.atomic():
+            rows = list(notes[:batch_size])
+            if not rows:
+                _delete_rows(Diary, 'id', [diary.pk])
+                break
+            ids = [note_id for note_id, content_bytes in rows]
+            _delete_rows(NoteRevision, NoteRevision._meta.get_field('note').column, ids)
+            unindex_notes(ids)
+            count = _delete_rows(Note, 'id', ids)
+            adjust_diary_counters(diary.pk, -count, -sum(content_bytes for note_id, content_bytes in rows))
+            purged += count
+        if progress is not None:
+            progress(diary, purged, total)
+        if pause:
+            time.sleep(pause)
+    return purged
+
+
+def purge_deleted_diaries(batch_size=None, pause=None, progress=None):
+    """
+    A function that purges every deleted diary, oldest deletion first.
+
+    Parameters
+    ----------
+    batch_size : int, optional
+        The number of notes deleted per batch. Defaults to the DIARY_PURGE_BATCH_SIZE setting.
+    pause : float, optional
+        The number of seconds to wait between batches. Defaults to the DIARY_PURGE_PAUSE setting.
+    progress : function, optional
+        A function called after every batch, as in purge_diary().
+
+    Returns
+    -------
+    tuple
+        The number of purged diaries and the number of purged notes.
+    """
+    diaries = 0
+    notes = 0
+    for diary in Diary.objects.deleted():
+        notes += purge_diary(diary, batch_size, pause, progress)
+        diaries += 1
+    return diaries, notes
@@ -0,0 +1,129 @@
+import re
+from django.conf import settings
+from django.core.cache import cache
+from Notes.sanitizer import VOID_TAGS, sanitize_note_content
+
+#The cache key of the chunk start offsets of a note's content. It is formatted with the note's id, last update time and the chunk size.
+NOTE_CHUNK_OFFSETS_KEY = 'note_chunk_offsets:{}:{}:{}'
+#The cache key of a sanitized chunk of a note's content. It is formatted like NOTE_CHUNK_OFFSETS_KEY, followed by the chunk's offset.
+NOTE_CHUNK_KEY = 'note_chunk:{}:{}:{}:{}'
+#Matches the comments and the start and end tags of a note's UTF-8 encoded content.
+_TAG = re.compile(rb'<!--.*?-->|<(/?)([a-zA-Z][a-zA-Z0-9]*)[^>]*?(/?)>', re.DOTALL)
+_VOID_TAGS = {tag.encode() for tag in VOID_TAGS}
+
+
+class ChunkError(ValueError):
+    """
+    A class that represents a requested offset that is not the start of a chunk of a note's content.
+    """
+
+
+def element_boundaries(data):
+    """
+    A generator function that yields the byte offsets of a note's content between its top-level elements.
+    A chunk starting and ending at such offsets holds whole elements only.
+
+    Parameters
+    ----------
+    data : bytes
+        The UTF-8 encoded content.
+
+    Yields
+    ------
+    int
+        The next boundary offset.
+    """
+    depth = 0
+    for match in _TAG.finditer(data):
+        closing, tag, self_closing = match.groups()
+        if tag is None:
+            continue
+        tag = tag.lower()
+        if closing:
+            depth = max(depth - 1, 0)
+            if depth == 0:
+                yield match.end()
+        elif tag in _VOID_TAGS or self_closing:
+            if depth == 0:
+                yield match.start()
+                yield match.end()
+        else:
+            if depth == 0:
+                yield match.start()
+            depth += 1
+
+
+def chunk_offsets(data, chunk_size):
+    """
+    A function that splits a note's content into chunks of at least 'chunk_size' bytes that end at top-level element boundaries.
+    An element larger than the chunk size is never split, so its chunk is larger.
+
+    Parameters
+    ----------
+    data : bytes
+        The UTF-8 encoded content.
+    chunk_size : int
+        The minimum size of a chunk in bytes.
+
+    Returns
+    -------
+    list
+        The start offsets of the chunks followed by the size of the content.
+    """
+    offsets = [0]
+    for boundary in element_boundaries(data):
+        if boundary - offsets[-1] >= chunk_size and boundary < len(data):
+            offsets.append(boundary)
+    offsets.append(len(data))
+    return offsets
+
+
+def read_chunk(note, offset, chunk_size=None):
+    """
+    A function that returns a sanitized chunk of a note's content.
+    The chunk offsets and the sanitized chunks are cached until the note is updated, so the content is only loaded
+    if the chunk is not cached. The chunk is sanitized again so that contents saved before the sanitization pipeline existed
+    are never sent as they are.
+
+    Parameters
+    ----------
+    note : Note object
+        The note. Its content may be deferred.
+    offset : int
+        The byte offset at which the chunk starts. It is 0 or the next offset returned for the previous chunk.
+    chunk_size : int, optional
+        The minimum size of a chunk in bytes. Defaults to the NOTE_READER_CHUNK_SIZE setting.
+
+    Returns
+    -------
+    dict
+        The chunk's 'html', its 'offset', the 'next_offset' of the following chunk or None if it is the last one,
+        and the 'total_bytes' of the content.
+
+    Raises
+    ------
+    ChunkError
+        If the offset is not the start of a chunk.
+    """
+    chunk_size = chunk_size or settings.NOTE_READER_CHUNK_SIZE
+    key = (note.pk, note.last_update_time.isoformat(), chunk_size)
+    chunk = cache.get(NOTE_CHUNK_KEY.format(*key, offset))
+    if chunk is not None:
+        return chunk
+    data = (note.content or '').encode()
+    offsets = cache.get(NOTE_CHUNK_OFFSETS_KEY.format(*key))
+    if offsets is None:
+        offsets = chunk_offsets(data, chunk_size)
+        cache.set(NOTE_CHUNK_OFFSETS_KEY.format(*key), offsets, settings.NOTE_FRAGMENT_CACHE_TIMEOUT)
+    if offset not in offsets[:-1]:
+        raise ChunkError("The offset {} is not the start of a chunk.".format(offset))
+    end = offsets[offsets.index(offset) + 1]
+    html = sanitize_note_content(data[offset:end].decode(), extract_images=False)[0]
+    chunk = {
+        'html': html or '',
+        'offset': offset,
+        'next_offset': end if end < len(data) else None,
+        'total_bytes': len(data),
+    }
+    cache.set(NOTE_CHUNK_KEY.format(*key, offset), chunk, settings.NOTE_FRAGMENT_CACHE_TIMEOUT)
+    return chunk
@@ -0,0 +1,82 @@
+from django.shortcuts import get_object_or_404
+from Notes.models import Diary, Note
+
+
+def get_diary(user, diary):
+    """
+    A function that resolves a user's diary from its title.
+    The lookup is scoped to the user so that it is served by the 'unique_diaries' index on 'author' and 'title'.
+    Deleted diaries are not found.
+
+    Parameters
+    ----------
+    user : User object
+        The user who owns the diary.
+    diary : str
+        The user's diary name.
+
+    Returns
+    -------
+    Diary object
+        The user's diary.
+
+    Raises
+    ------
+    Http404
+        If the user has no diary with the given title.
+    """
+    return get_object_or_404(Diary.objects.live(), author=user, title=diary)
+
+
+def get_note(user, diary, note, defer=()):
+    """
+    A function that resolves a user's note from its diary title and note title.
+    The diary and the note are fetched in a single joined query using select_related().
+    The lookup is served by the 'unique_diaries' index followed by the 'unique_notes' index.
+    The notes of deleted diaries are not found.
+
+    Parameters
+    ----------
+    user : User object
+        The user who owns the diary.
+    diary : str
+        The user's diary name.
+    note : str
+        The user's note name in the diary.
+    defer : tuple, optional
+        The Note fields that are not loaded until they are accessed.
+
+    Returns
+    -------
+    Note object
+        The user's note with its diary already loaded.
+
+    Raises
+    ------
+    Http404
+        If the user has no such note in the given diary.
+    """
+    notes = Note.objects.select_related('diary').defer(*defer)
+    return get_object_or_404(notes, diary__author=user, diary__title=diary, diary__deleted_at__isnull=True, title=note)
+
+
+def get_note_last_update_time(user, diary, note):
+    """
+    A function that returns the last update time of a user's note without loading the note.
+
+    Parameters
+    ----------
+    user : User object
+        The user who owns the diary.
+    diary : str
+        The user's diary name.
+    note : str
+        The user's note name in the diary.
+
+    Returns
+    -------
+    datetime.datetime
+        The note's last update time or None if the user has no such note in the given diary.
+    """
+    notes = Note.objects.filter(diary__author=user, diary__title=diary, diary__deleted_at__isnull=True, title=note)
+    return notes.values_list('last_update_time', flat=True).first()
@@ -0,0 +1,342 @@
+import json
+import re
+import zlib
+from difflib import SequenceMatcher
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Subquery
+from Notes.models import NoteRevision
+
+#Matches the tokens deltas are made of: tags and words, each with the whitespace that follows it. Every character belongs to a token.
+_TOKEN = re.compile(r'<[^<>]*>\s*|[^<\s]+\s*|\s+|<')
+
+
+class RevisionError(Exception):
+    """
+    A class that represents a revision that cannot be rebuilt from the stored snapshots and deltas.
+    """
+
+
+def _lines(content):
+    """
+    A function that splits a note's content into the lines the deltas of older revisions are made of.
+
+    Parameters
+    ----------
+    content : str
+        The note's content.
+
+    Returns
+    -------
+    list
+        The lines including their line endings.
+    """
+    return (content or '').splitlines(keepends=True)
+
+
+def _tokens(content):
+    """
+    A function that splits a note's content into the tags and words deltas are made of.
+    Sanitized contents are a single line, so deltas over tokens stay as small as the edit.
+
+    Parameters
+    ----------
+    content : str
+        The note's content.
+
+    Returns
+    -------
+    list
+        The tokens, which join back into the content.
+    """
+    return _TOKEN.findall(content or '')
+
+
+def checksum(content):
+    """
+    A function that returns the checksum stored with a revision's content.
+
+    Parameters
+    ----------
+    content : str
+        The content.
+
+    Returns
+    -------
+    int
+        The CRC-32 checksum of the UTF-8 encoded content.
+    """
+    return zlib.crc32((content or '').encode())
+
+
+def make_delta(before, after):
+    """
+    A function that returns the token delta turning one content into another.
+    The delta is a dict whose 'tokens' item is a list of either [start, end] ranges of tokens copied from the old content
+    or strings inserted as they are. The common start and end of the contents are matched before the rest is diffed,
+    so an edit in a large note is diffed quickly.
+
+    Parameters
+    ----------
+    before : str
+        The old content.
+    after : str
+        The new content.
+
+    Returns
+    -------
+    dict
+        The delta.
+    """
+    old, new = _tokens(before), _tokens(after)
+    prefix = 0
+    while prefix < min(len(old), len(new)) and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < min(len(old), len(new)) - prefix and old[-suffix - 1] == new[-suffix - 1]:
+        suffix += 1
+    delta = [[0, prefix]] if prefix else []
+    matcher = SequenceMatcher(None, old[prefix:len(old) - suffix], new[prefix:len(new) - suffix])
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            delta.append([prefix + i1, prefix + i2])
+        elif j1 < j2:
+            delta.append(''.join(new[prefix + j1:prefix + j2]))
+    if suffix:
+        delta.append([len(old) - suffix, len(old)])
+    return {'tokens': delta}
+
+
+def apply_delta(content, delta):
+    """
+    A function that applies a delta made by make_delta() to a content.
+    The line deltas of older revisions, which are lists of line ranges and strings, are applied too.
+
+    Parameters
+    ----------
+    content : str
+        The old content.
+    delta : dict or list
+        The token delta or the line delta.
+
+    Returns
+    -------
+    str
+        The new content.
+    """
+    if isinstance(delta, dict):
+        old, delta = _tokens(content), delta['tokens']
+    else:
+        old = _lines(content)
+    return ''.join(''.join(old[item[0]:item[1]]) if isinstance(item, list) else item for item in delta)
+
+
+def _compress(value):
+    """
+    A function that serializes and compresses a snapshot or a delta.
+
+    Parameters
+    ----------
+    value : str or dict
+        The snapshot content or the delta.
+
+    Returns
+    -------
+    bytes
+        The compressed data.
+    """
+    data = value if isinstance(value, str) else json.dumps(value, separators=(',', ':'))
+    return zlib.compress(data.encode())
+
+
+def _decompress(revision):
+    """
+    A function that decompresses and deserializes the data of a revision.
+
+    Parameters
+    ----------
+    revision : NoteRevision object
+        The revision.
+
+    Returns
+    -------
+    str, dict or list
+        The snapshot content or the delta.
+    """
+    data = zlib.decompress(bytes(revision.data)).decode()
+    return data if revision.is_snapshot else json.loads(data)
+
+
+def _revision(note_id, number, content, previous=None, previous_content=None):
+    """
+    A function that builds an unsaved revision of a note's content.
+    It is a delta against the previous revision unless there is none, the delta chain reached the snapshot interval
+    or the delta is not smaller than a snapshot, such as when the content was rewritten.
+
+    Parameters
+    ----------
+    note_id : int
+        The note's id.
+    number : int
+        The revision number.
+    content : str
+        The revision's content.
+    previous : NoteRevision object, optional
+        The previous revision the delta is made against.
+    previous_content : str, optional
+        The content of the previous revision.
+
+    Returns
+    -------
+    NoteRevision object
+        The unsaved revision.
+    """
+    revision = NoteRevision(note_id=note_id, number=number, size=len(content or ''), checksum=checksum(content))
+    revision.data = _compress(content or '')
+    if previous is not None and previous.depth + 1 < settings.NOTE_REVISION_SNAPSHOT_INTERVAL:
+        delta = _compress(make_delta(previous_content, content))
+        if len(delta) < len(revision.data):
+            revision.base, revision.depth, revision.data = previous.number, previous.depth + 1, delta
+    return revision
+
+
+def snapshot_revisions(notes):
+    """
+    A function that returns the first revisions of new notes as unsaved snapshots, ready for bulk_create().
+
+    Parameters
+    ----------
+    notes : iterable
+        The saved Note objects.
+
+    Returns
+    -------
+    list
+        The unsaved NoteRevision objects.
+    """
+    return [_revision(note.pk, note.version, note.content) for note in notes]
+
+
+def record_revision(note, previous_content=None):
+    """
+    A function that stores the current content of a note as its revision numbered after the note's version.
+    The revision is a delta against the latest revision if that one was made for the previous version
+    and its checksum matches the previous content. Otherwise, such as for a note changed without a revision being recorded,
+    a full snapshot is stored.
+
+    Parameters
+    ----------
+    note : Note object
+        The note with its new content and version.
+    previous_content : str, optional
+        The content of the note before the change or None if the note was just created.
+
+    Returns
+    -------
+    NoteRevision object
+        The stored revision.
+    """
+    previous = None
+    if previous_content is not None:
+        latest = NoteRevision.objects.filter(note_id=note.pk).only('number', 'depth', 'checksum').order_by('-number').first()
+        if latest is not None and latest.number == note.version - 1 and latest.checksum == checksum(previous_content):
+            previous = latest
+    revision = _revision(note.pk, note.version, note.content, previous, previous_content)
+    revision.save()
+    return revision
+
+
+def get_revision_content(note, number):
+    """
+    A function that rebuilds the content of a note's revision.
+    The nearest snapshot and the deltas following it are fetched in a single query,
+    and at most NOTE_REVISION_SNAPSHOT_INTERVAL - 1 deltas are applied.
+
+    Parameters
+    ----------
+    note : Note object
+        The note.
+    number : int
+        The revision number.
+
+    Returns
+    -------
+    str
+        The revision's content.
+
+    Raises
+    ------
+    NoteRevision.DoesNotExist
+        If the note has no such revision.
+    RevisionError
+        If the revision's chain of deltas is broken.
+    """
+    snapshot = NoteRevision.objects.filter(note_id=note.pk, number__lte=number, base__isnull=True).order_by('-number').values('number')[:1]
+    chain = list(NoteRevision.objects.filter(note_id=note.pk, number__gte=Subquery(snapshot), number__lte=number).order_by('number'))
+    if not chain or chain[-1].number != number:
+        raise NoteRevision.DoesNotExist("The note has no revision {}.".format(number))
+    content = None
+    for previous, revision in zip([None] + chain, chain):
+        if revision.is_snapshot:
+            content = _decompress(revision)
+        elif previous is None or revision.base != previous.number:
+            raise RevisionError("The delta of revision {} has no base.".format(revision.number))
+        else:
+            content = apply_delta(content, _decompress(revision))
+    if checksum(content) != chain[-1].checksum:
+        raise RevisionError("The revision {} does not match its checksum.".format(number))
+    return content
+
+
+def compact_revisions(note_id, before, period):
+    """
+    A function that thins out the revisions of a note made before a date and merges their deltas.
+    Of the revisions made before the date, only the latest of every period is kept.
+    The latest revision and the revisions made since the date are always kept.
+    The kept revisions are rewritten as a new chain of snapshots and deltas, so the deltas of the removed revisions
+    are merged into the following ones.
+
+    Parameters
+    ----------
+    note_id : int
+        The note's id.
+    before : datetime.datetime
+        The date before which revisions are thinned out.
+    period : datetime.timedelta
+        The period of which one revision is kept.
+
+    Returns
+    -------
+    tuple
+        The number of removed revisions and the number of bytes saved.
+    """
+    with transaction.atomic():
+        revisions = list(NoteRevision.objects.select_for_update().filter(note_id=note_id).order_by('number'))
+        if not revisions:
+            return 0, 0
+        kept = {revision.number for revision in revisions if revision.create_date >= before}
+        kept.add(revisions[-1].number)
+        latest_per_period = {}
+        for revision in revisions:
+            if revision.create_date < before:
+                latest_per_period[(before - revision.create_date) // period] = revision.number
+        kept.update(latest_per_period.values())
+        if len(kept) == len(revisions):
+            return 0, 0
+        old_size = sum(len(revision.data) for revision in revisions)
+        removed, rewritten = [], []
+        content = previous = previous_content = None
+        for revision in revisions:
+            content = _decompress(revision) if revision.is_snapshot else apply_delta(content, _decompress(revision))
+            if revision.number not in kept:
+                removed.append(revision.pk)
+                continue
+            rebuilt = _revision(note_id, revision.number, content, previous, previous_content)
+            if (rebuilt.base, rebuilt.depth, bytes(rebuilt.data)) != (revision.base, revision.depth, bytes(revision.data)):
+                revision.base, revision.depth, revision.data = rebuilt.base, rebuilt.depth, rebuilt.data
+                rewritten.append(revision)
+            previous, previous_content = revision, content
+        NoteRevision.objects.filter(pk__in=removed).delete()
+        NoteRevision.objects.bulk_update(rewritten, ['base', 'depth', 'data'])
+        new_size = sum(len(revision.data) for revision in revisions if revision.number in kept)
+    return len(removed), old_size - new_size
@@ -0,0 +1,424 @@
+import base64
+import binascii
+import hashlib
+import re
+from html import escape
+from html.entities import html5
+from html.parser import HTMLParser
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+#The tags kept in a note's content. Any other tag is removed but its text is kept.
+ALLOWED_TAGS = {
+    'a', 'b', 'blockquote', 'br', 'caption', 'code', 'del', 'div', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 's', 'span', 'strike', 'strong', 'sub', 'sup', 'table',
+    'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+}
+#The attributes kept for each tag. The attributes listed under '*' are kept for every tag.
+ALLOWED_ATTRIBUTES = {
+    '*': {'style'},
+    'a': {'href', 'title', 'target'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'table': {'border', 'cellpadding', 'cellspacing'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+}
+#The CSS properties kept in style attributes. They are the ones CKEditor's toolbar and image and table dialogs produce.
+ALLOWED_STYLES = {
+    'background-color', 'color', 'float', 'font-family', 'font-size', 'font-style', 'font-weight', 'height',
+    'margin-left', 'text-align', 'text-decoration', 'width',
+}
+#The tags removed together with their content.
+DROPPED_TAGS = {'head', 'iframe', 'noscript', 'object', 'script', 'style', 'template', 'title', 'xml'}
+#The tags that have no end tag. Those that are not allowed, such as the meta and link tags of pasted Word documents,
+#are removed like any other tag, since they have no content to drop.
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr',
+}
+#The open tags that are implicitly closed by each start tag.
+IMPLICITLY_CLOSED_TAGS = {
+    'li': {'li'},
+    'p': {'p'},
+    'td': {'td', 'th'},
+    'th': {'td', 'th'},
+    'tr': {'td', 'th', 'tr'},
+}
+#The inline tags that are removed when they are empty or directly nested in the same tag.
+COLLAPSIBLE_TAGS = {'b', 'del', 'em', 'i', 's', 'span', 'strike', 'strong', 'sub', 'sup', 'u'}
+#The URL schemes allowed in links and image sources. URLs without a scheme are always allowed.
+ALLOWED_SCHEMES = {'http', 'https', 'mailto'}
+#The image types extracted from data URIs.
+IMAGE_EXTENSIONS = {'image/gif': 'gif', 'image/jpeg': 'jpg', 'image/png': 'png', 'image/webp': 'webp'}
+#The directory of the storage in which extracted images are saved.
+IMAGE_DIRECTORY = 'note_images'
+
+_DATA_URI = re.compile(r'^data:(?P<type>[\w/+.-]+);base64,(?P<data>.*)$', re.DOTALL)
+_SCHEME = re.compile(r'^([a-zA-Z][a-zA-Z0-9+.-]*):')
+
+
+class _Element:
+    """
+    A class that represents an element that is still open while a note's content is sanitized.
+
+    Attributes
+    ----------
+    tag : str
+        The element's tag name.
+    attrs : str
+        The element's serialized attributes.
+    parts : list
+        The serialized content of the element.
+    transparent : bool
+        True if only the element's content is serialized.
+        It is the case for spans without attributes and elements directly nested in an identical element.
+    """
+    def __init__(self, tag, attrs, transparent=False):
+        """
+        Initializes an _Element object.
+
+        Parameters
+        ----------
+        tag : str
+            The element's tag name.
+        attrs : str
+            The element's serialized attributes.
+        transparent : bool, optional
+            True if only the element's content is serialized.
+        """
+        self.tag = tag
+        self.attrs = attrs
+        self.parts = []
+        self.transparent = transparent
+
+
+class NoteSanitizer(HTMLParser):
+    """
+    A class that extends Python's HTMLParser.
+    It is used to rebuild a note's HTML content from an allow-list of tags, attributes and styles.
+    It also collapses redundant markup and moves images embedded as data URIs into the default storage.
+    Content written by CKEditor is serialized as the editor serializes it: character references, line breaks
+    and indentation between elements and self-closed void tags are kept, so sanitizing the editor's content
+    changes nothing unless it holds disallowed markup.
+
+    Methods
+    -------
+    sanitize(content)
+        Returns the sanitized content.
+    """
+    def __init__(self, extract_images=True):
+        """
+        Initializes a NoteSanitizer object.
+
+        Parameters
+        ----------
+        extract_images : bool, optional
+            True if images embedded as data URIs are saved in the default storage.
+            Otherwise they are removed.
+        """
+        super(NoteSanitizer, self).__init__(convert_charrefs=False)
+        self.extract_images = extract_images
+
+    def sanitize(self, content):
+        """
+        A method that sanitizes a note's HTML content.
+
+        Parameters
+        ----------
+        content : str
+            The HTML content.
+
+        Returns
+        -------
+        str
+            The sanitized HTML content.
+        """
+        self.reset()
+        self.stack = [_Element(None, '')]
+        self.dropping = 0
+        self.feed(content)
+        self.close()
+        while len(self.stack) > 1:
+            self._close_top()
+        return ''.join(self.stack[0].parts).strip(' ')
+
+    def handle_starttag(self, tag, attrs):
+        """
+        Handles a start tag by opening an allowed element.
+        Elements such as list items and table cells that are left open are closed by the next sibling's start tag.
+
+        Parameters
+        ----------
+        tag : str
+            The tag name.
+        attrs : list
+            The tag's attributes as (name, value) pairs.
+        """
+        if tag in DROPPED_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        attrs = self._clean_attrs(tag, attrs)
+        if attrs is None:
+            return
+        if tag in VOID_TAGS:
+            self.stack[-1].parts.append('<{}{} />'.format(tag, attrs))
+            return
+        while self.stack[-1].tag in IMPLICITLY_CLOSED_TAGS.get(tag, ()):
+            self._close_top()
+        top = self.stack[-1]
+        transparent = (tag == 'span' and not attrs) or (tag in COLLAPSIBLE_TAGS and (top.tag, top.attrs) == (tag, attrs))
+        self.stack.append(_Element(tag, attrs, transparent))
+
+    def handle_startendtag(self, tag, attrs):
+        """
+        Handles a self-closing tag.
+
+        Parameters
+        ----------
+        tag : str
+            The tag name.
+        attrs : list
+            The tag's attributes as (name, value) pairs.
+        """
+        if tag in VOID_TAGS:
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        """
+        Handles an end tag by closing the matching open element and any element left open inside it.
+
+        Parameters
+        ----------
+        tag : str
+            The tag name.
+        """
+        if tag in DROPPED_TAGS:
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        if self.dropping or tag in VOID_TAGS:
+            return
+        if not any(element.tag == tag for element in self.stack[1:]):
+            return
+        while True:
+            element = self._close_top()
+            if element.tag == tag:
+                break
+
+    def handle_data(self, data):
+        """
+        Handles text by escaping it and collapsing its runs of spaces and tabs outside of preformatted elements.
+        Runs holding a line break are the editor's formatting and are kept. Non-breaking spaces are kept,
+        since the editor uses them for blank lines and indentation.
+
+        Parameters
+        ----------
+        data : str
+            The text.
+        """
+        if self.dropping:
+            return
+        if not any(element.tag == 'pre' for element in self.stack):
+            data = re.sub(r'[ \t\r\n\f]+', lambda match: match.group() if '\n' in match.group() else ' ', data)
+        self.stack[-1].parts.append(escape(data, quote=False))
+
+    def handle_entityref(self, name):
+        """
+        Handles a named character reference by keeping it as it is written, such as the editor's &nbsp;.
+        An unknown name is kept as text.
+
+        Parameters
+        ----------
+        name : str
+            The reference's name.
+        """
+        if self.dropping:
+            return
+        if name + ';' in html5:
+            self.stack[-1].parts.append('&{};'.format(name))
+        else:
+            self.stack[-1].parts.append('&amp;{}'.format(name))
+
+    def handle_charref(self, name):
+        """
+        Handles a numeric character reference by keeping it as it is written. An invalid reference is removed.
+
+        Parameters
+        ----------
+        name : str
+            The reference's decimal number or its hexadecimal number prefixed by 'x'.
+        """
+        if self.dropping:
+            return
+        try:
+            codepoint = int(name[1:], 16) if name[:1] in 'xX' else int(name)
+        except ValueError:
+            return
+        if 0 < codepoint <= 0x10ffff and not 0xd800 <= codepoint <= 0xdfff:
+            self.stack[-1].parts.append('&#{};'.format(name))
+
+    def _close_top(self):
+        """
+        A method that closes the innermost open element and appends it to its parent.
+        Empty collapsible elements are replaced by their whitespace and transparent elements by their content.
+
+        Returns
+        -------
+        _Element object
+            The closed element.
+        """
+        element = self.stack.pop()
+        content = ''.join(element.parts)
+        parent = self.stack[-1].parts
+        if element.transparent:
+            parent.append(content)
+        elif element.tag in COLLAPSIBLE_TAGS and not content.strip():
+            parent.append(' ' if content else '')
+        else:
+            parent.append('<{0}{1}>{2}</{0}>'.format(element.tag, element.attrs, content))
+        return element
+
+    def _clean_attrs(self, tag, attrs):
+        """
+        A method that serializes the allowed attributes of a tag.
+
+        Parameters
+        ----------
+        tag : str
+            The tag name.
+        attrs : list
+            The tag's attributes as (name, value) pairs.
+
+        Returns
+        -------
+        str
+            The serialized attributes or None if the element must be removed.
+        """
+        allowed = ALLOWED_ATTRIBUTES['*'] | ALLOWED_ATTRIBUTES.get(tag, set())
+        cleaned = []
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name == 'style':
+                value = self._clean_style(value)
+            elif name == 'href':
+                value = value if self._allowed_url(value) else None
+            elif name == 'src':
+                value = self._clean_src(value)
+                if value is None:
+                    return None
+            if value or (value is not None and name != 'style'):
+                cleaned.append(' {}="{}"'.format(name, escape(value, quote=False).replace('"', '&quot;')))
+        return ''.join(cleaned)
+
+    def _clean_style(self, style):
+        """
+        A method that keeps the allowed properties of a style attribute.
+
+        Parameters
+        ----------
+        style : str
+            The style attribute value.
+
+        Returns
+        -------
+        str
+            The allowed declarations.
+        """
+        declarations = []
+        for declaration in style.split(';'):
+            name, _, value = declaration.partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name in ALLOWED_STYLES and value and not re.search(r'url\s*\(|expression\s*\(', value, re.IGNORECASE):
+                declarations.append('{}:{}'.format(name, value))
+        return '; '.join(declarations)
+
+    def _clean_src(self, src):
+        """
+        A method that validates an image source and extracts a data URI image into the default storage.
+
+        Parameters
+        ----------
+        src : str
+            The image source.
+
+        Returns
+        -------
+        str
+            The image URL or None if the image must be removed.
+        """
+        src = src.strip()
+        match = _DATA_URI.match(src)
+        if match:
+            extension = IMAGE_EXTENSIONS.get(match.group('type').lower())
+            if extension is None or not self.extract_images:
+                return None
+            try:
+                data = base64.b64decode(match.group('data'), validate=False)
+            except (binascii.Error, ValueError):
+                return None
+            return save_note_image(data, extension)
+        return src if self._allowed_url(src) and not src.lower().startswith('mailto:') else None
+
+    @staticmethod
+    def _allowed_url(url):
+        """
+        A method that checks whether a URL uses an allowed scheme.
+
+        Parameters
+        ----------
+        url : str
+            The URL.
+
+        Returns
+        -------
+        bool
+            True if the URL has no scheme or an allowed scheme.
+        """
+        match = _SCHEME.match(re.sub(r'[\s\x00-\x1f]', '', url))
+        return match is None or match.group(1).lower() in ALLOWED_SCHEMES
+
+
+def save_note_image(data, extension):
+    """
+    A function that saves an image extracted from a note in the default storage.
+    The file is named after a hash of its content, so an image pasted several times is stored once.
+
+    Parameters
+    ----------
+    data : bytes
+        The image data.
+    extension : str
+        The image file extension.
+
+    Returns
+    -------
+    str
+        The image URL.
+    """
+    name = '{}/{}.{}'.format(IMAGE_DIRECTORY, hashlib.sha256(data).hexdigest(), extension)
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return default_storage.url(name)
+
+
+def sanitize_note_content(content, extract_images=True):
+    """
+    A function that sanitizes and compacts a note's HTML content.
+
+    Parameters
+    ----------
+    content : str
+        The HTML content.
+    extract_images : bool, optional
+        True if images embedded as data URIs are saved in the default storage. Otherwise they are removed.
+
+    Returns
+    -------
+    tuple
+        The sanitized content and the number of bytes it saves compared to the original content.
+    """
+    if not content:
+        return content, 0
+    sanitized = NoteSanitizer(extract_images).sanitize(content)
+    return sanitized, len(content.encode()) - len(sanitized.encode())
@@ -0,0 +1,262 @@
+import html
+import re
+from django.conf import settings
+from django.db import connection
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+from Notes.fields import CompressedValue
+from Notes.models import Note
+
+#The name of the SQLite FTS5 virtual table that indexes the notes.
+#Its rowid is the note id and its 'owner' column holds a token identifying the note's author,
+#so that a user's search only intersects the posting lists of their own notes.
+SEARCH_TABLE = 'notes_note_fts'
+#The markers wrapped around matched terms in snippets. They are replaced by <mark> tags after escaping.
+_MATCH_START = '\x02'
+_MATCH_END = '\x03'
+#Matches the tags that separate words, such as those of paragraphs, list items, table cells and line breaks.
+_BREAKING_TAG = re.compile(
+    r'<(?:/?(?:blockquote|caption|div|h[1-6]|li|ol|p|pre|table|tbody|td|tfoot|th|thead|tr|ul)|br|hr|img)\b[^>]*>', re.IGNORECASE,
+)
+
+
+def search_available():
+    """
+    A function that checks whether full-text search is supported by the database.
+
+    Returns
+    -------
+    bool
+        True if the default database is SQLite, which provides the FTS5 extension.
+    """
+    return connection.vendor == 'sqlite'
+
+
+def note_text(content):
+    """
+    A function that converts a note's HTML content into the plain text that is indexed.
+    Tags that separate words are replaced by spaces before the other tags are removed, so the texts of adjacent
+    paragraphs or list items are never joined into a single word.
+
+    Parameters
+    ----------
+    content : str
+        The note's HTML content.
+
+    Returns
+    -------
+    str
+        The content without tags and entities, with runs of whitespace collapsed.
+    """
+    return re.sub(r'\s+', ' ', html.unescape(strip_tags(_BREAKING_TAG.sub(' ', content or '')))).strip()
+
+
+def owner_token(user_id):
+    """
+    A function that returns the token stored in the 'owner' column for a user's notes.
+
+    Parameters
+    ----------
+    user_id : int
+        The id of the user who owns the notes.
+
+    Returns
+    -------
+    str
+        The owner token.
+    """
+    return 'u{}'.format(user_id)
+
+
+def index_notes(notes, user_id):
+    """
+    A function that adds or replaces notes of a single user in the search index.
+    Every note is written with a single INSERT OR REPLACE, which replaces the note's previous entry.
+    A note whose content was loaded but never accessed has an unchanged content, so only the title of its entry is updated
+    and the content is not decompressed.
+
+    Parameters
+    ----------
+    notes : iterable
+        The Note objects to index.
+    user_id : int
+        The id of the user who owns the notes.
+    """
+    if not search_available():
+        return
+    rows, titles = [], []
+    for note in notes:
+        if isinstance(note.__dict__.get('content'), CompressedValue):
+            titles.append((note.title, note.pk))
+        else:
+            rows.append((note.pk, owner_token(user_id), note.title, note_text(note.content)))
+    with connection.cursor() as cursor:
+        if rows:
+            cursor.executemany('INSERT OR REPLACE INTO {} (rowid, owner, title, body) VALUES (%s, %s, %s, %s)'.format(SEARCH_TABLE), rows)
+        if titles:
+            cursor.executemany('UPDATE {} SET title = %s WHERE rowid = %s'.format(SEARCH_TABLE), titles)
+
+
+def unindex_notes(note_ids):
+    """
+    A function that removes notes from the search index.
+
+    Parameters
+    ----------
+    note_ids : iterable
+        The ids of the notes to remove.
+    """
+    if not search_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany('DELETE FROM {} WHERE rowid = %s'.format(SEARCH_TABLE), [(note_id,) for note_id in note_ids])
+
+
+def copy_index_entries(note_ids, diary_id):
+    """
+    A function that indexes the copies of notes in another diary of the same user by copying the notes' index entries
+    with a single INSERT ... SELECT, so that the copied contents are neither loaded nor converted to text again.
+    A copy is matched to its note by title.
+
+    Parameters
+    ----------
+    note_ids : list
+        The ids of the copied notes.
+    diary_id : int
+        The id of the diary holding the copies.
+    """
+    if not search_available() or not note_ids:
+        return
+    sql = (
+        'INSERT INTO {table} (rowid, owner, title, body) '
+        'SELECT c.id, f.owner, f.title, f.body FROM {table} f '
+        'INNER JOIN "Notes_note" n ON n.id = f.rowid '
+        'INNER JOIN "Notes_note" c ON c.diary_id = %s AND c.title = n.title '
+        'WHERE f.rowid IN ({ids})'
+    ).format(table=SEARCH_TABLE, ids=', '.join(['%s'] * len(note_ids)))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [diary_id, *note_ids])
+
+
+def rebuild_search_index(batch_size=1000):
+    """
+    A function that rebuilds the whole search index from the Note table.
+
+    Parameters
+    ----------
+    batch_size : int
+        The number of notes read and indexed at a time.
+
+    Returns
+    -------
+    int
+        The number of indexed notes.
+    """
+    if not search_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {}'.format(SEARCH_TABLE))
+    count = 0
+    batch = []
+    notes = Note.objects.filter(diary__deleted_at__isnull=True).select_related('diary').only('id', 'title', 'content', 'diary__author')
+    for note in notes.iterator(chunk_size=batch_size):
+        batch.append(note)
+        if len(batch) == batch_size:
+            count += _index_batch(batch)
+            batch = []
+    return count + _index_batch(batch)
+
+
+def _index_batch(notes):
+    """
+    A function that indexes a batch of notes that may belong to several users.
+
+    Parameters
+    ----------
+    notes : list
+        The Note objects to index with their diaries loaded.
+
+    Returns
+    -------
+    int
+        The number of indexed notes.
+    """
+    by_author = {}
+    for note in notes:
+        by_author.setdefault(note.diary.author_id, []).append(note)
+    for user_id, author_notes in by_author.items():
+        index_notes(author_notes, user_id)
+    return len(notes)
+
+
+def build_match_query(query):
+    """
+    A function that converts a user's search text into an FTS5 MATCH expression.
+    Every word is quoted so that FTS5 operators in the text are matched literally.
+    The last word is matched as a prefix. The words are only matched in the title and body columns,
+    so they never match the owner tokens.
+
+    Parameters
+    ----------
+    query : str
+        The user's search text.
+
+    Returns
+    -------
+    str
+        The MATCH expression or an empty string if the text has no words.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return ''
+    terms = ['"{}"'.format(word) for word in words]
+    terms[-1] += '*'
+    return '{{title body}} : ({})'.format(' '.join(terms))
+
+
+def search_notes(user, query, limit=None):
+    """
+    A function that searches the titles and contents of a user's notes.
+    The results are ranked with BM25, weighting title matches above content matches.
+
+    Parameters
+    ----------
+    user : User object
+        The user whose notes are searched.
+    query : str
+        The user's search text.
+    limit : int
+        The maximum number of results. Defaults to the NOTES_SEARCH_RESULTS setting.
+
+    Returns
+    -------
+    list
+        A list of dictionaries with the 'diary', 'note', 'last_update_time' and 'snippet' keys.
+        The snippet is an HTML safe string with the matched terms wrapped in <mark> tags.
+    """
+    limit = limit or settings.NOTES_SEARCH_RESULTS
+    match = build_match_query(query)
+    if not match:
+        return []
+    if not search_available():
+        notes = Note.objects.filter(diary__author=user, diary__deleted_at__isnull=True, title__icontains=query).select_related('diary')
+        notes = notes.only('title', 'last_update_time', 'diary__title').order_by('title')[:limit]
+        return [{'diary': note.diary.title, 'note': note.title, 'last_update_time': note.last_update_time, 'snippet': ''} for note in notes]
+    sql = (
+        'SELECT n.id, n.title, n.last_update_time, d.title AS diary_title, '
+        "snippet({table}, 2, %s, %s, '…', 16) AS snippet "
+        'FROM {table} f '
+        'INNER JOIN "Notes_note" n ON n.id = f.rowid '
+        'INNER JOIN "Notes_diary" d ON d.id = n.diary_id '
+        'WHERE {table} MATCH %s AND d.author_id = %s AND d.deleted_at IS NULL '
+        'ORDER BY bm25({table}, 0.0, 10.0, 1.0) '
+        'LIMIT %s'
+    ).format(table=SEARCH_TABLE)
+    match = 'owner:{} AND ({})'.format(owner_token(user.pk), match)
+    notes = Note.objects.raw(sql, [_MATCH_START, _MATCH_END, match, user.pk, limit])
+    return [{
+        'diary': note.diary_title,
+        'note': note.title,
+        'last_update_time': note.last_update_time,
+        'snippet': mark_safe(escape(note.snippet).replace(_MATCH_START, '<mark>').replace(_MATCH_END, '</mark>')),
+    } for note in notes]
@@ -0,0 +1,251 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+from Notes.cache import invalidate_diary_index
+from Notes.changes import record_changes
+from Notes.counters import adjust_diary_counters
+from Notes.fields import CompressedValue, decompress_text
+from Notes.models import Change, Diary, Note, content_size
+from Notes.revisions import record_revision
+from Notes.search import index_notes, unindex_notes
+
+#Sent when notes are changed with QuerySet.update(), which does not send post_save.
+#It is sent with the 'notes' argument, the updated Note objects, and the 'author_id' argument, the id of their author.
+note_updated = Signal()
+#The ids of the diaries being deleted. Their notes are deleted by the cascade
+#and the diary index is invalidated once when the diary itself is deleted.
+_deleting_diaries = set()
+#The ids of the users being deleted. Their diaries, notes and changes are deleted by the cascade,
+#so no change is recorded for them.
+_deleting_users = set()
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleting(sender, instance, **kwargs):
+    """
+    A receiver that marks a user as being deleted before the user's diaries and notes are deleted by the cascade.
+
+    Parameters
+    ----------
+    sender : class
+        The User model class.
+    instance : User object
+        The user being deleted.
+    **kwargs : dict
+        Variable dictionary arguments.
+    """
+    _deleting_users.add(instance.pk)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleted(sender, instance, **kwargs):
+    """
+    A receiver that unmarks a deleted user.
+
+    Parameters
+    ----------
+    sender : class
+        The User model class.
+    instance : User object
+        The deleted user.
+    **kwargs : dict
+        Variable dictionary arguments.
+    """
+    _deleting_users.discard(instance.pk)
+
+
+@receiver(post_save, sender=Diary)
+def diary_saved(sender, instance, **kwargs):
+    """
+    A receiver that records a saved diary in the change feed and invalidates the author's cached diary index.
+
+    Parameters
+    ----------
+    sender : class
+        The Diary model class.
+    instance : Diary object
+        The saved diary.
+    **kwargs : dict
+        Variable dictionary arguments.
+    """
+    record_changes(instance.author_id, Change.DIARY, [instance.pk])
+    invalidate_diary_index(instance.author_id)
+
+
+@receiver(pre_delete, sender=Diary)
+def diary_deleting(sender, instance, **kwargs):
+    """
+    A receiver that marks a diary as being deleted before its notes are deleted by the cascade.
+
+    Parameters
+    ----------
+    sender : class
+        The Diary model class.
+    instance : Diary object
+        The diary being deleted.
+    **kwargs : dict
+        Variable dictionary arguments.
+    """
+    _deleting_diaries.add(instance.pk)
+
+
+@receiver(post_delete, sender=Diary)
+def diary_deleted(sender, instance, **kwargs):
+    """
+    A receiver that records a tombstone of a deleted diary in the change feed and invalidates the author's cached diary index.
+    The tombstone also stands for the diary's notes. Nothing is recorded if the diary is deleted along with its author.
+
+    Parameters
+    ----------
+    sender : class
+        The Diary model class.
+    instance : Diary object
+        The deleted diary.
+    **kwargs : dict
+        Variable dictionary arguments.
+    """
+    _deleting_diaries.discard(instance.pk)
+    if instance.author_id in _deleting_users:
+        return
+    record_changes(instance.author_id, Change.DIARY, [instance.pk], deleted=True)
+    invalidate_diary_index(instance.author_id)
+
+
+@receiver(pre_save, sender=Note)
+def note_saving(sender, instance, update_fields=None, **kwargs):
+    """
+    A receiver that measures the size of a note's content before the note is saved.
+    The size the note had is kept so that the diary's total content size can be adjusted by the difference.
+    If the size was deferred, the stored size is loaded, since it cannot be derived from the new content.
+    The size is computed from the value being written. Deferred content and content left out of the saved fields are not written,
+    and content that was loaded but never accessed is written back as it is, so they keep their size and are not decompressed.
+
+    Parameters
+    ----------
+    sender : class
+        The Note model class.
+    instance : Note object
+        The note being saved.
+    update_fields : frozenset, optional
+        The names of the saved fields or None if all the fields are saved.
+    **kwargs : dict
+        Variable dictionary arguments.
+    """
+    content = instance.__dict__.get('content')
+    if instance._state.adding:
+        instance._previous_content_bytes = 0
+    elif 'content' not in instance.__dict__ or isinstance(content, CompressedValue) or (update_fields is not None and 'content' not in update_fields):
+        instance._previous_content_bytes = None
+        return
+    elif 'content_bytes' in instance.__dict__:
+        instance._previous_content_bytes = instance.content_bytes
+    else:
+        instance._previous_content_bytes = Note.objects.filter(pk=instance.pk).values_list('content_bytes', flat=True).first() or 0
+    if isinstance(content, CompressedValue):
+        content = decompress_text(content)
+    instance.content_bytes = content_size(content)
+
+
+@receiver(post_save, sender=Note)
+def note_saved(sender, instance, created, update_fields=None, **kwargs):
+    """
+    A receiver that indexes a saved note for full-text search, records it in the change feed and updates the counters of the note's diary.
+    When the note is created, it also records the note's first revision. If the content was written without its size,
+    such as when the size was deferred and only the loaded fields were saved, the size is written too.
+    The author's cached diary index, which shows the counters, is invalidated.
+
+    Parameters
+    ----------
+    sender : class
+        The Note model class.
+    instance : Note object
+        The saved note.
+    created : bool
+        True if a new note was created.
+    update_fields : frozenset, optional
+        The names of the saved fields or None if all the fields were saved.
+    **kwargs : dict
+        Variable dictionary arguments.
+    """
+    author_id = instance.diary.author_id
+    index_notes([instance], author_id)
+    record_changes(author_id, Change.NOTE, [instance.pk])
+    if created:
+        record_revision(instance)
+    previous = getattr(instance, '_previous_content_bytes', None)
+    if previous is not None and update_fields is not None and 'content_bytes' not in update_fields:
+        Note.objects.filter(pk=instance.pk).update(content_bytes=instance.content_bytes)
+    size = 0 if previous is None else instance.content_bytes - previous
+    adjust_diary_counters(instance.diary_id, 1 if created else 0, size, instance.last_update_time)
+    invalidate_diary_index(author_id)
+
+
+@receiver(note_updated, sender=Note)
+def notes_updated(sender, notes, author_id, **kwargs):
+    """
+    A receiver that indexes notes updated without a save() for full-text search, records them in the change feed
+    and invalidates the author's cached diary index, which shows the diaries' counters.
+
+    Parameters
+    ----------
+    sender : class
+        The Note model class.
+    notes : list
+        The updated Note objects with their new content.
+    author_id : int
+        The id of the user who owns the notes.
+    **kwargs : dict
+        Variable dictionary arguments.
+    """
+    index_notes(notes, author_id)
+    record_changes(author_id, Change.NOTE, [note.pk for note in notes])
+    invalidate_diary_index(author_id)
+
+
+@receiver(pre_delete, sender=Note)
+def note_deleting(sender, instance, **kwargs):
+    """
+    A receiver that loads the deferred size of a note's content before the note is deleted,
+    so that the diary's total content size can be reduced by it.
+    Nothing is loaded if the note is deleted along with its diary.
+
+    Parameters
+    ----------
+    sender : class
+        The Note model class.
+    instance : Note object
+        The note being deleted.
+    **kwargs : dict
+        Variable dictionary arguments.
+    """
+    if instance.diary_id not in _deleting_diaries and 'content_bytes' not in instance.__dict__:
+        instance.refresh_from_db(fields=['content_bytes'])
+
+
+@receiver(post_delete, sender=Note)
+def note_deleted(sender, instance, **kwargs):
+    """
+    A receiver that removes a deleted note from the full-text search index.
+    Unless the note is deleted along with its diary or its author, it also updates the diary's counters,
+    records a tombstone of the note in the change feed and invalidates the author's cached diary index.
+
+    Parameters
+    ----------
+    sender : class
+        The Note model class.
+    instance : Note object
+        The deleted note.
+    **kwargs : dict
+        Variable dictionary arguments.
+    """
+    unindex_notes([instance.pk])
+    if instance.diary_id in _deleting_diaries:
+        return
+    adjust_diary_counters(instance.diary_id, -1, -instance.__dict__.get('content_bytes', 0))
+    if Note._meta.get_field('diary').is_cached(instance):
+        author_id = instance.diary.author_id
+    else:
+        author_id = Diary.objects.filter(pk=instance.diary_id).values_list('author_id', flat=True).first()
+    if author_id is not None and author_id not in _deleting_users:
+        record_changes(author_id, Change.NOTE, [instance.pk], deleted=True)
+        invalidate_diary_index(author_id)
@@ -0,0 +1,98 @@
+import re
+import zlib
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+from Notes.fields import decompress_text
+from Notes.models import Note
+
+#The placeholder rendered in place of a note's content, at which the page is split when it is streamed.
+STREAM_MARKER = '<!--note-content-stream-->'
+#The same check as in Django's GZipMiddleware.
+_ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+def note_page_chunks(request, template, context, note, chunk_size, content=None):
+    """
+    A generator function that renders a page around a note's content and yields it in chunks.
+    The page is rendered without the content and the part before the content, with the head and the navigation,
+    is yielded before the content is loaded. The content is then yielded in chunks, followed by the rest of the page.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+    template : str
+        The name of the template that renders STREAM_MARKER in place of the content when 'stream_marker' is in its context.
+    context : dict
+        The template context.
+    note : Note object
+        The note whose content is streamed.
+    chunk_size : int
+        The number of characters of the content yielded at a time.
+    content : str, optional
+        The note's content if it is already loaded, as async views do since the database cannot be accessed
+        while the response is sent over ASGI. Otherwise it is loaded after the head of the page is yielded.
+
+    Yields
+    ------
+    bytes
+        The next part of the page.
+    """
+    page = render_to_string(template, {**context, 'stream_marker':STREAM_MARKER}, request)
+    head, tail = page.split(STREAM_MARKER, 1)
+    yield head.encode()
+    del page
+    if content is None:
+        content = Note.objects.filter(pk=note.pk).values_list('content', flat=True).first()
+        content = decompress_text(content) if content else ''
+    for start in range(0, len(content), chunk_size):
+        yield content[start:start + chunk_size].encode()
+    yield tail.encode()
+
+
+def gzip_chunks(chunks):
+    """
+    A generator function that gzip compresses chunks on the fly.
+    Unlike Django's compress_sequence(), the compressor is flushed after every chunk,
+    so that the head of a page reaches the client before the rest of it is produced.
+
+    Parameters
+    ----------
+    chunks : iterator
+        The chunks as bytes.
+
+    Yields
+    ------
+    bytes
+        The compressed chunks.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def streaming_response(request, chunks):
+    """
+    A function that returns a streaming response, gzip compressed on the fly if the client accepts it.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+    chunks : iterator
+        The parts of the response body as bytes.
+
+    Returns
+    -------
+    StreamingHttpResponse
+        The response.
+    """
+    if _ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+        response = StreamingHttpResponse(gzip_chunks(chunks))
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(chunks)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
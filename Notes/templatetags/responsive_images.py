@@ -0,0 +1,52 @@
+import os
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from DiaryApp.storage import RESPONSIVE_FORMATS, derivative_name
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(name, alt='', css_class='', sizes='100vw'):
+    """
+    A template tag that renders a static image with its responsive WebP and AVIF derivatives.
+    The derivatives are only known once collectstatic has recorded them in the manifest,
+    so a plain img tag is rendered while developing or when Pillow was not installed at collection time.
+
+    Parameters
+    ----------
+    name : str
+        The image's static file name, such as 'images/home.png'.
+    alt : str, optional
+        The image's alternative text.
+    css_class : str, optional
+        The CSS classes of the img tag.
+    sizes : str, optional
+        The sizes attribute telling the browser how wide the image is displayed.
+
+    Returns
+    -------
+    str
+        The picture tag, or the img tag if the image has no derivatives.
+    """
+    img = format_html('<img class="{}" src="{}" alt="{}">', css_class, static(name), alt)
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+    if settings.DEBUG or not hashed_files:
+        return img
+    prefix = os.path.splitext(name)[0] + '.'
+    sources = []
+    for extension in RESPONSIVE_FORMATS:
+        suffix = 'w.' + extension
+        widths = sorted(
+            int(key[len(prefix):-len(suffix)]) for key in hashed_files
+            if key.startswith(prefix) and key.endswith(suffix) and key[len(prefix):-len(suffix)].isdigit()
+        )
+        if widths:
+            srcset = ', '.join('{} {}w'.format(staticfiles_storage.url(derivative_name(name, width, extension)), width) for width in widths)
+            sources.append(('image/' + extension, srcset, sizes))
+    if not sources:
+        return img
+    return format_html('<picture>{}{}</picture>', format_html_join('', '<source type="{}" srcset="{}" sizes="{}">', sources), img)
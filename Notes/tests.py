@@ -1,3 +1,1150 @@
-from django.test import TestCase
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+import zlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import Http404
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+from Notes import async_views
+from Notes.archive import ArchiveError, _create_notes, import_archive
+from Notes.autosave import apply_autosave
+from Notes.benchmarks import RESULTS_VERSION, _load_urls, compare_results
+from Notes.bulk import COPY, DELETE, MOVE, BulkOperationError, apply_bulk_operation
+from Notes.cache import DIARY_INDEX_KEY, get_diary_index
+from Notes.changes import get_changes
+from Notes.concurrency import update_note
+from Notes.counters import reconcile_diary_counters
+from Notes.fields import RAW, ZLIB, ZLIB_DICTIONARY, CompressedValue, compress_text, decompress_text
+from Notes.models import Change, Diary, Note, NoteRevision, content_size
+from Notes.pagination import paginate_notes
+from Notes.reader import ChunkError, chunk_offsets, read_chunk
+from Notes.purge import mark_diary_deleted, purge_deleted_diaries, purge_diary
+from Notes.resolvers import get_diary, get_note, get_note_last_update_time
+from Notes.revisions import _compress, apply_delta, get_revision_content, make_delta
+from Notes.search import note_text, search_notes
+from Notes.streaming import gzip_chunks
+from Notes.sanitizer import sanitize_note_content
 
-# Create your tests here.
+
+class SanitizerTests(SimpleTestCase):
+    """
+    A class that tests the sanitization of a note's content.
+    """
+    def sanitize(self, content):
+        """
+        A method that returns the sanitized content without extracting images.
+        """
+        return sanitize_note_content(content, extract_images=False)[0]
+
+    def test_void_dropped_tags_keep_following_content(self):
+        self.assertEqual(self.sanitize('<meta charset="utf-8"><p>Hello <b>world</b></p>'), '<p>Hello <b>world</b></p>')
+        self.assertEqual(self.sanitize('<link rel=File-List href="x.xml"><p>Pasted</p>'), '<p>Pasted</p>')
+        self.assertEqual(self.sanitize('<p>A<embed src="x.swf">B</p>'), '<p>AB</p>')
+
+    def test_word_paste(self):
+        content = (
+            '<html><head><meta name=Generator content="Microsoft Word 15"><link rel=File-List href="filelist.xml">'
+            '<style>p.MsoNormal {margin:0}</style></head><body><p class=MsoNormal>Dear diary</p>'
+            '<xml><o:DocumentProperties>1</o:DocumentProperties></xml></body></html>'
+        )
+        self.assertEqual(self.sanitize(content), '<p>Dear diary</p>')
+
+    def test_dropped_tags_drop_their_content(self):
+        self.assertEqual(self.sanitize('<p>Safe</p><script>alert(1)</script><p>Text</p>'), '<p>Safe</p><p>Text</p>')
+
+    def test_disallowed_attributes_and_urls(self):
+        self.assertEqual(
+            self.sanitize('<a href="javascript:alert(1)" onclick="x()">link</a><p style="color:red; position:fixed">x</p>'),
+            '<a>link</a><p style="color:red">x</p>',
+        )
+
+    def test_editor_content_is_unchanged(self):
+        content = (
+            '<h2 style="text-align:center">Caf&eacute; &amp; tea</h2>\n\n<p>Hello&nbsp; <strong>world</strong><br />\nagain</p>\n\n'
+            '<ul>\n\t<li>one</li>\n\t<li><a href="https://example.com/?a=1&amp;b=2" target="_blank">two</a></li>\n</ul>\n\n'
+            '<p><img alt="" src="/media/x.png" style="height:100px; width:200px" /></p>\n'
+        )
+        self.assertEqual(self.sanitize(content), content)
+
+    def test_redundant_markup_is_collapsed(self):
+        self.assertEqual(self.sanitize('<p><span><b><b>bold</b></b></span><i> </i></p>'), '<p><b>bold</b> </p>')
+
+
+class ChangeFeedTests(TestCase):
+    """
+    A class that tests the change feed that clients sync a user's diaries and notes from.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        self.diary = Diary.objects.create(author=self.user, title='Journal')
+        self.note = Note.objects.create(diary=self.diary, title='Monday', content='<p>Rain</p>')
+
+    def test_first_sync_returns_everything(self):
+        changes = get_changes(self.user)
+        self.assertEqual([row[0] for row in changes['diaries']], [self.diary.pk])
+        self.assertEqual([row[0] for row in changes['notes']], [self.note.pk])
+        self.assertFalse(changes['more'])
+
+    def test_cursor_returns_only_later_changes(self):
+        cursor = get_changes(self.user)['cursor']
+        self.assertEqual(get_changes(self.user, cursor)['notes'], [])
+        other = Note.objects.create(diary=self.diary, title='Tuesday', content='<p>Sun</p>')
+        note_id = self.note.pk
+        self.note.delete()
+        changes = get_changes(self.user, cursor)
+        self.assertEqual([row[0] for row in changes['notes']], [other.pk])
+        self.assertEqual(changes['deleted_notes'], [note_id])
+        self.assertGreater(changes['cursor'], cursor)
+
+    def test_batches_are_limited(self):
+        for day in ['Tuesday', 'Wednesday', 'Thursday']:
+            Note.objects.create(diary=self.diary, title=day)
+        changes = get_changes(self.user, limit=2)
+        self.assertTrue(changes['more'])
+        rest = get_changes(self.user, changes['cursor'])
+        self.assertFalse(rest['more'])
+        self.assertEqual(len(changes['notes']) + len(rest['notes']) + len(changes['diaries']), 5)
+
+    @override_settings(SYNC_VISIBILITY_LAG=60)
+    def test_recent_changes_wait_for_the_visibility_lag(self):
+        changes = get_changes(self.user)
+        self.assertEqual((changes['cursor'], changes['notes']), (0, []))
+        Change.objects.update(create_date=self.note.create_date.replace(year=2000))
+        self.assertEqual([row[0] for row in get_changes(self.user)['notes']], [self.note.pk])
+
+    def test_deleting_a_user_deletes_their_changes(self):
+        self.user.delete()
+        self.assertFalse(Change.objects.exists())
+        self.assertFalse(Diary.objects.exists())
+
+    def test_sync_view_rejects_negative_cursors(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('Notes:sync_changes'), {'since': -1}).status_code, 400)
+        response = self.client.get(reverse('Notes:sync_changes'), {'since': 0, 'content': 0})
+        self.assertEqual(response.json()['notes'][0][-1], None)
+
+
+class RevisionTests(TestCase):
+    """
+    A class that tests the snapshots and deltas a note's revisions are stored as.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        self.diary = Diary.objects.create(author=self.user, title='Journal')
+        self.content = ''.join('<p>Paragraph {} of a long note about the weather.</p>'.format(number) for number in range(2000))
+
+    def test_small_edit_gives_small_delta(self):
+        edited = self.content.replace('Paragraph 1000 ', 'Paragraph one thousand ')
+        delta = make_delta(self.content, edited)
+        self.assertEqual(apply_delta(self.content, delta), edited)
+        self.assertLess(len(_compress(delta)), 100)
+        self.assertGreater(len(_compress(self.content)), 10 * len(_compress(delta)))
+
+    def test_older_line_deltas_still_apply(self):
+        self.assertEqual(apply_delta('one\ntwo\n', [[0, 1], 'three\n']), 'one\nthree\n')
+
+    def test_history_of_saves(self):
+        note = Note.objects.create(diary=self.diary, title='Weather', content=self.content)
+        contents = [self.content]
+        for number in range(3):
+            contents.append(contents[-1].replace('Paragraph {} '.format(number * 100), 'Edited {} '.format(number)))
+            note = update_note(note, note.version, content=contents[-1])
+        revisions = list(NoteRevision.objects.filter(note=note).order_by('number'))
+        self.assertEqual([revision.depth for revision in revisions], [0, 1, 2, 3])
+        self.assertTrue(all(len(revision.data) < 100 for revision in revisions[1:]))
+        for revision, content in zip(revisions, contents):
+            self.assertEqual(get_revision_content(note, revision.number), content)
+
+    def test_rewrite_is_stored_as_snapshot(self):
+        note = Note.objects.create(diary=self.diary, title='Weather', content='<p>Sunny</p>')
+        update_note(note, note.version, content='<p>Something else entirely</p>')
+        self.assertEqual(NoteRevision.objects.filter(note=note, base__isnull=True).count(), 2)
+
+
+class AutosaveTests(TestCase):
+    """
+    A class that tests the autosave patches sent by the note editor.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        self.diary = Diary.objects.create(author=self.user, title='Journal')
+        self.note = Note.objects.create(diary=self.diary, title='Monday', content='<p>Rain&nbsp;all day</p>\n\n<p>Cold</p>\n')
+        self.url = reverse('Notes:autosave_note', kwargs={'diary': 'Journal', 'note': 'Monday'})
+        self.client.force_login(self.user)
+
+    def post(self, version, ops):
+        """
+        A method that sends an autosave patch against a version of the note.
+        """
+        return self.client.post(self.url, json.dumps({'version': version, 'ops': ops}), content_type='application/json')
+
+    def test_editor_content_is_not_echoed(self):
+        response = self.post(1, [[len('<p>Rain&nbsp;all day</p>\n\n<p>'), 0, 'Very ']])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], 2)
+        self.assertNotIn('content', response.json())
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content, '<p>Rain&nbsp;all day</p>\n\n<p>Very Cold</p>\n')
+
+    def test_sanitized_content_is_echoed(self):
+        note, rewritten = apply_autosave(self.note, 1, [[0, 0, '<script>x()</script>']])
+        self.assertTrue(rewritten)
+        self.assertEqual(note.content, '<p>Rain&nbsp;all day</p>\n\n<p>Cold</p>\n')
+
+    def test_stale_patch_is_rejected(self):
+        self.assertEqual(self.post(1, [[0, 0, 'x']]).status_code, 200)
+        response = self.post(1, [[0, 0, 'y']])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['version'], 2)
+
+    def test_malformed_patch_is_rejected(self):
+        self.assertEqual(self.post(1, [[500, 0, 'x']]).status_code, 400)
+        self.assertEqual(self.post(1, 'x').status_code, 400)
+
+
+class SearchTests(TestCase):
+    """
+    A class that tests the full-text search of a user's notes.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        self.diary = Diary.objects.create(author=self.user, title='Journal')
+        self.note = Note.objects.create(diary=self.diary, title='Monday', content='<p>X</p><p>hello world</p><ul><li>alpha</li><li>beta</li></ul>')
+
+    def titles(self, query, user=None):
+        """
+        A method that returns the titles of the notes found by a search.
+        """
+        return [result['note'] for result in search_notes(user or self.user, query)]
+
+    def test_adjacent_blocks_are_separate_words(self):
+        self.assertEqual(note_text('<li>alpha</li><li>beta</li>'), 'alpha beta')
+        self.assertEqual(note_text('<p>a<b>b</b>c</p><p>d<br />e</p>'), 'abc d e')
+        self.assertEqual(self.titles('hello'), ['Monday'])
+        self.assertEqual(self.titles('beta'), ['Monday'])
+
+    def test_prefix_and_title_matches(self):
+        self.assertEqual(self.titles('wor'), ['Monday'])
+        self.assertEqual(self.titles('monday'), ['Monday'])
+
+    def test_terms_never_match_the_owner_token(self):
+        self.assertEqual(self.titles('u'), [])
+        self.assertEqual(self.titles('u{}'.format(self.user.pk)), [])
+
+    def test_other_users_notes_are_not_found(self):
+        other = User.objects.create_user('reader', 'reader@example.com', 'a long enough password')
+        self.assertEqual(self.titles('hello', other), [])
+
+
+class ImportTests(TestCase):
+    """
+    A class that tests the validation and the import of archives.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+
+    def bundle(self, manifest):
+        """
+        A method that returns a JSON bundle of a manifest.
+        """
+        return io.BytesIO(json.dumps(manifest).encode())
+
+    def zip_archive(self, manifest, files):
+        """
+        A method that returns a ZIP archive of a manifest and the given files.
+        """
+        data = io.BytesIO()
+        with zipfile.ZipFile(data, 'w') as archive:
+            archive.writestr('manifest.json', json.dumps(manifest))
+            for name, content in files.items():
+                archive.writestr(name, content)
+        data.seek(0)
+        return data
+
+    def assertRejected(self, file):
+        """
+        A method that asserts that an archive is rejected without anything being written.
+        """
+        with self.assertRaises(ArchiveError):
+            import_archive(self.user, file)
+        self.assertFalse(Diary.objects.exists())
+        self.assertFalse(Note.objects.exists())
+
+    def test_json_bundle(self):
+        result = import_archive(self.user, self.bundle({'diaries': [{'title': 'Trips', 'notes': [
+            {'title': 'Rome', 'content': '<p>Sun</p>'}, {'title': 'Oslo', 'content': '<p>Snow</p>'},
+        ]}]}))
+        self.assertEqual((result.diaries_created, result.notes_created), (1, 2))
+        self.assertEqual(Diary.objects.get(title='Trips').note_count, 2)
+
+    def test_zip_archive(self):
+        manifest = {'diaries': [{'title': 'Trips', 'notes': [{'title': 'Rome', 'file': 'trips/rome.html'}]}]}
+        import_archive(self.user, self.zip_archive(manifest, {'trips/rome.html': '<p>Sun</p>'}))
+        self.assertEqual(Note.objects.get(title='Rome').content, '<p>Sun</p>')
+
+    def test_malformed_manifests_are_rejected(self):
+        self.assertRejected(self.bundle([1, 2]))
+        self.assertRejected(self.bundle({'diaries': 'Trips'}))
+        self.assertRejected(self.bundle({'diaries': ['Trips']}))
+        self.assertRejected(self.bundle({'diaries': [{'title': 'Trips', 'notes': ['Rome']}]}))
+        self.assertRejected(self.bundle({'diaries': [{'title': ['Trips']}]}))
+        self.assertRejected(self.bundle({'diaries': [{'title': 'Trips', 'notes': [{'title': ['Rome']}, {'title': 'Oslo', 'content': 1}]}]}))
+        self.assertRejected(io.BytesIO(b'\xff'))
+
+    def test_zip_notes_without_files_are_rejected(self):
+        self.assertRejected(self.zip_archive({'diaries': [{'title': 'Z', 'notes': [{'title': 'A'}]}]}, {}))
+        self.assertRejected(self.zip_archive({'diaries': [{'title': 'Z', 'notes': [{'title': 'A', 'file': 'z/a.html'}]}]}, {}))
+
+    def test_duplicates_are_rejected_unless_resumed(self):
+        manifest = {'diaries': [{'title': 'Trips', 'notes': [{'title': 'Rome', 'content': '<p>Sun</p>'}]}]}
+        import_archive(self.user, self.bundle(manifest))
+        with self.assertRaises(ArchiveError):
+            import_archive(self.user, self.bundle(manifest))
+        result = import_archive(self.user, self.bundle(manifest), resume=True)
+        self.assertEqual((result.notes_created, result.notes_skipped), (0, 1))
+
+    def test_undecodable_file_is_an_archive_error(self):
+        manifest = {'diaries': [{'title': 'Z', 'notes': [{'title': 'A', 'file': 'z/a.html'}]}]}
+        with self.assertRaises(ArchiveError):
+            import_archive(self.user, self.zip_archive(manifest, {'z/a.html': b'\xff\xfe'}))
+
+    def test_diary_created_during_the_import_is_an_archive_error(self):
+        def parse_date(value, default):
+            #Creates the diary after the import looked up the user's diaries, as a concurrent request would.
+            if not Diary.objects.exists():
+                Diary.objects.create(author=self.user, title='Trips')
+            return default
+
+        with mock.patch('Notes.archive._parse_date', side_effect=parse_date):
+            with self.assertRaises(ArchiveError):
+                import_archive(self.user, self.bundle({'diaries': [{'title': 'Trips', 'notes': [{'title': 'Rome', 'content': '<p>Sun</p>'}]}]}))
+        self.assertEqual(Diary.objects.count(), 1)
+        self.assertFalse(Note.objects.exists())
+
+    def test_dates_are_aware(self):
+        import_archive(self.user, self.bundle({'diaries': [{'title': 'Trips', 'create_date': '2020-12-21T15:49:00', 'notes': [
+            {'title': 'Rome', 'content': '<p>Sun</p>', 'create_date': '2020-12-22T10:00:00', 'last_update_time': '2020-12-23T10:00:00+02:00'},
+        ]}]}))
+        note = Note.objects.select_related('diary').get(title='Rome')
+        for value in (note.diary.create_date, note.create_date, note.last_update_time):
+            self.assertTrue(timezone.is_aware(value))
+        self.assertEqual(note.create_date, datetime(2020, 12, 22, 10, tzinfo=dt_timezone.utc))
+        self.assertEqual(note.last_update_time, datetime(2020, 12, 23, 8, tzinfo=dt_timezone.utc))
+
+
+class SanitizeNotesCommandTests(TestCase):
+    """
+    A class that tests the sanitize_notes command over existing notes.
+    """
+    def test_sanitized_notes_move_on(self):
+        user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        diary = Diary.objects.create(author=user, title='Journal')
+        note = Note.objects.create(diary=diary, title='Monday', content='<p>Clean</p>')
+        content = '<p onclick="x()">Dirty</p><script>x()</script>'
+        Note.objects.filter(pk=note.pk).update(content=content, content_bytes=len(content))
+        Diary.objects.filter(pk=diary.pk).update(total_content_bytes=len(content))
+        call_command('sanitize_notes', stdout=io.StringIO())
+        sanitized = Note.objects.get(pk=note.pk)
+        self.assertEqual(sanitized.content, '<p>Dirty</p>')
+        self.assertEqual(sanitized.version, note.version + 1)
+        self.assertGreater(sanitized.last_update_time, note.last_update_time)
+        self.assertEqual(Diary.objects.get(pk=diary.pk).total_content_bytes, len('<p>Dirty</p>'))
+
+
+class ReadModeTests(TestCase):
+    """
+    A class that tests the read mode page of a note, which is rendered with the static files' URLs.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        self.diary = Diary.objects.create(author=self.user, title='Journal')
+        self.note = Note.objects.create(diary=self.diary, title='Monday', content='<p>Rain</p>')
+        self.url = reverse('Notes:note_read_mode', kwargs={'diary': 'Journal', 'note': 'Monday'})
+        self.client.force_login(self.user)
+
+    def test_read_mode_renders_without_collected_static_files(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '<p>Rain</p>')
+        self.assertNotContains(response, 'js/autosave.js')
+
+    def test_unchanged_note_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        update_note(self.note, self.note.version, content='<p>Sun</p>')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class PaginationTests(TestCase):
+    """
+    A class that tests the keyset pagination of a diary's notes.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        self.diary = Diary.objects.create(author=self.user, title='Journal')
+        for title in ['Friday', 'Monday', 'Thursday', 'Tuesday', 'Wednesday']:
+            Note.objects.create(diary=self.diary, title=title, content='<p>{}</p>'.format(title))
+
+    def titles(self, page):
+        """
+        A method that returns the titles of a page's notes.
+        """
+        return [note.title for note in page.notes]
+
+    def test_first_page(self):
+        page = paginate_notes(self.diary, page_size=2)
+        self.assertEqual(self.titles(page), ['Friday', 'Monday'])
+        self.assertIsNone(page.previous_cursor)
+        self.assertEqual(page.next_cursor, 'Monday')
+
+    def test_next_cursors_walk_every_note_once(self):
+        titles, cursor = [], None
+        while True:
+            page = paginate_notes(self.diary, after=cursor, page_size=2)
+            titles += self.titles(page)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(titles, ['Friday', 'Monday', 'Thursday', 'Tuesday', 'Wednesday'])
+        self.assertEqual(page.previous_cursor, 'Wednesday')
+
+    def test_previous_cursor_returns_the_page_before(self):
+        page = paginate_notes(self.diary, before='Tuesday', page_size=2)
+        self.assertEqual(self.titles(page), ['Monday', 'Thursday'])
+        self.assertEqual(page.previous_cursor, 'Monday')
+        self.assertEqual(page.next_cursor, 'Thursday')
+        page = paginate_notes(self.diary, before='Monday', page_size=2)
+        self.assertEqual(self.titles(page), ['Friday'])
+        self.assertIsNone(page.previous_cursor)
+
+    def test_content_is_deferred(self):
+        page = paginate_notes(self.diary, page_size=2)
+        self.assertIn('content', page.notes[0].get_deferred_fields())
+
+    @override_settings(NOTES_PAGE_SIZE=2)
+    def test_diary_page_lists_a_page_of_notes(self):
+        self.client.force_login(self.user)
+        url = reverse('Notes:diary_content', kwargs={'diary': 'Journal'})
+        response = self.client.get(url, {'after': 'Monday'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.titles(response.context['page']), ['Thursday', 'Tuesday'])
+
+    def test_note_creation_does_not_list_the_diary(self):
+        self.client.force_login(self.user)
+        url = reverse('Notes:diary_content', kwargs={'diary': 'Journal'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'title': 'Saturday', 'content': '<p>Sun</p>'})
+        self.assertEqual(response.status_code, 302)
+        listings = [query['sql'] for query in queries.captured_queries if 'ORDER BY "Notes_note"."title"' in query['sql'] or 'ORDER BY "Notes_diary"."title"' in query['sql']]
+        self.assertEqual(listings, [])
+
+
+class EditConflictTests(TestCase):
+    """
+    A class that tests the version check of the note edit form.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        self.diary = Diary.objects.create(author=self.user, title='Journal')
+        self.note = Note.objects.create(diary=self.diary, title='Monday', content='<p>Rain</p>')
+        self.url = reverse('Notes:note_content', kwargs={'diary': 'Journal', 'note': 'Monday'})
+        self.client.force_login(self.user)
+
+    def test_edit_against_current_version_is_saved(self):
+        response = self.client.post(self.url, {'title': 'Monday', 'content': '<p>Sun</p>', 'version': self.note.version})
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.note.refresh_from_db()
+        self.assertEqual((self.note.content, self.note.version), ('<p>Sun</p>', 2))
+
+    def test_edit_query_count(self):
+        #The session, the user and the note are read, then one transaction holds the version-checked UPDATE, the diary counters,
+        #the revision lookup and INSERT, the search index entry and the change feed INSERT.
+        with self.assertNumQueries(11):
+            response = self.client.post(self.url, {'title': 'Monday', 'content': '<p>Sun</p>', 'version': self.note.version})
+        self.assertEqual(response.status_code, 302)
+
+    def test_failed_side_effect_rolls_the_edit_back(self):
+        with mock.patch('Notes.concurrency.record_revision', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                update_note(self.note, 1, content='<p>Sun</p>')
+        note = Note.objects.get(pk=self.note.pk)
+        self.assertEqual((note.content, note.version), ('<p>Rain</p>', 1))
+        self.assertFalse(search_notes(self.user, 'Sun'))
+
+    def test_stale_edit_is_a_conflict(self):
+        update_note(self.note, self.note.version, content='<p>Snow</p>')
+        response = self.client.post(self.url, {'title': 'Monday', 'content': '<p>Sun</p>', 'version': 1})
+        self.assertEqual(response.status_code, 409)
+        self.assertContains(response, 'Snow', status_code=409)
+        self.note.refresh_from_db()
+        self.assertEqual((self.note.content, self.note.version), ('<p>Snow</p>', 2))
+
+
+@override_settings(SHARED_CACHE=True)
+class DiaryIndexCacheTests(TransactionTestCase):
+    """
+    A class that tests the cached diary index and its invalidation, which happens once the change is committed.
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        self.diary = Diary.objects.create(author=self.user, title='Journal')
+        self.key = DIARY_INDEX_KEY.format(self.user.pk)
+
+    def test_index_is_built_once(self):
+        self.assertEqual([diary['title'] for diary in get_diary_index(self.user)], ['Journal'])
+        with self.assertNumQueries(0):
+            get_diary_index(self.user)
+
+    def test_note_changes_invalidate_the_index(self):
+        get_diary_index(self.user)
+        note = Note.objects.create(diary=self.diary, title='Monday', content='<p>Rain</p>')
+        self.assertIsNone(cache.get(self.key))
+        self.assertEqual(get_diary_index(self.user)[0]['note_count'], 1)
+        update_note(note, note.version, content='<p>Sun</p>')
+        self.assertIsNone(cache.get(self.key))
+        get_diary_index(self.user)
+        note.delete()
+        self.assertEqual(get_diary_index(self.user)[0]['note_count'], 0)
+
+    def test_renamed_and_deleted_diaries_invalidate_the_index(self):
+        get_diary_index(self.user)
+        self.diary.title = 'Log'
+        self.diary.save()
+        self.assertEqual([diary['title'] for diary in get_diary_index(self.user)], ['Log'])
+        self.diary.delete()
+        self.assertEqual(get_diary_index(self.user), [])
+
+    def test_index_is_not_invalidated_before_the_commit(self):
+        get_diary_index(self.user)
+        with transaction.atomic():
+            Note.objects.create(diary=self.diary, title='Monday', content='<p>Rain</p>')
+            self.assertIsNotNone(cache.get(self.key))
+        self.assertIsNone(cache.get(self.key))
+
+    @override_settings(SHARED_CACHE=False)
+    def test_per_process_cache_does_not_keep_the_index(self):
+        get_diary_index(self.user)
+        self.assertIsNone(cache.get(self.key))
+
+
+class CompressedContentTests(TestCase):
+    """
+    A class that tests the stored forms of note contents and their lazy decompression.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        self.diary = Diary.objects.create(author=self.user, title='Journal')
+
+    def test_stored_forms_round_trip(self):
+        small = '<p>The rain was heavy today, and the day was over.</p>'
+        large = ''.join('<p>Entry {} of the year.</p>\n'.format(i) for i in range(500))
+        for value, level, header in [(small, 0, RAW), (small, 6, ZLIB_DICTIONARY), (large, 6, ZLIB), ('x', 6, RAW), ('', 6, RAW)]:
+            stored = compress_text(value, level)
+            self.assertEqual(stored[:1], header)
+            self.assertEqual(decompress_text(stored), value)
+
+    def test_unknown_header_is_rejected(self):
+        with self.assertRaises(ValueError):
+            decompress_text(b'\x7fdata')
+
+    def test_content_is_decompressed_on_first_access(self):
+        Note.objects.create(diary=self.diary, title='Monday', content='<p>Rain</p>')
+        note = Note.objects.get(title='Monday')
+        self.assertIsInstance(note.__dict__['content'], CompressedValue)
+        self.assertEqual(note.content, '<p>Rain</p>')
+        self.assertEqual(note.__dict__['content'], '<p>Rain</p>')
+
+    def test_saving_unread_content_keeps_it_compressed(self):
+        Note.objects.create(diary=self.diary, title='Monday', content='<p>Rain</p>')
+        note = Note.objects.get(title='Monday')
+        note.title = 'Tuesday'
+        note.save()
+        self.assertIsInstance(note.__dict__['content'], CompressedValue)
+        note = Note.objects.get(pk=note.pk)
+        self.assertEqual((note.title, note.content, note.content_bytes), ('Tuesday', '<p>Rain</p>', 11))
+        self.assertEqual([result['note'] for result in search_notes(self.user, 'rain')], ['Tuesday'])
+
+
+class CompressNoteContentMigrationTests(TransactionTestCase):
+    """
+    A class that tests that the migration compressing note contents keeps them when it is applied and unapplied.
+    """
+    before = [('Notes', '0012_note_content_bytes')]
+    after = [('Notes', '0013_compress_note_content')]
+
+    def migrate(self, targets):
+        """
+        A method that migrates the database to the given migrations and returns the project state there.
+        """
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_content_survives_the_migration_both_ways(self):
+        contents = ['<p>Rain</p>', '', ''.join('<p>Entry {}</p>\n'.format(i) for i in range(1000))]
+        apps = self.migrate(self.before)
+        user = apps.get_model('auth', 'User').objects.create(username='writer')
+        diary = apps.get_model('Notes', 'Diary').objects.create(author_id=user.pk, title='Journal')
+        OldNote = apps.get_model('Notes', 'Note')
+        for i, content in enumerate(contents):
+            OldNote.objects.create(diary_id=diary.pk, title=str(i), content=content)
+        apps = self.migrate(self.after)
+        notes = apps.get_model('Notes', 'Note').objects.order_by('title')
+        self.assertEqual([note.content for note in notes], contents)
+        apps = self.migrate(self.before)
+        notes = apps.get_model('Notes', 'Note').objects.order_by('title')
+        self.assertEqual([note.content for note in notes], contents)
+
+
+class BulkOperationTests(TestCase):
+    """
+    A class that tests deleting, moving and copying selected notes.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        self.diary = Diary.objects.create(author=self.user, title='Journal')
+        self.target = Diary.objects.create(author=self.user, title='Archive')
+
+    def create_notes(self, count, diary=None):
+        """
+        A method that creates notes in a diary the way an import does and returns their ids.
+        """
+        diary = diary or self.diary
+        notes = []
+        for i in range(count):
+            content = '<p>Rain {}</p>'.format(i)
+            notes.append(Note(diary=diary, title='Note {:04}'.format(i), content=content, content_bytes=content_size(content)))
+        _create_notes(self.user, notes)
+        return [note.pk for note in notes]
+
+    def counters(self, diary):
+        """
+        A method that returns the note count and the total content size of a diary.
+        """
+        diary = Diary.objects.get(pk=diary.pk)
+        return diary.note_count, diary.total_content_bytes
+
+    def test_delete(self):
+        ids = self.create_notes(3)
+        self.assertEqual(apply_bulk_operation(self.diary, ids[:2], DELETE), 2)
+        self.assertEqual(list(Note.objects.filter(diary=self.diary).values_list('pk', flat=True)), ids[2:])
+        self.assertFalse(NoteRevision.objects.filter(note_id__in=ids[:2]).exists())
+        self.assertEqual(self.counters(self.diary), (1, content_size('<p>Rain 2</p>')))
+        self.assertEqual(Change.objects.filter(object_id__in=ids[:2], kind=Change.NOTE, deleted=True).count(), 2)
+        self.assertEqual([result['note'] for result in search_notes(self.user, 'rain')], ['Note 0002'])
+
+    def test_move(self):
+        ids = self.create_notes(3)
+        size = self.counters(self.diary)[1]
+        self.assertEqual(apply_bulk_operation(self.diary, ids, MOVE, self.target), 3)
+        self.assertEqual(Note.objects.filter(diary=self.target).count(), 3)
+        self.assertEqual(self.counters(self.diary), (0, 0))
+        self.assertEqual(self.counters(self.target), (3, size))
+        self.assertEqual(Change.objects.filter(object_id__in=ids, kind=Change.NOTE, deleted=False).count(), 6)
+
+    def test_copy(self):
+        ids = self.create_notes(2)
+        note = Note.objects.get(pk=ids[0])
+        update_note(note, note.version, content='<p>Snow</p>')
+        self.assertEqual(apply_bulk_operation(self.diary, ids, COPY, self.target), 2)
+        copy = Note.objects.get(diary=self.target, title='Note 0000')
+        self.assertNotEqual(copy.pk, note.pk)
+        self.assertEqual((copy.content, copy.version), ('<p>Snow</p>', 2))
+        self.assertEqual(get_revision_content(copy, 1), '<p>Rain 0</p>')
+        self.assertEqual(self.counters(self.diary)[0], 2)
+        self.assertEqual(self.counters(self.target)[0], 2)
+        self.assertEqual(len(search_notes(self.user, 'snow')), 2)
+        self.assertTrue(Change.objects.filter(object_id=copy.pk, kind=Change.NOTE).exists())
+
+    def test_title_collision_writes_nothing(self):
+        ids = self.create_notes(3)
+        self.create_notes(2, self.target)
+        with self.assertRaises(BulkOperationError) as error:
+            apply_bulk_operation(self.diary, ids, MOVE, self.target)
+        self.assertEqual(error.exception.titles, ['Note 0000', 'Note 0001'])
+        self.assertEqual(self.counters(self.diary)[0], 3)
+        self.assertEqual(Note.objects.filter(diary=self.diary).count(), 3)
+
+    def test_notes_of_other_diaries_are_ignored(self):
+        other = Diary.objects.create(author=User.objects.create_user('reader', 'reader@example.com', 'a long enough password'), title='Journal')
+        theirs = Note.objects.create(diary=other, title='Theirs', content='<p>Theirs</p>')
+        self.assertEqual(apply_bulk_operation(self.diary, [theirs.pk], DELETE), 0)
+        self.assertTrue(Note.objects.filter(pk=theirs.pk).exists())
+
+    def test_a_thousand_notes(self):
+        ids = self.create_notes(1000)
+        self.assertEqual(apply_bulk_operation(self.diary, ids, COPY, self.target), 1000)
+        self.assertEqual(self.counters(self.target)[0], 1000)
+        self.assertEqual(NoteRevision.objects.filter(note__diary=self.target).count(), 1000)
+        self.assertEqual(apply_bulk_operation(self.diary, ids, DELETE), 1000)
+        self.assertEqual(self.counters(self.diary), (0, 0))
+        target_ids = list(Note.objects.filter(diary=self.target).values_list('pk', flat=True))
+        self.assertEqual(apply_bulk_operation(self.target, target_ids, MOVE, self.diary), 1000)
+        self.assertEqual(self.counters(self.diary)[0], 1000)
+
+    @override_settings(BULK_NOTES_BATCH_SIZE=2)
+    def test_operations_are_batched(self):
+        ids = self.create_notes(5)
+        with self.assertRaises(BulkOperationError) as error:
+            self.create_notes(5, self.target)
+            apply_bulk_operation(self.diary, ids, COPY, self.target)
+        self.assertEqual(len(error.exception.titles), 5)
+        Note.objects.filter(diary=self.target).delete()
+        self.assertEqual(apply_bulk_operation(self.diary, ids, COPY, self.target), 5)
+        self.assertEqual(apply_bulk_operation(self.diary, ids, DELETE), 5)
+        self.assertEqual(Note.objects.filter(diary=self.target).count(), 5)
+
+
+class DeletedDiaryTests(TestCase):
+    """
+    A class that tests that deleted diaries are hidden at once and their notes are purged in batches.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        self.diary = Diary.objects.create(author=self.user, title='Journal')
+        for day in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']:
+            Note.objects.create(diary=self.diary, title=day, content='<p>Rain on {}</p>'.format(day))
+        self.client.force_login(self.user)
+
+    def test_deleted_diary_is_hidden(self):
+        cursor = get_changes(self.user)['cursor']
+        response = self.client.get(reverse('Notes:delete_diary', kwargs={'diary': 'Journal'}))
+        self.assertRedirects(response, reverse('Notes:my_diaries'), fetch_redirect_response=False)
+        self.assertEqual(Note.objects.filter(diary=self.diary).count(), 5)
+        self.assertNotContains(self.client.get(reverse('Notes:my_diaries')), 'Journal')
+        self.assertEqual(self.client.get(reverse('Notes:diary_content', kwargs={'diary': 'Journal'})).status_code, 404)
+        self.assertEqual(search_notes(self.user, 'rain'), [])
+        self.assertEqual(search_notes(self.user, 'Monday'), [])
+        changes = get_changes(self.user, cursor)
+        self.assertEqual((changes['deleted_diaries'], changes['notes']), ([self.diary.pk], []))
+        self.assertEqual(get_changes(self.user)['notes'], [])
+
+    def test_title_can_be_reused_before_the_purge(self):
+        mark_diary_deleted(self.diary)
+        diary = Diary.objects.create(author=self.user, title='Journal')
+        Note.objects.create(diary=diary, title='Monday', content='<p>Sun</p>')
+        self.assertEqual([result['note'] for result in search_notes(self.user, 'sun')], ['Monday'])
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Diary.objects.create(author=self.user, title='Journal')
+        self.assertEqual(purge_deleted_diaries(pause=0), (1, 5))
+        self.assertEqual(list(Diary.objects.filter(author=self.user).values_list('pk', flat=True)), [diary.pk])
+
+    def test_purge_runs_in_batches(self):
+        mark_diary_deleted(self.diary)
+        progress = []
+        self.assertEqual(purge_diary(self.diary, batch_size=2, pause=0, progress=lambda diary, purged, total: progress.append((purged, total))), 5)
+        self.assertEqual(progress, [(2, 5), (4, 5), (5, 5)])
+        self.assertFalse(Diary.objects.filter(pk=self.diary.pk).exists())
+        self.assertFalse(NoteRevision.objects.exists())
+
+    def test_interrupted_purge_resumes(self):
+        mark_diary_deleted(self.diary)
+
+        def interrupt(diary, purged, total):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            purge_diary(self.diary, batch_size=2, pause=0, progress=interrupt)
+        diary = Diary.objects.get(pk=self.diary.pk)
+        self.assertEqual((diary.note_count, Note.objects.filter(diary=diary).count()), (3, 3))
+        self.assertEqual(purge_deleted_diaries(batch_size=2, pause=0), (1, 3))
+        self.assertFalse(Diary.objects.filter(pk=self.diary.pk).exists())
+        self.assertFalse(Note.objects.exists())
+
+
+class ResolverTests(TestCase):
+    """
+    A class that tests that diaries and notes are resolved among their owner's only.
+    """
+    def setUp(self):
+        self.writer = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        self.reader = User.objects.create_user('reader', 'reader@example.com', 'a long enough password')
+        self.diaries = {}
+        self.notes = {}
+        for user in (self.writer, self.reader):
+            self.diaries[user] = Diary.objects.create(author=user, title='Journal')
+            self.notes[user] = Note.objects.create(diary=self.diaries[user], title='Monday', content='<p>{}</p>'.format(user.username))
+
+    def test_shared_titles_resolve_to_each_owner(self):
+        for user in (self.writer, self.reader):
+            self.assertEqual(get_diary(user, 'Journal'), self.diaries[user])
+            note = get_note(user, 'Journal', 'Monday')
+            self.assertEqual(note, self.notes[user])
+            self.assertEqual(note.content, '<p>{}</p>'.format(user.username))
+            self.assertEqual(get_note_last_update_time(user, 'Journal', 'Monday'), self.notes[user].last_update_time)
+
+    def test_other_users_diaries_are_not_found(self):
+        stranger = User.objects.create_user('stranger', 'stranger@example.com', 'a long enough password')
+        with self.assertRaises(Http404):
+            get_diary(stranger, 'Journal')
+        with self.assertRaises(Http404):
+            get_note(stranger, 'Journal', 'Monday')
+        self.assertIsNone(get_note_last_update_time(stranger, 'Journal', 'Monday'))
+
+    def test_note_and_diary_are_fetched_in_one_query(self):
+        with self.assertNumQueries(1):
+            note = get_note(self.writer, 'Journal', 'Monday')
+            self.assertEqual(note.diary.author_id, self.writer.pk)
+
+    def test_pages_are_scoped_to_the_signed_in_user(self):
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('Notes:note_read_mode', kwargs={'diary': 'Journal', 'note': 'Monday'}))
+        self.assertContains(response, '<p>reader</p>')
+        self.assertNotContains(response, '<p>writer</p>')
+
+
+class ExportTests(TestCase):
+    """
+    A class that tests the streamed ZIP export of a user's diaries and notes.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        journal = Diary.objects.create(author=self.user, title='Journal')
+        trips = Diary.objects.create(author=self.user, title='Trips')
+        deleted = Diary.objects.create(author=self.user, title='Old')
+        other = Diary.objects.create(author=User.objects.create_user('reader', 'reader@example.com', 'a long enough password'), title='Journal')
+        self.notes = [
+            Note.objects.create(diary=journal, title='Monday', content='<p>Rain</p>'),
+            Note.objects.create(diary=journal, title='Tuesday', content='<p>{}</p>'.format('Sun ' * 50000)),
+            Note.objects.create(diary=trips, title='Rome', content=''),
+        ]
+        Note.objects.create(diary=deleted, title='Gone', content='<p>Gone</p>')
+        Note.objects.create(diary=other, title='Theirs', content='<p>Theirs</p>')
+        mark_diary_deleted(deleted)
+        self.client.force_login(self.user)
+
+    def export(self):
+        """
+        A method that downloads the export and returns it opened as a ZIP archive.
+        """
+        response = self.client.get(reverse('Notes:export_diaries'))
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        return zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_archive_holds_the_users_live_diaries_and_notes(self):
+        archive = self.export()
+        self.assertIsNone(archive.testzip())
+        manifest = json.loads(archive.read('manifest.json'))
+        self.assertEqual([diary['title'] for diary in manifest['diaries']], ['Journal', 'Trips'])
+        files = {note['file']: note['title'] for diary in manifest['diaries'] for note in diary['notes']}
+        self.assertEqual(sorted(files.values()), ['Monday', 'Rome', 'Tuesday'])
+        self.assertEqual(set(archive.namelist()), {'manifest.json', *files})
+        contents = {files[name]: archive.read(name).decode() for name in files}
+        self.assertEqual(contents, {note.title: note.content for note in self.notes})
+
+    def test_archive_can_be_imported(self):
+        archive = io.BytesIO(b''.join(self.client.get(reverse('Notes:export_diaries')).streaming_content))
+        reader = User.objects.get(username='reader')
+        result = import_archive(reader, archive)
+        self.assertEqual((result.diaries_created, result.notes_created, result.notes_skipped), (1, 3, 0))
+        self.assertEqual(Note.objects.get(diary__author=reader, title='Tuesday').content, self.notes[1].content)
+
+
+class StreamingTests(TestCase):
+    """
+    A class that tests the streaming of large notes in read mode.
+    """
+    #Matches the CSRF tokens, which are masked differently on every render.
+    CSRF_TOKEN = re.compile(rb'name="csrfmiddlewaretoken" value="[^"]*"')
+
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        self.diary = Diary.objects.create(author=self.user, title='Journal')
+        self.note = Note.objects.create(diary=self.diary, title='Monday', content='<p>{}</p>'.format('Rain é ' * 300))
+        self.url = reverse('Notes:note_read_mode', kwargs={'diary': 'Journal', 'note': 'Monday'})
+        self.client.force_login(self.user)
+
+    def page(self, content):
+        """
+        A method that returns a page without its CSRF tokens.
+        """
+        return self.CSRF_TOKEN.sub(b'', content)
+
+    def test_notes_over_the_threshold_are_streamed(self):
+        with override_settings(NOTE_STREAMING_THRESHOLD=self.note.content_bytes):
+            self.assertFalse(self.client.get(self.url).streaming)
+        with override_settings(NOTE_STREAMING_THRESHOLD=self.note.content_bytes - 1):
+            self.assertTrue(self.client.get(self.url).streaming)
+
+    @override_settings(NOTE_STREAMING_CHUNK_SIZE=100)
+    def test_streamed_page_equals_the_rendered_page(self):
+        rendered = self.client.get(self.url).content
+        with override_settings(NOTE_STREAMING_THRESHOLD=0):
+            streamed = b''.join(self.client.get(self.url).streaming_content)
+        self.assertEqual(self.page(streamed), self.page(rendered))
+
+    def test_streamed_page_is_gzip_compressed_when_accepted(self):
+        rendered = self.client.get(self.url).content
+        with override_settings(NOTE_STREAMING_THRESHOLD=0):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(self.page(zlib.decompress(b''.join(response.streaming_content), 16 + zlib.MAX_WBITS)), self.page(rendered))
+
+    def test_every_gzip_chunk_is_decodable_when_it_arrives(self):
+        chunks = [b'<head>', b'x' * 1000, b'</html>']
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        received = b''
+        for chunk, compressed in zip(chunks, gzip_chunks(iter(chunks))):
+            received += decompressor.decompress(compressed)
+            self.assertTrue(received.endswith(chunk))
+
+
+class AsyncViewTests(TestCase):
+    """
+    A class that tests the async read views, which are routed when the ASYNC_VIEWS setting is True.
+    """
+    def setUp(self):
+        _load_urls(True)
+        self.addCleanup(_load_urls, settings.ASYNC_VIEWS)
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        self.diary = Diary.objects.create(author=self.user, title='Journal')
+        self.note = Note.objects.create(diary=self.diary, title='Monday', content='<p>{}</p>'.format('Rain é ' * 300))
+        self.url = reverse('Notes:note_read_mode', kwargs={'diary': 'Journal', 'note': 'Monday'})
+        self.async_client.force_login(self.user)
+
+    def test_async_views_are_routed(self):
+        self.assertIs(resolve(self.url).func, async_views.note_read_mode)
+
+    async def test_anonymous_users_are_redirected(self):
+        await sync_to_async(self.async_client.logout)()
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    async def test_unchanged_note_is_not_modified(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Rain é')
+        #The async client of Django 3.1 passes the extra arguments as header names.
+        response = await self.async_client.get(self.url, **{'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    @override_settings(NOTE_STREAMING_CHUNK_SIZE=100)
+    async def test_large_note_is_streamed_from_its_loaded_content(self):
+        rendered = (await self.async_client.get(self.url)).content
+        with override_settings(NOTE_STREAMING_THRESHOLD=0):
+            response = await self.async_client.get(self.url)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response['ETag'].startswith('W/'))
+        #The response is iterated in the event loop, where loading the content from the database would raise SynchronousOnlyOperation.
+        streamed = b''.join(response.streaming_content)
+        self.assertEqual(StreamingTests.CSRF_TOKEN.sub(b'', streamed), StreamingTests.CSRF_TOKEN.sub(b'', rendered))
+
+    async def test_diary_content_lists_the_notes(self):
+        response = await self.async_client.get(reverse('Notes:diary_content', kwargs={'diary': 'Journal'}))
+        self.assertContains(response, 'Monday')
+        response = await self.async_client.get(reverse('Notes:diary_content', kwargs={'diary': 'Missing'}))
+        self.assertEqual(response.status_code, 404)
+
+    def post(self, url, data):
+        """
+        A method that posts form data with the async client, urlencoded since its multipart bodies cannot be parsed in Django 3.1.
+        """
+        return self.async_client.post(url, urlencode(data), content_type='application/x-www-form-urlencoded')
+
+    async def test_posts_are_handed_to_the_sync_views(self):
+        response = await self.post(reverse('Notes:my_diaries'), {'title': 'Travels'})
+        self.assertEqual(response.status_code, 302)
+        response = await self.post(reverse('Notes:diary_content', kwargs={'diary': 'Travels'}), {'title': 'Tuesday'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(await sync_to_async(Note.objects.filter(diary__title='Travels', title='Tuesday').exists)())
+
+
+class ReaderTests(TestCase):
+    """
+    A class that tests the chunks of a note's content returned to the lightweight reader.
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        self.diary = Diary.objects.create(author=self.user, title='Journal')
+        self.content = '<p>Été à Kyōto</p><p>{}</p><br><p>日本語のノート</p><ul><li>Un</li><li>Deux</li></ul>'.format('東京 ' * 20)
+        self.note = Note.objects.create(diary=self.diary, title='Monday', content=self.content)
+        self.url = reverse('Notes:note_chunk', kwargs={'diary': 'Journal', 'note': 'Monday'})
+        self.client.force_login(self.user)
+
+    def chunks(self, chunk_size):
+        """
+        A method that reads all the chunks of the note from the first one.
+        """
+        chunks = [read_chunk(self.note, 0, chunk_size)]
+        while chunks[-1]['next_offset'] is not None:
+            chunks.append(read_chunk(self.note, chunks[-1]['next_offset'], chunk_size))
+        return chunks
+
+    def test_chunks_end_between_top_level_elements(self):
+        data = self.content.encode()
+        offsets = chunk_offsets(data, 1)
+        self.assertEqual(offsets[0], 0)
+        self.assertEqual(offsets[-1], len(data))
+        for offset in offsets[1:-1]:
+            self.assertIn(data[offset:offset + 3], (b'<p>', b'<br', b'<ul'))
+
+    def test_multi_byte_characters_are_never_split(self):
+        for chunk_size in (1, 5, 17, 40, 1000):
+            chunks = self.chunks(chunk_size)
+            self.assertEqual(''.join(chunk['html'] for chunk in chunks), sanitize_note_content(self.content, extract_images=False)[0])
+            self.assertEqual({chunk['total_bytes'] for chunk in chunks}, {len(self.content.encode())})
+
+    def test_elements_larger_than_the_chunk_size_are_not_split(self):
+        chunks = self.chunks(10)
+        self.assertIn('<p>{}</p>'.format('東京 ' * 20), [chunk['html'] for chunk in chunks])
+        self.assertIn('<ul><li>Un</li><li>Deux</li></ul>', [chunk['html'] for chunk in chunks])
+        self.assertEqual(len(self.chunks(len(self.content.encode()))), 1)
+
+    def test_offset_inside_an_element_is_rejected(self):
+        with self.assertRaises(ChunkError):
+            read_chunk(self.note, 1, 10)
+        response = self.client.get(self.url, {'offset': 4})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+        self.assertEqual(self.client.get(self.url, {'offset': 'x'}).status_code, 400)
+
+    @override_settings(NOTE_READER_CHUNK_SIZE=10)
+    def test_view_returns_the_chunk_and_the_version(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        chunk = response.json()
+        self.assertEqual(chunk['html'], '<p>Été à Kyōto</p>')
+        self.assertEqual(chunk['offset'], 0)
+        self.assertEqual(chunk['version'], self.note.version)
+        response = self.client.get(self.url, {'offset': chunk['next_offset'], 'version': chunk['version']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['offset'], chunk['next_offset'])
+
+    def test_stale_version_is_a_conflict(self):
+        version = self.client.get(self.url).json()['version']
+        update_note(self.note, self.note.version, title='Monday', content='<p>Rewritten</p>')
+        response = self.client.get(self.url, {'offset': 0, 'version': version})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {'error': 'stale', 'version': version + 1})
+        self.assertEqual(self.client.get(self.url).json()['html'], '<p>Rewritten</p>')
+
+
+class DiaryCounterTests(TestCase):
+    """
+    A class that tests the note count and the total content size kept on every diary.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'a long enough password')
+        self.diary = Diary.objects.create(author=self.user, title='Journal')
+        self.note = Note.objects.create(diary=self.diary, title='Monday', content='<p>Rain</p>')
+        Note.objects.create(diary=self.diary, title='Tuesday', content='<p>Sun é</p>')
+
+    def counters(self):
+        """
+        A method that returns the diary's stored note count and total content size.
+        """
+        return Diary.objects.values_list('note_count', 'total_content_bytes').get(pk=self.diary.pk)
+
+    def test_counters_follow_created_notes(self):
+        self.assertEqual(self.counters(), (2, content_size('<p>Rain</p>') + content_size('<p>Sun é</p>')))
+
+    def test_content_saved_without_its_loaded_size_adjusts_the_counters(self):
+        note = Note.objects.defer('content_bytes').get(pk=self.note.pk)
+        note.content = '<p>Heavy rain all day</p>'
+        note.save()
+        self.assertEqual(Note.objects.get(pk=self.note.pk).content_bytes, content_size('<p>Heavy rain all day</p>'))
+        self.assertEqual(self.counters(), (2, content_size('<p>Heavy rain all day</p>') + content_size('<p>Sun é</p>')))
+
+    def test_saves_without_the_content_keep_the_counters(self):
+        counters = self.counters()
+        note = Note.objects.defer('content', 'content_bytes').get(pk=self.note.pk)
+        note.title = 'Monday morning'
+        note.save()
+        self.note.content = '<p>Not saved</p>'
+        self.note.save(update_fields=['title'])
+        self.assertEqual(self.counters(), counters)
+
+    def test_deleting_a_note_without_its_loaded_size_adjusts_the_counters(self):
+        Note.objects.defer('content_bytes').get(pk=self.note.pk).delete()
+        self.assertEqual(self.counters(), (1, content_size('<p>Sun é</p>')))
+
+    def test_reconcile_repairs_drifted_counters(self):
+        other = Diary.objects.create(author=self.user, title='Travels')
+        expected = self.counters()
+        last_activity = Diary.objects.get(pk=self.diary.pk).last_activity
+        Diary.objects.filter(pk=self.diary.pk).update(note_count=7, total_content_bytes=3, last_activity=None)
+        progress = []
+        self.assertEqual(reconcile_diary_counters(batch_size=1, progress=lambda *args: progress.append(args)), (2, 1))
+        self.assertEqual(progress, [(1, 1), (2, 1)])
+        self.assertEqual(self.counters(), expected)
+        self.assertEqual(Diary.objects.get(pk=self.diary.pk).last_activity, last_activity)
+        self.assertEqual(Diary.objects.values_list('note_count', 'total_content_bytes').get(pk=other.pk), (0, 0))
+        self.assertEqual(reconcile_diary_counters(), (2, 0))
+
+    def test_reconcile_never_moves_the_last_activity_back(self):
+        later = timezone.now() + timedelta(days=1)
+        Diary.objects.filter(pk=self.diary.pk).update(last_activity=later)
+        self.assertEqual(reconcile_diary_counters(), (1, 0))
+        self.assertEqual(Diary.objects.get(pk=self.diary.pk).last_activity, later)
+
+
+class BenchmarkCommandTests(TestCase):
+    """
+    A class that runs the benchmark command on tiny synthetic data and checks the schema of its JSON results.
+    The command normally creates and destroys its own test database, so it is run in the database of the tests instead.
+    """
+    def setUp(self):
+        for patcher in (
+            mock.patch('Notes.management.commands.benchmark.setup_test_environment'),
+            mock.patch('Notes.management.commands.benchmark.teardown_test_environment'),
+            mock.patch.object(connection.creation, 'create_test_db', return_value=connection.settings_dict['NAME']),
+            mock.patch.object(connection.creation, 'destroy_test_db'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.output = os.path.join(tempfile.mkdtemp(), 'results.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.output))
+
+    def test_results_schema(self):
+        stdout = io.StringIO()
+        call_command(
+            'benchmark', users=1, diaries=2, notes=2, content_size=200, requests=2, transport=['client'], storage=True,
+            output=self.output, stdout=stdout,
+        )
+        with open(self.output) as file:
+            results = json.load(file)
+        self.assertEqual(set(results), {'version', 'date', 'environment', 'parameters', 'transports', 'storage'})
+        self.assertEqual(results['version'], RESULTS_VERSION)
+        self.assertEqual(set(results['environment']), {'python', 'django', 'database', 'platform'})
+        self.assertEqual(results['parameters'], {'users': 1, 'diaries': 2, 'notes': 2, 'content_size': 200, 'requests': 2, 'seed': 0})
+        self.assertEqual(set(results['transports']), {'client'})
+        measured = results['transports']['client']
+        self.assertEqual(set(measured), {'setup_seconds', 'rss_growth_bytes', 'routes'})
+        self.assertEqual(set(measured['routes']), {'my_diaries', 'diary_content', 'note_content', 'note_read_mode', 'delete_note', 'delete_diary'})
+        for summary in measured['routes'].values():
+            self.assertEqual(set(summary), {'requests', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'queries_per_request'})
+            self.assertGreater(summary['requests'], 0)
+            self.assertGreater(summary['queries_per_request'], 0)
+        self.assertEqual(measured['routes']['note_read_mode']['requests'], 2)
+        self.assertTrue(results['storage'])
+        for mode in results['storage'].values():
+            self.assertEqual(set(mode), {'content_bytes', 'stored_bytes', 'database_growth_bytes', 'reads'})
+            self.assertEqual(set(mode['reads']), {'load', 'load_and_read'})
+        self.assertIn('Results saved to', stdout.getvalue())
+        self.assertEqual(compare_results(results, results), [])
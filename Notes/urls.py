@@ -1,6 +1,10 @@
-from . import views
+from . import async_views, views
+from django.conf import settings
 from django.urls import path
 
+#The module of the read views, which are native async views when the project is served over ASGI.
+read_views = async_views if settings.ASYNC_VIEWS else views
+
 #The app's namespace.
 app_name = "Notes"
 
@@ -8,15 +12,35 @@ urlpatterns = [
 #The url to the home page.
 path('', views.HomePageView.as_view(), name = 'home_page'),
 #A url mapped to a view that renders a user's diaries and new diary form.
-path('mydiaries/', views.my_diaries, name = 'my_diaries'),
+path('mydiaries/', read_views.my_diaries, name = 'my_diaries'),
 #A url mapped to a view that renders a user's diary content and a note form.
-path('mydiaries/<diary>/', views.diary_content, name ='diary_content'),
+path('mydiaries/<diary>/', read_views.diary_content, name ='diary_content'),
 #A url mapped to a view that deletes a user's diary on their request.
 path('mydiaries/<diary>/delete/', views.delete_diary, name ='delete_diary'),
+#A url mapped to a view that deletes, moves or copies the selected notes of a user's diary.
+path('mydiaries/<diary>/bulk/', views.bulk_notes, name ='bulk_notes'),
 #A url mapped to a view that renders a user's note in read mode.
 path('mydiaries/<diary>/<note>/delete/', views.delete_note, name='delete_note'),
 #A url mapped to a view that renders a user's diaries and new diary form.
 path('mydiaries/<diary>/<note>/edit/', views.note_content, name='note_content'),
+#A url mapped to a view that applies an autosave patch to a user's note.
+path('mydiaries/<diary>/<note>/autosave/', views.autosave_note, name='autosave_note'),
+#A url mapped to a view that renders the revisions of a user's note.
+path('mydiaries/<diary>/<note>/history/', views.note_history, name='note_history'),
+#A url mapped to a view that renders and restores a revision of a user's note.
+path('mydiaries/<diary>/<note>/history/<int:revision>/', views.note_revision, name='note_revision'),
 #A url mapped to a view that renders a user's note content.
-path('mydiaries/<diary>/<note>/read/', views.note_read_mode, name='note_read_mode'),
+path('mydiaries/<diary>/<note>/read/', read_views.note_read_mode, name='note_read_mode'),
+#A url mapped to a view that renders a user's note in the lightweight reader.
+path('mydiaries/<diary>/<note>/reader/', views.note_reader, name='note_reader'),
+#A url mapped to a view that returns a chunk of a user's note content as JSON.
+path('mydiaries/<diary>/<note>/chunks/', views.note_chunk, name='note_chunk'),
+#A url mapped to a view that searches a user's notes.
+path('search/', views.search, name='search'),
+#A url mapped to a view that streams a ZIP archive of a user's diaries.
+path('export/', views.export_diaries, name='export_diaries'),
+#A url mapped to a view that imports an archive of diaries into a user's account.
+path('import/', views.import_diaries, name='import_diaries'),
+#A url mapped to a view that returns the changes of a user's diaries and notes after a cursor.
+path('sync/', views.sync_changes, name='sync_changes'),
 ]
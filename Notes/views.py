@@ -1,10 +1,30 @@
+import hashlib
+import json
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
+from django.db import IntegrityError
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_POST
 from django.views.generic import TemplateView
-from Notes.forms import DiaryForm, EditNoteForm, NewNoteForm
-from Notes.models import Diary, Note
+from Notes.archive import ArchiveError, import_archive, stream_export
+from Notes.autosave import PatchError, apply_autosave
+from Notes.bulk import BulkOperationError, apply_bulk_operation
+from Notes.concurrency import StaleVersionError, update_note
+from Notes.cache import get_diary_index
+from Notes.changes import get_changes
+from Notes.forms import BulkNotesForm, DiaryForm, EditNoteForm, ImportForm, NewNoteForm, SearchForm
+from Notes.models import Diary, Note, NoteRevision
+from Notes.pagination import paginate_notes
+from Notes.purge import mark_diary_deleted
+from Notes.reader import ChunkError, read_chunk
+from Notes.resolvers import get_diary, get_note, get_note_last_update_time
+from Notes.revisions import RevisionError, get_revision_content
+from Notes.search import search_notes
+from Notes.streaming import note_page_chunks, streaming_response
 
 class HomePageView(TemplateView):
     """
@@ -19,11 +39,65 @@ class HomePageView(TemplateView):
     template_name = "Notes/index.html"
 
 
+@login_required
+@require_POST
+def autosave_note(request, diary, note):
+    """
+    A view that applies an autosave patch sent by the note editor to a user's note.
+    The request body is a JSON object with the 'version' the patch was made against and the splice 'ops' to apply.
+    Only the changed parts of the content are sent, and a patch made against an older version is rejected
+    so that concurrent edits are never overwritten.
+    This view can only be accessed if a user is authenticated.
+    The login_required decorator is used to ensure the previous point.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+    diary : str
+        The user's diary name.
+    note : str
+        The user's note name in the diary.
+
+    Returns
+    -------
+    JsonResponse
+        The note's new 'version' and 'last_update_time', and its 'content' if the sanitization changed it.
+        A 409 response with the note's current 'version' if the patch is stale.
+        A 400 response with an 'error' if the request or the patch is malformed.
+
+    Raises
+    ------
+    Http404
+        If the user has no such note in the given diary.
+    """
+    try:
+        data = json.loads(request.body)
+        version, ops = data['version'], data['ops']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error':"The request must be a JSON object with 'version' and 'ops'."}, status=400)
+    if type(version) is not int:
+        return JsonResponse({'error':"The version must be an integer."}, status=400)
+    note = get_note(request.user, diary, note)
+    try:
+        note, rewritten = apply_autosave(note, version, ops)
+    except StaleVersionError as error:
+        return JsonResponse({'error':'stale', 'version':error.version}, status=409)
+    except PatchError as error:
+        return JsonResponse({'error':str(error)}, status=400)
+    response = {'version':note.version, 'last_update_time':note.last_update_time.isoformat()}
+    if rewritten:
+        response['content'] = note.content
+    return JsonResponse(response)
+
+
 @login_required
 def delete_diary(request, diary):
     """
     A view that deletes a user's diary.
-    The diary is extracted by matching the user's diary to the diary field of the Note object.
+    The diary is extracted by matching the user's diary name to the title of one of their Diary objects.
+    The diary is only marked as deleted, which hides it at once. Its notes are purged in the background
+    by the purge_deleted_diaries command.
     This view can only be accessed if a user is authenticated.
     The login_required decorator is used to ensure the previous point.
 
@@ -38,9 +112,13 @@ def delete_diary(request, diary):
     -------
     HttpResponseRedirect
         redirect to the my_diaries view.
+
+    Raises
+    ------
+    Http404
+        If the user has no diary with the given name.
     """
-    my_diary = Diary.objects.get(title=diary)
-    my_diary.delete()
+    mark_diary_deleted(get_diary(request.user, diary))
     return redirect('Notes:my_diaries')
 
 
@@ -49,7 +127,7 @@ def delete_note(request, diary, note):
     """
     A view that deletes a user's diary note.
     The note is extracted by matching the user's diary to the diary field of the Note object
-    and the user's note to the Note title field.
+    and the user's note to the Note title field in a single query scoped to the user.
     This view can only be accessed if a user is authenticated.
     The login_required decorator is used to ensure the previous point.
 
@@ -65,19 +143,71 @@ def delete_note(request, diary, note):
     -------
     HttpResponseRedirect
         redirect to the diary_content view.
+
+    Raises
+    ------
+    Http404
+        If the user has no such note in the given diary.
     """
-    my_diary = Diary.objects.get(title=diary)
-    cond1 = Q(title=note)
-    cond2 = Q(diary = my_diary)
-    Note.objects.get(cond1 & cond2).delete()
+    get_note(request.user, diary, note).delete()
     return redirect('Notes:diary_content', diary=diary)
 
 
+@login_required
+@require_POST
+def bulk_notes(request, diary):
+    """
+    A view that deletes, moves or copies the selected notes of a user's diary in one request.
+    The notes are changed with set-based queries in a single transaction by apply_bulk_operation(),
+    which refuses the whole operation if any selected title already exists in the target diary.
+    This view can only be accessed if a user is authenticated.
+    The login_required decorator is used to ensure the previous point.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+    diary : str
+        The user's diary name.
+
+    Returns
+    -------
+    HttpResponseRedirect
+        A request to the diary_content view when the operation is done.
+    HttpResponse
+        The diary_content page with the BulkNotesForm errors when the submitted data is invalid, with status 400,
+        or with an error message when some of the notes already exist in the target diary, with status 409.
+
+    Raises
+    ------
+    Http404
+        If the user has no diary with the given name.
+    """
+    my_diary = get_diary(request.user, diary)
+    bulk_form = BulkNotesForm(my_diary, request.POST)
+    status = 400
+    error_message = None
+    if bulk_form.is_valid():
+        try:
+            apply_bulk_operation(my_diary, bulk_form.cleaned_data['notes'], bulk_form.cleaned_data['operation'], bulk_form.cleaned_data['target'])
+            return redirect('Notes:diary_content', diary=diary)
+        except BulkOperationError as error:
+            status = 409
+            error_message = "{} {}".format(error, ', '.join(error.titles)) if error.titles else str(error)
+    page = paginate_notes(my_diary)
+    context = {
+        'diary':diary, 'notes':page.notes, 'page':page, 'diaries':get_diary_index(request.user),
+        'form':NewNoteForm(), 'bulk_form':bulk_form, 'bulk_error_message':error_message,
+    }
+    return render(request, 'Notes/diary_content.html', context, status=status)
+
+
 @login_required
 def diary_content(request, diary):
     """
     A view that renders a user's diary content and a NewNoteForm for adding new notes.
     The notes are extracted by matching the user's diary to the diary field of the Note object.
+    The notes are listed a page at a time using the 'after' and 'before' title cursors of the query string.
     Duplicate note names are not allowed in the same diary of a user.
     This view can only be accessed if a user is authenticated.
     The login_required decorator is used to ensure the previous point.
@@ -99,19 +229,19 @@ def diary_content(request, diary):
 
     Raises
     ------
+    Http404
+        If the user has no diary with the given name.
     ValidationError
         If the form data is not correct or as per guidelines.
     """
-    my_diary = Diary.objects.get(title=diary)
-    notes = Note.objects.filter(diary=my_diary.id).order_by('title')
+    my_diary = get_diary(request.user, diary)
     if request.method == "POST":
         form = NewNoteForm(request.POST)
         title = request.POST["title"]
-        note = Note.objects.filter(title=title, diary=my_diary)
-        if note:
+        if Note.objects.filter(title=title, diary=my_diary).exists():
             error_message = "This note already exists"
             form = DiaryForm()
-            return render(request, 'Notes/diary_content.html', {'diary':diary, 'error_message':error_message, 'form':form, 'notes':notes})
+            return render(request, 'Notes/diary_content.html', {**_diary_context(request, diary, my_diary), 'error_message':error_message, 'form':form})
         if form.is_valid():
             note = form.save(commit=False)
             note.diary = my_diary
@@ -119,17 +249,97 @@ def diary_content(request, diary):
             note.last_update_time = timezone.now()
             note.save()
             return redirect('Notes:note_content', diary=diary, note=note)
-        return render(request, 'Notes/diary_content.html', {'diary':diary, 'form':form, 'notes':notes})
+        return render(request, 'Notes/diary_content.html', {**_diary_context(request, diary, my_diary), 'form':form})
     else:
         form = NewNoteForm()
-        return render(request, 'Notes/diary_content.html', {'diary':diary, 'form':form, 'notes':notes})
+        return render(request, 'Notes/diary_content.html', {**_diary_context(request, diary, my_diary), 'form':form})
+
+
+def _diary_context(request, diary, my_diary):
+    """
+    A function that returns the context of a diary's page: a page of its notes and the user's diary index.
+    It is only computed when the page is rendered, so a note creation that redirects does not pay for its queries.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+    diary : str
+        The user's diary name.
+    my_diary : Diary object
+        The user's diary.
+
+    Returns
+    -------
+    dict
+        The template context.
+    """
+    page = paginate_notes(my_diary, after=request.GET.get('after'), before=request.GET.get('before'))
+    return {'diary':diary, 'notes':page.notes, 'page':page, 'diaries':get_diary_index(request.user)}
+
+
+@login_required
+def export_diaries(request):
+    """
+    A view that streams a ZIP archive of all of the user's diaries and notes.
+    The archive is built while it is sent, so no temporary file is created.
+    This view can only be accessed if a user is authenticated.
+    The login_required decorator is used to ensure the previous point.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+
+    Returns
+    -------
+    StreamingHttpResponse
+        The ZIP archive as an attachment.
+    """
+    response = StreamingHttpResponse(stream_export(request.user), content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename="ubiquitous-diaries-{}.zip"'.format(request.user.username)
+    return response
+
+
+@login_required
+def import_diaries(request):
+    """
+    A view that renders an ImportForm and imports an uploaded archive of diaries and notes into the user's account.
+    The archive is validated before anything is written and its notes are created in batches.
+    This view can only be accessed if a user is authenticated.
+    The login_required decorator is used to ensure the previous point.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+
+    Returns
+    -------
+    HttpResponse
+        A new ImportForm instance when the user accesses the import page.
+        The import outcome when the user submits a valid archive.
+        An ImportForm instance with errors when the archive is invalid.
+    """
+    if request.method == "POST":
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                result = import_archive(request.user, form.cleaned_data['archive'], form.cleaned_data['resume'])
+            except ArchiveError as error:
+                return render(request, 'Notes/import.html', {'form':form, 'errors':error.errors})
+            return render(request, 'Notes/import.html', {'form':ImportForm(), 'result':result})
+        return render(request, 'Notes/import.html', {'form':form})
+    else:
+        form = ImportForm()
+        return render(request, 'Notes/import.html', {'form':form})
 
 
 @login_required
 def my_diaries(request):
     """
     A view that renders a user's diaries and a DiaryForm for adding new diaries.
-    The diaries are extracted by matching the user's current username to the author field of the Diary object.
+    The diaries are read from the user's cached diary index, which is kept up to date by the Notes signal receivers.
     Duplicate diary names are not allowed for a user.
     This view can only be accessed if a user is authenticated.
     The login_required decorator is used to ensure the previous point.
@@ -156,13 +366,10 @@ def my_diaries(request):
         form = DiaryForm(request.POST)
         diary_title = request.POST["title"]
         author = request.user
-        cond1 = Q(title=diary_title)
-        cond2 = Q(author = author)
-        diaries = Diary.objects.filter(cond1 & cond2)
-        if diaries:
+        if Diary.objects.live().filter(author=author, title=diary_title).exists():
             error_message = "This diary already exists"
             form = DiaryForm()
-            diaries = Diary.objects.filter(author=request.user).order_by('title')
+            diaries = get_diary_index(request.user)
             return render(request, 'Notes/my_diaries.html', {'form':form, 'diaries':diaries, 'error_message':error_message})
         if form.is_valid():
             diary = form.save(commit=False)
@@ -170,11 +377,11 @@ def my_diaries(request):
             diary.create_date = timezone.now()
             diary.save()
             return redirect('Notes:diary_content',diary=diary)
-        diaries = Diary.objects.filter(author=request.user).order_by('title')
+        diaries = get_diary_index(request.user)
         return render(request, 'Notes/my_diaries.html', {'form':form, 'diaries':diaries})
     else:
         form = DiaryForm()
-        diaries = Diary.objects.filter(author=request.user).order_by('title')
+        diaries = get_diary_index(request.user)
         return render(request, 'Notes/my_diaries.html', {'form':form, 'diaries':diaries})
 
 
@@ -183,7 +390,7 @@ def note_content(request, diary ,note):
     """
     A view that renders a user's note content and a EditNoteForm for editing notes.
     The notes are extracted by matching the user's diary to the diary field of the Note object
-    and the user's note to the title field of Note.
+    and the user's note to the title field of Note in a single query scoped to the user.
     This view can only be accessed if a user is authenticated.
     The login_required decorator is used to ensure the previous point.
 
@@ -202,33 +409,180 @@ def note_content(request, diary ,note):
         A request to the note_content view when the user submits valid POST data and a existing Note instance is rendered.
     HttpResponse
         A new EditNoteForm instance when the user accesses the note_content page.
+        A 409 response with the submitted and the current content of the note when it was saved by someone else
+        since the form was rendered.
 
     Raises
     ------
+    Http404
+        If the user has no such note in the given diary.
     ValidationError
         If the form data is not correct or as per guidelines.
     """
-    my_diary = Diary.objects.get(title=diary)
-    cond1 = Q(title=note)
-    cond2 = Q(diary = my_diary)
-    note = Note.objects.get(cond1 & cond2)
+    note = get_note(request.user, diary, note)
     if request.method == "POST":
+        title, content = note.title, note.content
         form = EditNoteForm(request.POST, instance=note)
         if form.is_valid():
-            note = form.save(commit=False)
-            note.last_update_time=timezone.now()
-            note.save()
-            return redirect('Notes:note_content', diary=diary, note=note)
+            try:
+                note = form.save()
+            except StaleVersionError:
+                current = get_note(request.user, diary, title)
+                merge_form = EditNoteForm(instance=current, initial={'title':form.cleaned_data['title'], 'content':form.cleaned_data['content']})
+                return render(request, 'Notes/note_conflict.html', {'diary':diary, 'form':merge_form, 'note':current}, status=409)
+            except IntegrityError:
+                form.add_error('title', "A note with this title already exists in this diary.")
+            else:
+                return redirect('Notes:note_content', diary=diary, note=note)
+        note.title, note.content = title, content
+        return render(request, 'Notes/notes_content.html', {'diary':diary, 'form':form, 'note':note, 'fragment_timeout':settings.NOTE_FRAGMENT_CACHE_TIMEOUT})
     form = EditNoteForm(instance=note)
-    return render(request, 'Notes/notes_content.html', {'diary':diary, 'form':form, 'note':note})
+    return render(request, 'Notes/notes_content.html', {'diary':diary, 'form':form, 'note':note, 'fragment_timeout':settings.NOTE_FRAGMENT_CACHE_TIMEOUT})
+
+
+@login_required
+def note_history(request, diary, note):
+    """
+    A view that renders the list of a user's note revisions.
+    The revisions are listed from their metadata without rebuilding their content.
+    This view can only be accessed if a user is authenticated.
+    The login_required decorator is used to ensure the previous point.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+    diary : str
+        The user's diary name.
+    note : str
+        The user's note name in the diary.
+
+    Returns
+    -------
+    HttpResponse
+        The note's revisions from the newest to the oldest.
+
+    Raises
+    ------
+    Http404
+        If the user has no such note in the given diary.
+    """
+    note = get_note(request.user, diary, note, defer=('content',))
+    revisions = NoteRevision.objects.filter(note=note).only('number', 'base', 'size', 'create_date').order_by('-number')
+    return render(request, 'Notes/note_history.html', {'diary':diary, 'note':note, 'revisions':revisions})
+
+
+@login_required
+def note_revision(request, diary, note, revision):
+    """
+    A view that renders a revision of a user's note and restores it on the user's request.
+    The revision is restored as a new version of the note, so it is only restored if the note was not changed
+    since the page was rendered.
+    This view can only be accessed if a user is authenticated.
+    The login_required decorator is used to ensure the previous point.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+    diary : str
+        The user's diary name.
+    note : str
+        The user's note name in the diary.
+    revision : int
+        The revision number.
+
+    Returns
+    -------
+    HttpResponseRedirect
+        A request to the note_content view when the revision is restored.
+    HttpResponse
+        The revision's content when the user accesses the page.
+        A 409 response when the note was changed since the page was rendered.
+
+    Raises
+    ------
+    Http404
+        If the user has no such note in the given diary or the note has no such revision.
+    """
+    note = get_note(request.user, diary, note)
+    try:
+        content = get_revision_content(note, revision)
+    except (NoteRevision.DoesNotExist, RevisionError):
+        raise Http404("The revision does not exist.")
+    context = {'diary':diary, 'note':note, 'revision':revision, 'content':content}
+    if request.method == "POST":
+        try:
+            update_note(note, int(request.POST.get('version', '')), content=content)
+        except (StaleVersionError, ValueError):
+            return render(request, 'Notes/note_revision.html', {**context, 'error_message':"This note was changed since this page was opened."}, status=409)
+        return redirect('Notes:note_content', diary=diary, note=note)
+    return render(request, 'Notes/note_revision.html', context)
+
+
+def note_last_modified(request, diary, note):
+    """
+    A function that returns the last update time of the requested note for conditional requests.
+    The value is stored on the request so that the note is only queried once per request.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+    diary : str
+        The user's diary name.
+    note : str
+        The user's note name in the diary.
+
+    Returns
+    -------
+    datetime.datetime
+        The note's last update time or None if the user has no such note in the given diary.
+    """
+    if not hasattr(request, '_note_last_update_time'):
+        request._note_last_update_time = get_note_last_update_time(request.user, diary, note)
+    return request._note_last_update_time
+
+
+def note_etag(request, diary, note):
+    """
+    A function that returns the ETag of the requested note's read mode page.
+    It changes whenever the note is updated or the user's name shown in the page changes.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+    diary : str
+        The user's diary name.
+    note : str
+        The user's note name in the diary.
+
+    Returns
+    -------
+    str
+        The ETag or None if the user has no such note in the given diary.
+    """
+    last_update_time = note_last_modified(request, diary, note)
+    if last_update_time is None:
+        return None
+    key = "{}:{}:{}:{}:{}".format(request.user.pk, request.user.first_name, diary, note, last_update_time.isoformat())
+    return hashlib.md5(key.encode()).hexdigest()
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=note_etag, last_modified_func=note_last_modified)
 def note_read_mode(request, diary, note):
     """
     A view that renders a user's note content in read mode.
     The notes are extracted by matching the user's diary to the diary field of the Note object
-    and the user's note to the title field of Note.
+    and the user's note to the title field of Note in a single query scoped to the user.
+    The response carries an ETag and a Last-Modified header built from the note's last update time,
+    so that a repeated request for an unchanged note is answered with a 304 response.
+    The note's content is only loaded if its rendered fragment is not cached.
+    Notes larger than the NOTE_STREAMING_THRESHOLD setting are streamed instead:
+    the page's head and navigation are sent before the content is loaded, and the content follows in chunks.
     This view can only be accessed if a user is authenticated.
     The login_required decorator is used to ensure the previous point.
 
@@ -245,9 +599,167 @@ def note_read_mode(request, diary, note):
     -------
     HttpResponse
         A new EditNoteForm instance when the user accesses the note_content page.
+    StreamingHttpResponse
+        The page, gzip compressed if the client accepts it, when the note is larger than the streaming threshold.
+    HttpResponseNotModified
+        An empty response when the user's cached copy of the page is up to date.
+
+    Raises
+    ------
+    Http404
+        If the user has no such note in the given diary.
+    """
+    note = get_note(request.user, diary, note, defer=('content',))
+    context = {'diary':diary, 'note':note, 'fragment_timeout':settings.NOTE_FRAGMENT_CACHE_TIMEOUT}
+    if note.content_bytes > settings.NOTE_STREAMING_THRESHOLD:
+        chunks = note_page_chunks(request, 'Notes/notes_content.html', context, note, settings.NOTE_STREAMING_CHUNK_SIZE)
+        response = streaming_response(request, chunks)
+        #The compressed body differs from the uncompressed one, so the ETag is weak.
+        response['ETag'] = 'W/"{}"'.format(note_etag(request, diary, note.title))
+        return response
+    return render(request, 'Notes/notes_content.html', context)
+
+
+@login_required
+@gzip_page
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=note_etag, last_modified_func=note_last_modified)
+def note_reader(request, diary, note):
+    """
+    A view that renders a user's note in a lightweight reader page without the note editor.
+    Only the first chunk of the note's content is sent with the page. The reader script requests the following chunks
+    from the note_chunk view as the user scrolls, so a large note is read without downloading all of it first.
+    Like the read mode, the response carries an ETag and a Last-Modified header and an unchanged note is answered with a 304 response.
+    This view can only be accessed if a user is authenticated.
+    The login_required decorator is used to ensure the previous point.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+    diary : str
+        The user's diary name.
+    note : str
+        The user's note name in the diary.
+
+    Returns
+    -------
+    HttpResponse
+        The reader page with the first chunk of the note's content.
+    HttpResponseNotModified
+        An empty response when the user's cached copy of the page is up to date.
+
+    Raises
+    ------
+    Http404
+        If the user has no such note in the given diary.
+    """
+    note = get_note(request.user, diary, note, defer=('content',))
+    return render(request, 'Notes/note_reader.html', {'diary':diary, 'note':note, 'chunk':read_chunk(note, 0)})
+
+
+@login_required
+@gzip_page
+@cache_control(private=True, no_cache=True)
+def note_chunk(request, diary, note):
+    """
+    A view that returns a sanitized chunk of a user's note content as JSON, starting at the byte offset of the 'offset' query parameter.
+    Chunks end between top-level elements, so every chunk can be appended to the page as it is.
+    The optional 'version' query parameter is the version of the note the previous chunks were read from.
+    This view can only be accessed if a user is authenticated.
+    The login_required decorator is used to ensure the previous point.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+    diary : str
+        The user's diary name.
+    note : str
+        The user's note name in the diary.
+
+    Returns
+    -------
+    JsonResponse
+        The chunk's 'html', 'offset', 'next_offset', which is null for the last chunk, and 'total_bytes', and the note's 'version'.
+        A 409 response with the note's current 'version' if the note changed since the given version.
+        A 400 response with an 'error' if the offset is not the start of a chunk.
+
+    Raises
+    ------
+    Http404
+        If the user has no such note in the given diary.
+    """
+    try:
+        offset = int(request.GET.get('offset', 0))
+        version = int(request.GET['version']) if 'version' in request.GET else None
+    except ValueError:
+        return JsonResponse({'error':"The offset and the version must be integers."}, status=400)
+    note = get_note(request.user, diary, note, defer=('content',))
+    if version is not None and version != note.version:
+        return JsonResponse({'error':'stale', 'version':note.version}, status=409)
+    try:
+        chunk = read_chunk(note, offset)
+    except ChunkError as error:
+        return JsonResponse({'error':str(error)}, status=400)
+    return JsonResponse({**chunk, 'version':note.version})
+
+
+@login_required
+@gzip_page
+@cache_control(private=True, no_cache=True)
+def sync_changes(request):
+    """
+    A view that returns the changes of a user's diaries and notes after a cursor as compact JSON, for clients that keep offline copies.
+    The 'since' query parameter is the cursor returned by the previous request or 0 for a first sync,
+    and 'content=0' leaves the notes' contents out. A client repeats the request with the returned cursor while 'more' is true.
+    The response is gzip compressed if the client accepts it.
+    This view can only be accessed if a user is authenticated.
+    The login_required decorator is used to ensure the previous point.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+
+    Returns
+    -------
+    JsonResponse
+        The batch of changes returned by get_changes().
+        A 400 response with an 'error' if the cursor or the limit is not a non-negative integer.
+    """
+    try:
+        since = int(request.GET.get('since', 0))
+        limit = int(request.GET.get('limit', 0))
+    except ValueError:
+        since = limit = -1
+    if since < 0 or limit < 0:
+        return JsonResponse({'error':"The cursor and the limit must be non-negative integers."}, status=400)
+    changes = get_changes(request.user, since, limit, request.GET.get('content') != '0')
+    return JsonResponse(changes, json_dumps_params={'separators':(',', ':'), 'ensure_ascii':False})
+
+
+@login_required
+def search(request):
+    """
+    A view that renders a SearchForm and the user's notes matching the search text.
+    The notes are searched with the full-text search index and ranked by relevance.
+    This view can only be accessed if a user is authenticated.
+    The login_required decorator is used to ensure the previous point.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        An HttpRequest object that contains metadata about a request.
+
+    Returns
+    -------
+    HttpResponse
+        A new SearchForm instance when the user accesses the search page.
+        A SearchForm instance and the matching notes when the user submits a search.
     """
-    my_diary = Diary.objects.get(title=diary)
-    cond1 = Q(title=note)
-    cond2 = Q(diary = my_diary)
-    note = Note.objects.get(cond1 & cond2)
-    return render(request, 'Notes/notes_content.html', {'diary':diary, 'note':note})
+    form = SearchForm(request.GET or None)
+    results = None
+    if form.is_valid():
+        results = search_notes(request.user, form.cleaned_data['q'])
+    return render(request, 'Notes/search.html', {'form':form, 'results':results})
@@ -0,0 +1,87 @@
+//Autosaves the note editor by sending the changed part of the content as a patch against the last saved version.
+(function () {
+    var form = document.getElementById('editNoteForm');
+    var status = document.getElementById('autosaveStatus');
+    //The read mode page has no edit form to autosave.
+    if (!form || !form.elements['version'] || !status) {
+        return;
+    }
+    //The interval between autosaves in milliseconds.
+    var INTERVAL = 5000;
+    var version = parseInt(form.elements['version'].value, 10);
+    var saved = null;
+    var sent = null;
+    var busy = false;
+    var stopped = false;
+
+    function editor() {
+        return window.CKEDITOR && CKEDITOR.instances['id_content'];
+    }
+
+    //Returns the splice operations that turn the saved content into the current content.
+    //The common prefix and suffix are skipped so that only the changed region is sent.
+    function diff(before, after) {
+        var start = 0;
+        var limit = Math.min(before.length, after.length);
+        while (start < limit && before.charCodeAt(start) === after.charCodeAt(start)) {
+            start++;
+        }
+        var end = 0;
+        while (end < limit - start && before.charCodeAt(before.length - 1 - end) === after.charCodeAt(after.length - 1 - end)) {
+            end++;
+        }
+        return [[start, before.length - start - end, after.substring(start, after.length - end)]];
+    }
+
+    function save() {
+        var instance = editor();
+        if (!instance || busy || stopped) {
+            return;
+        }
+        var current = instance.getData();
+        if (saved === null) {
+            saved = sent = current;
+            return;
+        }
+        if (current === sent) {
+            return;
+        }
+        busy = true;
+        sent = current;
+        fetch(form.dataset.autosaveUrl, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': form.elements['csrfmiddlewaretoken'].value
+            },
+            body: JSON.stringify({version: version, ops: diff(saved, current)})
+        }).then(function (response) {
+            return response.json().then(function (data) {
+                if (response.status === 409) {
+                    stopped = true;
+                    status.textContent = 'This note was changed elsewhere. Reload the page before editing it.';
+                } else if (!response.ok) {
+                    sent = null;
+                    status.textContent = 'Autosave failed: ' + data.error;
+                } else {
+                    version = data.version;
+                    form.elements['version'].value = version;
+                    saved = data.content !== undefined ? data.content : current;
+                    status.textContent = 'Saved at ' + new Date(data.last_update_time).toLocaleTimeString();
+                }
+            });
+        }).catch(function () {
+            sent = null;
+            status.textContent = 'Autosave failed. Retrying.';
+        }).then(function () {
+            busy = false;
+        });
+    }
+
+    setInterval(save, INTERVAL);
+    //The full form save replaces the note, so autosaving stops once it is submitted.
+    form.addEventListener('submit', function () {
+        stopped = true;
+    });
+})();
@@ -0,0 +1,56 @@
+//Loads the following chunks of a note's content in the reader as the user scrolls towards the end of the loaded part.
+(function () {
+    var reader = document.getElementById('noteReader');
+    var status = document.getElementById('noteReaderStatus');
+    var url = reader.getAttribute('data-chunks-url');
+    var version = reader.getAttribute('data-version');
+    var nextOffset = reader.getAttribute('data-next-offset');
+    //How close to the end of the loaded part, in pixels, the next chunk is requested.
+    var MARGIN = 1500;
+    var busy = false;
+
+    function load() {
+        if (busy || !nextOffset) {
+            return;
+        }
+        busy = true;
+        status.textContent = 'Loading…';
+        fetch(url + '?offset=' + encodeURIComponent(nextOffset) + '&version=' + encodeURIComponent(version), {
+            credentials: 'same-origin',
+            headers: {'Accept': 'application/json'}
+        }).then(function (response) {
+            if (response.status === 409) {
+                //The note changed since the page was loaded, so its chunks moved.
+                window.location.reload();
+                return null;
+            }
+            if (!response.ok) {
+                throw new Error(response.statusText);
+            }
+            return response.json();
+        }).then(function (chunk) {
+            if (chunk === null) {
+                return;
+            }
+            reader.insertAdjacentHTML('beforeend', chunk.html);
+            nextOffset = chunk.next_offset === null ? '' : String(chunk.next_offset);
+            status.textContent = '';
+            busy = false;
+            check();
+        }).catch(function () {
+            status.textContent = 'The rest of the note could not be loaded. Scroll to try again.';
+            busy = false;
+        });
+    }
+
+    //Requests the next chunk when the end of the loaded part is near the bottom of the viewport.
+    function check() {
+        if (nextOffset && reader.getBoundingClientRect().bottom - window.innerHeight < MARGIN) {
+            load();
+        }
+    }
+
+    window.addEventListener('scroll', check, {passive: true});
+    window.addEventListener('resize', check);
+    check();
+})();